@@ -0,0 +1,160 @@
+"""키프레임/델타 스트림 대역폭 벤치마크
+
+정적인 장면(벽 + 센서 노이즈 + 움직이는 물체 1개)의 VL-R4 스캔을 만들어
+기본 JSON 대비 각 인코딩의 프레임당 전송 바이트를 비교합니다.
+
+    python dev_tools/benchmarks/bench_delta.py --frames 400 --noise-cm 1 --json
+    python dev_tools/benchmarks/bench_delta.py --capture field.knvcap
+"""
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kanavi_capture import KanaviCaptureReader
+from mock_server_lidar import KanaviDeltaCodec, KanaviFrameEncoder, KanaviLidarParser, KanaviStreamParser
+
+def synthetic_scans(frames, channels=4, pointsize=400, noise_cm=1.0, noisy_ratio=0.1, seed=0):
+    """정적 장면 채널 프레임 생성 (VL-R4, 20Hz)"""
+    rng = np.random.default_rng(seed)
+    parser = KanaviLidarParser()
+    hfov, hresolution = 100, 0.25
+    azimuth = np.radians(hfov / 2 - np.arange(pointsize) * hresolution)
+
+    # 센서 앞 12m 벽과 좌우 6m 벽으로 이루어진 방
+    with np.errstate(divide='ignore'):
+        front = 12.0 / np.abs(np.cos(azimuth))
+        side = 6.0 / np.abs(np.sin(azimuth))
+    base = np.minimum(front, side)
+
+    for sequence in range(1, frames + 1):
+        timestamp = sequence * 0.05
+        # 좌우로 왕복하는 물체 (폭 20포인트, 거리 5m)
+        center = int((np.sin(timestamp) * 0.5 + 0.5) * (pointsize - 20))
+        for channel in range(channels):
+            distances = base.copy()
+            distances[center:center + 20] = 5.0
+            noisy = rng.random(pointsize) < noisy_ratio
+            distances[noisy] += rng.normal(0.0, noise_cm / 100.0, noisy.sum())
+            distances = np.round(np.clip(distances, 0, 255.99), 2).astype(np.float32)
+            yield {
+                "type": "lidar",
+                "model": "VL-R4",
+                "pointsize": pointsize,
+                "channel": channel,
+                "hfov": hfov,
+                "vfov": parser.get_vfov("VL-R4", channel),
+                "distances": distances,
+                "hresolution": hresolution,
+                "source_ip": "192.168.0.10",
+                "lidar_id": 1,
+                "detection_data": np.zeros(pointsize, dtype=np.uint8),
+                "product_line": 0x06,
+                "sequence": sequence,
+                "timestamp": timestamp
+            }
+
+def capture_scans(path, udp_port=None):
+    """캡처 파일(Kanavi 캡처 또는 pcap)의 데이터그램을 채널 프레임으로 변환"""
+    parser = KanaviLidarParser()
+    stream_parser = KanaviStreamParser(parser)
+    sequences = defaultdict(int)
+    reader = KanaviCaptureReader(path, udp_port)
+    try:
+        for timestamp, data, addr in reader:
+            # 데이터그램 하나에 패킷이 여러 개 붙어 있어도 모두 사용
+            for parsed, _ in stream_parser.parse_many([(data, addr)]):
+                if parsed['num_points'] == 0:
+                    continue
+                model_info = parsed['model_info']
+                key = (addr[0], parsed['lidar_id'], parsed['channel'])
+                sequences[key] += 1
+                yield {
+                    "type": "lidar",
+                    "model": model_info['name'],
+                    "pointsize": parsed['num_points'],
+                    "channel": parsed['channel'],
+                    "hfov": model_info['hfov'],
+                    "vfov": parser.get_vfov(model_info['name'], parsed['channel']),
+                    "distances": parsed['distances'],
+                    "hresolution": 0.25,
+                    "source_ip": addr[0],
+                    "lidar_id": parsed['lidar_id'],
+                    "detection_data": parsed['detections'],
+                    "product_line": parsed['product_line'],
+                    "sequence": sequences[key],
+                    "timestamp": timestamp
+                }
+    finally:
+        reader.close()
+
+def run(scans, keyframe_interval=20, threshold_cm=0):
+    """인코딩별 총 바이트 계산"""
+    encoder = KanaviFrameEncoder(delta_codec=KanaviDeltaCodec(keyframe_interval, threshold_cm))
+    variants = {
+        "json": ("json", "float32", "distances", "none"),
+        "binary_float32": ("binary", "float32", "distances", "none"),
+        "binary_uint16": ("binary", "uint16", "distances", "none"),
+        "delta_json": ("json", "float32", "distances_delta", "none"),
+        "delta_binary": ("binary", "float32", "distances_delta", "none"),
+        "delta_binary_zlib": ("binary", "float32", "distances_delta", "zlib")
+    }
+    totals = dict.fromkeys(variants, 0)
+    frame_count = 0
+    for frame in scans:
+        frame_count += 1
+        for name, key in variants.items():
+            payload = encoder.encode(frame, *key)
+            totals[name] += len(payload.encode() if isinstance(payload, str) else payload)
+
+    if frame_count == 0:
+        raise ValueError("채널 프레임이 없음")
+    baseline = totals["json"]
+    return {
+        "frames": frame_count,
+        "keyframe_interval": keyframe_interval,
+        "threshold_cm": threshold_cm,
+        "codec": encoder.delta_codec.stats,
+        "results": {
+            name: {
+                "bytes_per_frame": round(total / frame_count, 1),
+                "saved_vs_json_pct": round(100.0 * (1 - total / baseline), 1)
+            }
+            for name, total in totals.items()
+        }
+    }
+
+def print_report(report):
+    print(f"📊 채널 프레임 {report['frames']}개, 키프레임 간격 {report['keyframe_interval']}, "
+          f"임계값 {report['threshold_cm']}cm")
+    for name, result in report['results'].items():
+        print(f"   - {name:18s} {result['bytes_per_frame']:10.1f} B/frame  "
+              f"(JSON 대비 {result['saved_vs_json_pct']:5.1f}% 절감)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Kanavi 델타 스트림 대역폭 벤치마크")
+    parser.add_argument("--frames", type=int, default=400, help="채널당 프레임 수")
+    parser.add_argument("--keyframe-interval", type=int, default=20)
+    parser.add_argument("--threshold-cm", type=int, default=0, help="이 값 이하의 변화는 무시")
+    parser.add_argument("--noise-cm", type=float, default=1.0, help="노이즈 표준편차 (cm)")
+    parser.add_argument("--capture", metavar="PATH", help="합성 장면 대신 캡처 파일 사용")
+    parser.add_argument("--udp-port", type=int, help="pcap에서 사용할 UDP 목적지 포트")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    if args.capture:
+        scans = capture_scans(args.capture, args.udp_port)
+    else:
+        scans = synthetic_scans(args.frames, noise_cm=args.noise_cm)
+    report = run(scans, args.keyframe_interval, args.threshold_cm)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""스캔 필터 처리 시간 / 희소 스트림 크기 벤치마크
+
+정적인 장면(bench_delta와 같은 방 + 움직이는 물체)에 고립 노이즈 스파이크와 무효 포인트를 섞은
+VL-R4 스캔을 KanaviScanFilter에 통과시켜 회전(전체 채널)당 처리 시간을 20Hz 프레임 예산(50ms)과
+비교하고, 남은 스파이크 비율과 points_sparse 전송 크기를 측정합니다.
+
+    python dev_tools/benchmarks/bench_filter.py --frames 400 --json
+    python dev_tools/benchmarks/bench_filter.py --temporal-window 1 --min-neighbors 0  # 범위 제한만
+    python dev_tools/benchmarks/bench_filter.py --capture field.knvcap --temporal-window 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_delta import capture_scans, synthetic_scans
+from mock_server_lidar import KanaviFrameEncoder, KanaviScanFilter
+
+FRAME_BUDGET_MS = 50.0  # 20Hz
+
+def noisy_scans(scans, spike_ratio=0.01, dropout_ratio=0.02, seed=1):
+    """스캔에 고립 스파이크(임의 거리)와 무효(0) 포인트 추가
+
+    스파이크 위치는 'spikes' 인덱스 배열로 함께 전달합니다 (제거율 측정용).
+    """
+    rng = np.random.default_rng(seed)
+    for scan in scans:
+        distances = scan['distances'].copy()
+        count = len(distances)
+        spikes = np.flatnonzero(rng.random(count) < spike_ratio)
+        distances[spikes] = rng.uniform(0.5, 40.0, len(spikes)).astype(np.float32)
+        distances[rng.random(count) < dropout_ratio] = 0.0
+        yield dict(scan, distances=distances, spikes=spikes, truth=scan['distances'])
+
+def run(scans, scan_filter):
+    """채널 프레임별 필터 적용 후 회전당 시간, 스파이크 제거율, 전송 크기 집계"""
+    encoder = KanaviFrameEncoder()
+    revolution_ms = defaultdict(float)  # sequence → 회전 내 채널 필터 시간 합계
+    channel_ms = []
+    spikes_total = 0
+    spikes_left = 0
+    sizes = dict.fromkeys(("json", "sparse_json", "binary_float32", "sparse_binary_float32", "sparse_binary_uint16"), 0)
+
+    for scan in scans:
+        start = time.perf_counter()
+        filtered = scan_filter.apply(scan)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        channel_ms.append(elapsed_ms)
+        revolution_ms[(scan['source_ip'], scan['lidar_id'], scan['sequence'])] += elapsed_ms
+
+        spikes = scan.get('spikes')
+        if spikes is not None and len(spikes):
+            truth = scan['truth'][spikes]
+            kept = filtered[spikes]
+            spikes_total += len(spikes)
+            # 남은 포인트가 실제 장면 거리와 50cm 넘게 다르면 제거되지 않은 스파이크
+            spikes_left += int(np.count_nonzero((kept > 0) & (np.abs(kept - truth) > 0.5)))
+
+        frame = dict(scan, filtered=filtered)
+        frame.pop('spikes', None)
+        frame.pop('truth', None)
+        for name, key in (("json", ("json", "float32", "distances")),
+                          ("sparse_json", ("json", "float32", "points_sparse")),
+                          ("binary_float32", ("binary", "float32", "distances")),
+                          ("sparse_binary_float32", ("binary", "float32", "points_sparse")),
+                          ("sparse_binary_uint16", ("binary", "uint16", "points_sparse"))):
+            payload = encoder.encode(frame, *key)
+            sizes[name] += len(payload.encode() if isinstance(payload, str) else payload)
+
+    if not channel_ms:
+        raise ValueError("채널 프레임이 없음")
+    revolutions = np.array(list(revolution_ms.values()))
+    channels = np.array(channel_ms)
+    stats = scan_filter.stats
+    return {
+        "channel_frames": len(channels),
+        "revolutions": len(revolutions),
+        "filter": {
+            "min_range": scan_filter.min_range,
+            "max_range": scan_filter.max_range,
+            "min_height": scan_filter.min_height,
+            "temporal_window": scan_filter.temporal_window,
+            "min_neighbors": scan_filter.min_neighbors
+        },
+        "channel_ms": {
+            "mean": round(float(channels.mean()), 4),
+            "p99": round(float(np.percentile(channels, 99)), 4)
+        },
+        "revolution_ms": {
+            "mean": round(float(revolutions.mean()), 4),
+            "p50": round(float(np.percentile(revolutions, 50)), 4),
+            "p99": round(float(np.percentile(revolutions, 99)), 4),
+            "max": round(float(revolutions.max()), 4)
+        },
+        "budget_ms": FRAME_BUDGET_MS,
+        "budget_used_p99_pct": round(100.0 * float(np.percentile(revolutions, 99)) / FRAME_BUDGET_MS, 3),
+        # 시간축 중앙값이 무효(0) 포인트를 채우기도 하므로 100%를 넘을 수 있음
+        "output_points_pct": round(100.0 * stats["points_out"] / max(stats["points_in"], 1), 1),
+        "spikes_removed_pct": round(100.0 * (1 - spikes_left / spikes_total), 1) if spikes_total else None,
+        "bytes_per_frame": {name: round(total / len(channels), 1) for name, total in sizes.items()}
+    }
+
+def print_report(report):
+    revolution = report['revolution_ms']
+    print(f"📊 채널 프레임 {report['channel_frames']}개 (회전 {report['revolutions']}개), 필터 설정 {report['filter']}")
+    print(f"   - 회전당 필터 시간 mean/p50/p99/max: {revolution['mean']} / {revolution['p50']} / "
+          f"{revolution['p99']} / {revolution['max']} ms "
+          f"(p99가 {report['budget_ms']}ms 예산의 {report['budget_used_p99_pct']}%)")
+    print(f"   - 출력 포인트 (입력 유효 포인트 대비): {report['output_points_pct']}%, "
+          f"스파이크 제거: {report['spikes_removed_pct']}%")
+    for name, size in report['bytes_per_frame'].items():
+        print(f"   - {name:22s} {size:10.1f} B/frame")
+
+def main():
+    parser = argparse.ArgumentParser(description="Kanavi 스캔 필터 벤치마크")
+    parser.add_argument("--frames", type=int, default=400, help="채널당 프레임 수")
+    parser.add_argument("--spike-ratio", type=float, default=0.01, help="스파이크 포인트 비율")
+    parser.add_argument("--dropout-ratio", type=float, default=0.02, help="무효(0) 포인트 비율")
+    parser.add_argument("--min-range", type=float, default=0.1)
+    parser.add_argument("--max-range", type=float, default=10.0, help="최대 거리 (기본값 10m: 12m 앞벽 제외, 장애물만)")
+    parser.add_argument("--min-height", type=float)
+    parser.add_argument("--temporal-window", type=int, default=3)
+    parser.add_argument("--min-neighbors", type=int, default=1)
+    parser.add_argument("--capture", metavar="PATH", help="합성 장면 대신 캡처 파일 사용 (스파이크 추가 안 함)")
+    parser.add_argument("--udp-port", type=int, help="pcap에서 사용할 UDP 목적지 포트")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    if args.capture:
+        scans = capture_scans(args.capture, args.udp_port)
+    else:
+        scans = noisy_scans(synthetic_scans(args.frames, noise_cm=1.0), args.spike_ratio, args.dropout_ratio)
+    scan_filter = KanaviScanFilter(min_range=args.min_range, max_range=args.max_range, min_height=args.min_height,
+                                   temporal_window=args.temporal_window, min_neighbors=args.min_neighbors)
+    report = run(scans, scan_filter)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
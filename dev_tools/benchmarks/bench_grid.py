@@ -0,0 +1,122 @@
+"""점유 격자 갱신 시간 / 전송 크기 벤치마크
+
+정적인 장면(bench_delta와 같은 방 + 움직이는 물체)의 VL-R4 스캔으로 KanaviOccupancyGrid를 갱신해
+회전(전체 채널)당 갱신 시간을 20Hz 프레임 예산(50ms)과 비교하고, 격자 전송 주기마다 보내는
+키프레임/델타 크기를 같은 시간 동안의 포인트 스트림(JSON, 바이너리) 전송량과 비교합니다.
+
+    python dev_tools/benchmarks/bench_grid.py --frames 400 --json
+    python dev_tools/benchmarks/bench_grid.py --resolution 0.05 --size 30 --rate 5
+    python dev_tools/benchmarks/bench_grid.py --capture field.knvcap
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_delta import capture_scans, synthetic_scans
+from mock_server_lidar import KanaviFrameEncoder, KanaviOccupancyGrid
+
+FRAME_BUDGET_MS = 50.0  # 20Hz
+
+def run(scans, grid):
+    """스캔별 격자 갱신 후 회전당 시간, 전송 주기별 격자 크기, 포인트 스트림 크기 집계"""
+    encoder = KanaviFrameEncoder()
+    revolution_ms = defaultdict(float)  # 회전 → 채널 갱신 시간 합계
+    grid_bytes = {"key": [], "delta": []}
+    grid_json_bytes = 0
+    point_bytes = dict.fromkeys(("json", "binary_float32"), 0)
+    first_timestamp = last_timestamp = None
+
+    for scan in scans:
+        start = time.perf_counter()
+        grid.update(scan)
+        revolution_ms[(scan['source_ip'], scan['lidar_id'], scan['sequence'])] += (time.perf_counter() - start) * 1000.0
+
+        for name, key in (("json", ("json", "float32")), ("binary_float32", ("binary", "float32"))):
+            payload = encoder.encode(scan, *key)
+            point_bytes[name] += len(payload.encode() if isinstance(payload, str) else payload)
+
+        # 스캔 시각 기준으로 전송 주기 재현
+        for update in grid.publish(scan['timestamp']):
+            grid_bytes[update['kind']].append(len(encoder.encode_grid(update, "binary")))
+            grid_json_bytes += len(encoder.encode_grid(update, "json"))
+        if first_timestamp is None:
+            first_timestamp = scan['timestamp']
+        last_timestamp = scan['timestamp']
+
+    if not revolution_ms:
+        raise ValueError("채널 프레임이 없음")
+    revolutions = np.array(list(revolution_ms.values()))
+    duration = max(last_timestamp - first_timestamp, 1e-6)
+    grid_total = sum(sum(sizes) for sizes in grid_bytes.values())
+    return {
+        "revolutions": len(revolutions),
+        "grid": {
+            "cells": f"{grid.cells}x{grid.cells}",
+            "resolution": grid.resolution,
+            "publish_rate_hz": round(1.0 / grid.publish_interval, 2),
+            "ray_table_bytes": sum(table.nbytes for table in grid.ray_tables.values())
+        },
+        "revolution_ms": {
+            "mean": round(float(revolutions.mean()), 4),
+            "p50": round(float(np.percentile(revolutions, 50)), 4),
+            "p99": round(float(np.percentile(revolutions, 99)), 4),
+            "max": round(float(revolutions.max()), 4)
+        },
+        "budget_ms": FRAME_BUDGET_MS,
+        "budget_used_p99_pct": round(100.0 * float(np.percentile(revolutions, 99)) / FRAME_BUDGET_MS, 3),
+        "grid_bytes": {
+            kind: round(sum(sizes) / len(sizes), 1) if sizes else None
+            for kind, sizes in grid_bytes.items()
+        },
+        # 초당 전송량 (격자 바이너리/JSON vs 전체 채널 포인트 스트림)
+        "kbps": {
+            "grid_binary": round(grid_total * 8 / duration / 1000.0, 1),
+            "grid_json": round(grid_json_bytes * 8 / duration / 1000.0, 1),
+            "points_json": round(point_bytes["json"] * 8 / duration / 1000.0, 1),
+            "points_binary_float32": round(point_bytes["binary_float32"] * 8 / duration / 1000.0, 1)
+        }
+    }
+
+def print_report(report):
+    revolution = report['revolution_ms']
+    print(f"📊 회전 {report['revolutions']}개, 격자 {report['grid']}")
+    print(f"   - 회전당 갱신 시간 mean/p50/p99/max: {revolution['mean']} / {revolution['p50']} / "
+          f"{revolution['p99']} / {revolution['max']} ms "
+          f"(p99가 {report['budget_ms']}ms 예산의 {report['budget_used_p99_pct']}%)")
+    print(f"   - 격자 전송 크기 (바이너리): 키프레임 {report['grid_bytes']['key']} B, "
+          f"델타 {report['grid_bytes']['delta']} B")
+    for name, kbps in report['kbps'].items():
+        print(f"   - {name:22s} {kbps:10.1f} kbps")
+
+def main():
+    parser = argparse.ArgumentParser(description="Kanavi 점유 격자 벤치마크")
+    parser.add_argument("--frames", type=int, default=400, help="채널당 프레임 수")
+    parser.add_argument("--resolution", type=float, default=0.1, help="격자 칸 크기 (m)")
+    parser.add_argument("--size", type=float, default=40.0, help="격자 한 변 길이 (m)")
+    parser.add_argument("--rate", type=float, default=2.0, help="격자 전송 주기 (Hz)")
+    parser.add_argument("--keyframe-interval", type=int, default=10)
+    parser.add_argument("--capture", metavar="PATH", help="합성 장면 대신 캡처 파일 사용")
+    parser.add_argument("--udp-port", type=int, help="pcap에서 사용할 UDP 목적지 포트")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    if args.capture:
+        scans = capture_scans(args.capture, args.udp_port)
+    else:
+        scans = synthetic_scans(args.frames)
+    grid = KanaviOccupancyGrid(resolution=args.resolution, size=args.size, publish_rate_hz=args.rate,
+                               keyframe_interval=args.keyframe_interval)
+    report = run(scans, grid)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""공유 메모리 스캔 공개 지연 시간 벤치마크
+
+정적인 장면(bench_delta와 같은 방 + 움직이는 물체)의 VL-R4 스캔을 SharedScanPublisher로 공개하고,
+다른 프로세스의 SharedScanReader가 새 스캔을 확인해 NumPy 뷰로 읽기까지의 지연 시간(공개 → 읽기)을 잽니다.
+비교용으로 같은 스캔의 WebSocket 메시지 직렬화 + 역직렬화 시간(JSON, 바이너리)도 측정합니다 (전송 시간 제외).
+
+    python dev_tools/benchmarks/bench_shm.py --frames 400 --spin-ms 10 --json
+    python dev_tools/benchmarks/bench_shm.py --interval-ms 50 --spin-ms 0  # 20Hz, 바쁜 대기 없이
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_delta import synthetic_scans
+from kanavi_shm import SharedScanPublisher, SharedScanReader
+from mock_server_lidar import KanaviFrameEncoder
+
+def reader_main(name, count, spin_seconds, ready, result_queue):
+    """읽기 프로세스: count개 스캔을 받을 때까지 새 스캔마다 지연 시간 기록"""
+    reader = SharedScanReader(name, child_process=True)
+    cursor = {}
+    latencies = []
+    invalid = 0
+    valid_points = 0
+    scan = None
+    generation = reader.generation()
+    ready.set()
+    deadline = time.time() + 30.0
+    while len(latencies) < count and time.time() < deadline:
+        generation = reader.wait(generation, timeout=1.0, spin_seconds=spin_seconds)
+        for scan in reader.updates(cursor):
+            latencies.append(time.time() - scan["published_at"])
+            valid_points += int(np.count_nonzero(scan["distances"]))  # 뷰를 직접 사용 (복사 없음)
+            if not reader.valid(scan):
+                invalid += 1
+    stats = dict(reader.stats, invalid=invalid, valid_points=valid_points)
+    del scan  # 공유 메모리를 가리키는 뷰를 모두 해제해야 닫을 수 있음
+    reader.close()
+    result_queue.put((latencies, stats))
+
+def summary_us(values):
+    values = np.asarray(values) * 1e6
+    return {
+        "mean": round(float(values.mean()), 2),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2)
+    }
+
+def serialization_us(scans):
+    """채널 프레임당 WebSocket 메시지 직렬화 + 역직렬화 시간 (µs)"""
+    encoder = KanaviFrameEncoder()
+    timings = {"json": [], "binary_float32": []}
+    for scan in scans:
+        start = time.perf_counter()
+        message = json.loads(encoder.encode(scan, "json"))
+        np.asarray(message["distances"], dtype=np.float32)
+        timings["json"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        payload = encoder.encode(scan, "binary", "float32")
+        np.frombuffer(payload, dtype='<f4', count=scan["pointsize"], offset=KanaviFrameEncoder.BINARY_HEADER.size)
+        timings["binary_float32"].append(time.perf_counter() - start)
+    return {name: summary_us(values) for name, values in timings.items()}
+
+def run(scans, interval, spin_seconds, depth):
+    """회전(채널 4개)마다 interval초 간격으로 공개하고 읽기 프로세스의 지연 시간 집계"""
+    name = f"kanavi_bench_{os.getpid()}"
+    publisher = SharedScanPublisher(name, max_streams=8, depth=depth)
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    result_queue = context.Queue()
+    process = context.Process(target=reader_main, args=(name, len(scans), spin_seconds, ready, result_queue))
+    process.start()
+    try:
+        ready.wait(10.0)
+        publish_times = []
+        next_time = time.perf_counter()
+        for scan in scans:
+            if scan["channel"] == 0:
+                next_time += interval
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            start = time.perf_counter()
+            publisher.publish(scan)
+            publish_times.append(time.perf_counter() - start)
+        latencies, reader_stats = result_queue.get(timeout=60.0)
+        process.join(5.0)
+    finally:
+        if process.is_alive():
+            process.terminate()
+        publisher_stats = publisher.get_stats()
+        publisher.close()
+
+    return {
+        "channel_frames": len(scans),
+        "interval_ms": interval * 1000.0,
+        "spin_ms": spin_seconds * 1000.0,
+        "shared_memory_bytes": publisher_stats["bytes"],
+        "publish_us": summary_us(publish_times),
+        "latency_us": summary_us(latencies) if latencies else None,
+        "reader": reader_stats,
+        "serialize_deserialize_us": serialization_us(scans)
+    }
+
+def print_report(report):
+    print(f"📊 채널 프레임 {report['channel_frames']}개, 회전 간격 {report['interval_ms']}ms, "
+          f"바쁜 대기 {report['spin_ms']}ms, 공유 메모리 {report['shared_memory_bytes']}바이트")
+    for name in ("publish_us", "latency_us"):
+        values = report[name]
+        print(f"   - {name:14s} mean/p50/p99/max: {values['mean']} / {values['p50']} / {values['p99']} / {values['max']} µs")
+    print(f"   - 읽기: {report['reader']}")
+    for name, values in report["serialize_deserialize_us"].items():
+        print(f"   - 비교 {name:14s} 직렬화+역직렬화 mean/p99: {values['mean']} / {values['p99']} µs")
+
+def main():
+    parser = argparse.ArgumentParser(description="Kanavi 공유 메모리 공개 벤치마크")
+    parser.add_argument("--frames", type=int, default=400, help="채널당 프레임 수")
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="회전 간격 (ms, 50이면 20Hz)")
+    parser.add_argument("--spin-ms", type=float, default=1.0, help="읽기 쪽 바쁜 대기 시간 (ms)")
+    parser.add_argument("--depth", type=int, default=4, help="스트림당 슬롯 수")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+
+    scans = list(synthetic_scans(args.frames))
+    report = run(scans, args.interval_ms / 1000.0, args.spin_ms / 1000.0, args.depth)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
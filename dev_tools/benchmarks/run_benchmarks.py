@@ -0,0 +1,512 @@
+"""mock_server_lidar.py 핫 패스 벤치마크 모음 (기준값 비교)
+
+센서 없이 가상 Kanavi 패킷(kanavi_loadgen의 KanaviSensorSimulator)과 루프백 WebSocket 클라이언트로
+다음 항목을 측정하고, 커밋 간 비교할 수 있는 JSON 보고서를 만듭니다.
+
+  - parse:     KanaviLidarParser.parse_kanavi_packet / KanaviStreamParser.parse_many(64개 배치) 모델별 처리량 (packets/s)
+  - workers:   가상 VL-R4 4대의 수신 파이프라인(파싱 + 스캔 필터 + 수신 콜백)을 파서 워커 0/1/2/4개(KanaviParserPool)로
+               처리할 때의 처리량과 워커 0개 대비 배율
+  - convert:   on_lidar_data_received 패킷당 변환 비용 (스캔 필터 없음 / 기본 스캔 필터)
+  - serialize: 채널 프레임 JSON 직렬화 크기와 시간 (바이너리 uint16 비교용)
+  - fanout:    broadcast_to_clients 호출 시간과 모든 클라이언트 수신까지의 시간 (클라이언트 1/10/100개)
+  - stall:     읽지 않는 클라이언트가 있을 때 data_queue/송신 버퍼/메모리(tracemalloc) 증가량
+
+    python dev_tools/benchmarks/run_benchmarks.py --output report.json
+    python dev_tools/benchmarks/run_benchmarks.py --compare dev_tools/benchmarks/baseline.json
+    python dev_tools/benchmarks/run_benchmarks.py --quick --only parse,serialize --json
+    python dev_tools/benchmarks/run_benchmarks.py --save-baseline  # baseline.json 갱신
+
+--compare는 기준값보다 --tolerance(기본값 20%) 넘게 나빠진 지표(limit이 있는 지표는 상한 초과)를 표시하고
+종료 코드 1을 돌려줍니다.
+시간 지표는 PC마다 다르므로 같은 PC에서 만든 기준값과 비교해야 합니다.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from kanavi_loadgen import MODEL_PRODUCT_LINES, KanaviSensorSimulator
+import mock_server_lidar
+from mock_server_lidar import (KanaviLidarParser, KanaviScanFilter, KanaviStreamParser,
+                               KanaviWebSocketServer, handle_client)
+
+REPORT_VERSION = 1
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SUITES = ("parse", "workers", "convert", "serialize", "fanout", "stall")
+SOURCE_ADDR = ("192.168.0.10", 2020)
+PARSE_BATCH_SIZE = 64  # 수신기 배치 수신 기본값과 같음
+
+def metric(value, unit, better, limit=None):
+    """보고서 지표 (better: "higher" 또는 "lower", 비교하지 않는 정보성 지표는 None)
+
+    limit: 0 근처에서 변하는 지표처럼 변화율 비교가 의미 없으면 기준값 대신 이 상한으로 판정
+    """
+    result = {"value": round(float(value), 3), "unit": unit, "better": better}
+    if limit is not None:
+        result["limit"] = limit
+    return result
+
+def percentile_us(values, percent):
+    return float(np.percentile(np.asarray(values) * 1e6, percent))
+
+def model_packets(model, revolutions):
+    """모델별 가상 센서 패킷 목록 (회전 순서대로 평탄화)"""
+    sensor = KanaviSensorSimulator(model, 1, variants=min(revolutions, 40))
+    return [packet for _ in range(revolutions) for packet in sensor.next_packets()]
+
+def bench_parse(config):
+    """모델별 parse_kanavi_packet(패킷 하나씩) / parse_many(배치) 처리량 (repeats번 중 중앙값)"""
+    metrics = {}
+    for model in MODEL_PRODUCT_LINES:
+        packets = model_packets(model, config["revolutions"])
+        batches = [[(packet, SOURCE_ADDR) for packet in packets[index:index + PARSE_BATCH_SIZE]]
+                   for index in range(0, len(packets), PARSE_BATCH_SIZE)]
+        parser = KanaviLidarParser()
+        stream_parser = KanaviStreamParser(KanaviLidarParser())
+        rates = []
+        batch_rates = []
+        for _ in range(config["repeats"]):
+            start = time.perf_counter()
+            for packet in packets:
+                parser.parse_kanavi_packet(packet)
+            rates.append(len(packets) / (time.perf_counter() - start))
+            start = time.perf_counter()
+            for batch in batches:
+                stream_parser.parse_many(batch)
+            batch_rates.append(len(packets) / (time.perf_counter() - start))
+        for stats in (parser.stats, stream_parser.stats):
+            if stats["invalid"] or stats["checksum_errors"] or stats["parse_errors"] or stats["skipped_bytes"]:
+                raise RuntimeError(f"{model} 가상 패킷 파싱 실패: {stats}")
+        metrics[f"parse.{model}.packets_per_s"] = metric(np.median(rates), "packets/s", "higher")
+        metrics[f"parse.{model}.batch_packets_per_s"] = metric(np.median(batch_rates), "packets/s", "higher")
+    return metrics
+
+def sensor_batches(sensor_count, revolutions):
+    """가상 VL-R4 sensor_count대(센서마다 다른 source_ip)의 회전별 패킷을 PARSE_BATCH_SIZE개 배치로 묶음"""
+    sensors = [KanaviSensorSimulator("VL-R4", 1, variants=min(revolutions, 20), seed=index)
+               for index in range(sensor_count)]
+    datagrams = [(packet, (f"192.168.0.{10 + index}", 2020))
+                 for _ in range(revolutions)
+                 for index, sensor in enumerate(sensors)
+                 for packet in sensor.next_packets()]
+    return [datagrams[index:index + PARSE_BATCH_SIZE] for index in range(0, len(datagrams), PARSE_BATCH_SIZE)]
+
+def pipeline_callback(server):
+    """서버 수신 콜백 (on_lidar_data_received, 데이터 큐가 절반 넘게 차면 비움)"""
+    def receive(parsed_data, addr):
+        server.on_lidar_data_received(parsed_data, addr)
+        if server.data_queue.qsize() > server.data_queue.maxsize // 2:
+            drain_queue(server)
+    return receive
+
+def pool_throughput(pool, callback, batches, timeout=60.0):
+    """파서 풀에 배치를 넣고 모든 결과가 콜백에 도착할 때까지의 처리량 (packets/s, 버린 데이터그램 수)
+
+    풀의 흐름 제어 상한을 넘겨 버리지 않도록 워커별 처리 대기 데이터그램이 상한 절반을 넘지 않게 나눠 넣습니다.
+    """
+    pool.start(callback)
+
+    def finished():
+        return pool.stats["decoded"] + pool.stats["backpressure_drops"] + pool.stats["overrun_drops"]
+
+    try:
+        # 워커 프로세스 시작/첫 import 비용 제외
+        pool.submit_batch(batches[0])
+        deadline = time.time() + timeout
+        while finished() < len(batches[0]) and time.time() < deadline:
+            time.sleep(0.001)
+
+        total = sum(len(batch) for batch in batches)
+        done_before = finished()
+        start = time.perf_counter()
+        for batch in batches:
+            while max(pool.in_flight) > pool.max_in_flight // 2:
+                time.sleep(0.0005)
+            pool.submit_batch(batch)
+        while finished() - done_before < total:
+            if time.time() > deadline + timeout:
+                raise RuntimeError(f"파서 워커 {pool.worker_count}개 결과 수집 시간 초과: {pool.stats}")
+            time.sleep(0.0005)
+        elapsed = time.perf_counter() - start
+        return total / elapsed, pool.stats["backpressure_drops"] + pool.stats["overrun_drops"]
+    finally:
+        pool.stop()
+
+def bench_workers(config):
+    """파서 워커 수별 수신 파이프라인 처리량 (가상 VL-R4 4대, 파싱 + CLI 기본 스캔 필터 + on_lidar_data_received)
+
+    워커 0개는 이벤트 루프와 같이 parse_many 결과를 바로 콜백에 넘기고 콜백이 필터를 적용합니다.
+    워커가 있으면 파싱과 필터는 워커가, 나머지 콜백은 수집 스레드가 처리합니다.
+    CPU 코어가 워커 수보다 적으면 배율이 오르지 않으므로 보고서의 environment.cpu_count와 함께 봐야 합니다.
+    저장소의 baseline.json은 단일 코어 PC에서 만들어 이 항목을 뺐습니다(멀티코어 PC에서 --save-baseline으로 추가).
+    """
+    batches = sensor_batches(4, config["revolutions"])
+    total = sum(len(batch) for batch in batches)
+    metrics = {}
+    rates = {}
+    for worker_count in config["parse_workers"]:
+        server = KanaviWebSocketServer(adaptive_rate=False, scan_filter=KanaviScanFilter(),
+                                       parse_workers=worker_count)
+        callback = pipeline_callback(server)
+        if worker_count == 0:
+            stream_parser = KanaviStreamParser()
+            samples = []
+            for _ in range(config["repeats"]):
+                start = time.perf_counter()
+                for batch in batches:
+                    for parsed_data, addr in stream_parser.parse_many(batch):
+                        callback(parsed_data, addr)
+                samples.append(total / (time.perf_counter() - start))
+            rate, drops = float(np.median(samples)), 0
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):  # 워커 시작/종료 출력 생략
+                rate, drops = pool_throughput(server.parser_pool, callback, batches)
+        rates[worker_count] = rate
+        prefix = f"workers.{worker_count}_workers"
+        metrics[f"{prefix}.packets_per_s"] = metric(rate, "packets/s", "higher")
+        metrics[f"{prefix}.drops"] = metric(drops, "packets", "lower", limit=0)
+    if 0 in rates:
+        for worker_count, rate in rates.items():
+            if worker_count:
+                metrics[f"workers.{worker_count}_workers.speedup"] = metric(rate / rates[0], "x", None)
+    return metrics
+
+def drain_queue(server):
+    """데이터 큐 비우기 → 꺼낸 항목 목록"""
+    items = []
+    while not server.data_queue.empty():
+        items.append(server.data_queue.get_nowait()[0])
+    return items
+
+def bench_convert(config):
+    """on_lidar_data_received 패킷당 시간 (VL-R4, 스캔 필터 없음 / CLI 기본 스캔 필터)"""
+    parser = KanaviLidarParser()
+    parsed = [parser.parse_kanavi_packet(packet) for packet in model_packets("VL-R4", config["revolutions"])]
+    metrics = {}
+    for name, scan_filter in (("no_filter", None), ("scan_filter", KanaviScanFilter())):
+        server = KanaviWebSocketServer(adaptive_rate=False, scan_filter=scan_filter)
+        timings = []
+        for _ in range(config["repeats"]):
+            for parsed_data in parsed:
+                start = time.perf_counter()
+                server.on_lidar_data_received(dict(parsed_data, received_at=time.time()), SOURCE_ADDR)
+                timings.append(time.perf_counter() - start)
+                if server.data_queue.qsize() > server.data_queue.maxsize // 2:
+                    drain_queue(server)
+        metrics[f"convert.{name}.p50_us"] = metric(percentile_us(timings, 50), "us", "lower")
+        metrics[f"convert.{name}.p99_us"] = metric(percentile_us(timings, 99), "us", "lower")
+    return metrics
+
+def pipeline_frames(revolutions, model="VL-R4"):
+    """서버 변환 경로를 거친 채널 프레임(lidar) 목록"""
+    parser = KanaviLidarParser()
+    server = KanaviWebSocketServer(adaptive_rate=False)
+    frames = []
+    for packet in model_packets(model, revolutions):
+        server.on_lidar_data_received(parser.parse_kanavi_packet(packet), SOURCE_ADDR)
+        frames.extend(item for item in drain_queue(server) if item["type"] == "lidar")
+    return frames
+
+def bench_serialize(config):
+    """채널 프레임 직렬화 크기/시간 (JSON 기본 형식, 바이너리 uint16 비교)"""
+    frames = pipeline_frames(config["revolutions"])
+    encoder = mock_server_lidar.KanaviFrameEncoder()
+    metrics = {}
+    for name, key in (("json", ("json", "float32")), ("binary_uint16", ("binary", "uint16"))):
+        timings = []
+        sizes = []
+        for _ in range(config["repeats"]):
+            for frame in frames:
+                start = time.perf_counter()
+                payload = encoder.encode(frame, *key)
+                timings.append(time.perf_counter() - start)
+                sizes.append(len(payload.encode() if isinstance(payload, str) else payload))
+        metrics[f"serialize.{name}.bytes"] = metric(np.mean(sizes), "bytes", "lower")
+        metrics[f"serialize.{name}.p50_us"] = metric(percentile_us(timings, 50), "us", "lower")
+        metrics[f"serialize.{name}.p99_us"] = metric(percentile_us(timings, 99), "us", "lower")
+    return metrics
+
+async def serve_loopback(server):
+    """서버를 루프백 임의 포트로 시작 → (websockets 서버, URL)"""
+    websocket_server = await websockets.serve(handle_client, "127.0.0.1", 0, max_size=None)
+    websocket_server.server_instance = server
+    port = websocket_server.sockets[0].getsockname()[1]
+    return websocket_server, f"ws://127.0.0.1:{port}"
+
+async def connect_clients(url, count, **kwargs):
+    """클라이언트 count개 연결 (연결 환영 메시지까지 수신)"""
+    clients = []
+    for _ in range(count):
+        client = await websockets.connect(url, max_size=None, **kwargs)
+        await client.recv()
+        clients.append(client)
+    return clients
+
+async def connect_stalled_client(url):
+    """수신 큐 1개만 채우고 더 읽지 않는 클라이언트 (작은 수신 버퍼로 서버 송신이 곧 막힘)"""
+    host, port = url.rsplit("/", 1)[-1].split(":")
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect((host, int(port)))
+    sock.setblocking(False)
+    return (await connect_clients(url, 1, sock=sock, max_queue=1))[0]
+
+async def fanout_step(server, url, client_count, frames):
+    """클라이언트 client_count개에 프레임을 하나씩 브로드캐스트하고 호출/전달 시간 측정
+
+    다음 프레임은 모든 클라이언트가 이전 프레임을 받은 뒤 보냅니다 (클라이언트는 같은 프로세스).
+    """
+    clients = await connect_clients(url, client_count)
+    broadcast_times = []
+    delivery_times = []
+    try:
+        for frame in frames:
+            start = time.perf_counter()
+            await server.broadcast_to_clients(frame)
+            broadcast_times.append(time.perf_counter() - start)
+            await asyncio.wait_for(asyncio.gather(*(client.recv() for client in clients)), 10.0)
+            delivery_times.append(time.perf_counter() - start)
+    finally:
+        await asyncio.gather(*(client.close() for client in clients))
+        while server.connected_clients:
+            await asyncio.sleep(0.01)
+    return broadcast_times, delivery_times
+
+async def bench_fanout(config):
+    """broadcast_to_clients 팬아웃 (클라이언트 수별, JSON 인코딩)"""
+    frames = pipeline_frames(max(config["revolutions"] // 4, 10))
+    server = KanaviWebSocketServer(adaptive_rate=False)
+    websocket_server, url = await serve_loopback(server)
+    metrics = {}
+    try:
+        for client_count in config["fanout_clients"]:
+            broadcast_times, delivery_times = await fanout_step(server, url, client_count, frames)
+            prefix = f"fanout.{client_count}_clients"
+            metrics[f"{prefix}.broadcast_p50_us"] = metric(percentile_us(broadcast_times, 50), "us", "lower")
+            metrics[f"{prefix}.broadcast_p99_us"] = metric(percentile_us(broadcast_times, 99), "us", "lower")
+            metrics[f"{prefix}.delivery_p50_ms"] = metric(percentile_us(delivery_times, 50) / 1000.0, "ms", "lower")
+            metrics[f"{prefix}.delivery_p99_ms"] = metric(percentile_us(delivery_times, 99) / 1000.0, "ms", "lower")
+    finally:
+        websocket_server.close()
+        await websocket_server.wait_closed()
+    return metrics
+
+async def bench_stall(config):
+    """읽지 않는 클라이언트 1개 + 정상 클라이언트 1개에 stall_seconds 동안 VL-R4 스캔을 보내며 메모리 추적
+
+    정상 상태라면 data_queue와 클라이언트 송신 버퍼가 크기 제한 안에 머물러 메모리가 늘지 않아야 합니다.
+    """
+    parser = KanaviLidarParser()
+    parsed = [parser.parse_kanavi_packet(packet) for packet in model_packets("VL-R4", 40)]
+    server = KanaviWebSocketServer()
+    websocket_server, url = await serve_loopback(server)
+    stalled = await connect_stalled_client(url)
+    reader = (await connect_clients(url, 1))[0]
+
+    async def read_forever():
+        try:
+            async for _ in reader:
+                pass
+        except websockets.ConnectionClosed:
+            pass
+
+    reader_task = asyncio.create_task(read_forever())
+    server.receiving = True
+    broadcast_task = asyncio.create_task(server.broadcast_data_loop())
+    stalled_session = next(session for session in server.connected_clients.values()
+                           if session.websocket.remote_address[1] == stalled.local_address[1])
+    # 루프백에서는 서버 커널 송신 버퍼(수 MB)가 먼저 쌓이므로 줄여서 느린 원격 클라이언트처럼 만듦
+    stalled_session.websocket.transport.get_extra_info("socket").setsockopt(
+        socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+
+    interval = 1.0 / config["stall_rate_hz"]
+    duration = config["stall_seconds"]
+    samples = []
+    data_queue_max = 0
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        next_sample = start + duration / 2  # 앞 절반은 버퍼가 차는 구간
+        index = 0
+        while time.perf_counter() - start < duration:
+            for _ in range(4):  # 한 회전 (채널 4개)
+                server.on_lidar_data_received(dict(parsed[index % len(parsed)], received_at=time.time()),
+                                              SOURCE_ADDR)
+                index += 1
+            data_queue_max = max(data_queue_max, server.data_queue.qsize())
+            if time.perf_counter() >= next_sample:
+                samples.append(tracemalloc.get_traced_memory()[0])
+                next_sample += duration / 20
+            await asyncio.sleep(interval)
+        memory_end, memory_peak = tracemalloc.get_traced_memory()
+        stalled_queued = stalled_session.queued_frames()
+        write_buffer = stalled_session.websocket.transport.get_write_buffer_size()
+    finally:
+        tracemalloc.stop()
+        server.receiving = False
+        await broadcast_task
+        reader_task.cancel()
+        stalled_session.close()
+        stalled.transport.abort()
+        await reader.close()
+        websocket_server.close()
+        await websocket_server.wait_closed()
+
+    memory_start = samples[0] if samples else memory_end
+    return {
+        "stall.memory_growth_kb": metric((memory_end - memory_start) / 1024.0, "KiB", "lower", limit=256),
+        "stall.memory_peak_kb": metric(memory_peak / 1024.0, "KiB", "lower"),
+        "stall.data_queue_max": metric(data_queue_max, "items", "lower", limit=server.data_queue.maxsize // 2),
+        "stall.data_queue_drops": metric(server.data_queue_drops, "items", None),
+        "stall.stalled_client_queued": metric(stalled_queued, "frames", "lower"),
+        "stall.stalled_client_drops": metric(stalled_session.dropped_frames, "frames", None),
+        "stall.stalled_client_sent": metric(stalled_session.sent_frames, "frames", None),
+        "stall.stalled_write_buffer_kb": metric(write_buffer / 1024.0, "KiB", None),
+        "stall.packets": metric(index, "packets", None)
+    }
+
+def git_commit():
+    """현재 커밋 해시 (git 저장소가 아니면 None)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(config, suites):
+    """선택한 항목을 실행해 보고서 dict 생성"""
+    mock_server_lidar.set_log_level("quiet")  # 큐가 가득 찰 때의 경고 등 생략
+    metrics = {}
+    durations = {}
+    for suite in suites:
+        start = time.perf_counter()
+        if suite == "parse":
+            metrics.update(bench_parse(config))
+        elif suite == "workers":
+            metrics.update(bench_workers(config))
+        elif suite == "convert":
+            metrics.update(bench_convert(config))
+        elif suite == "serialize":
+            metrics.update(bench_serialize(config))
+        elif suite in ("fanout", "stall"):
+            # 서버의 클라이언트 연결/해제 출력 생략
+            with contextlib.redirect_stdout(io.StringIO()):
+                metrics.update(asyncio.run(bench_fanout(config) if suite == "fanout" else bench_stall(config)))
+        durations[suite] = round(time.perf_counter() - start, 2)
+    return {
+        "version": REPORT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "websockets": websockets.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": config,
+        "suite_seconds": durations,
+        "metrics": metrics
+    }
+
+def compare(report, baseline, tolerance):
+    """기준값 대비 변화율 → (비교 결과 목록, 나빠진 지표 수)"""
+    rows = []
+    regressions = 0
+    for name, current in report["metrics"].items():
+        base = baseline.get("metrics", {}).get(name)
+        if base is None or current["better"] is None:
+            continue
+        if base["value"] == 0:
+            change = 0.0 if current["value"] == 0 else float("inf")
+        else:
+            change = (current["value"] - base["value"]) / abs(base["value"])
+        if "limit" in current:
+            worse = current["value"] > current["limit"]
+        else:
+            worse = change < -tolerance if current["better"] == "higher" else change > tolerance
+        regressions += worse
+        rows.append({"metric": name, "baseline": base["value"], "current": current["value"],
+                     "change_pct": round(change * 100.0, 1), "regression": worse})
+    return rows, regressions
+
+def print_report(report, comparison=None):
+    print(f"📊 벤치마크 ({report['commit'] or '커밋 없음'}, Python {report['environment']['python']}, "
+          f"항목별 소요 시간 {report['suite_seconds']})")
+    rows = {row["metric"]: row for row in comparison or []}
+    for name, value in report["metrics"].items():
+        line = f"   - {name:42s} {value['value']:>14} {value['unit']}"
+        row = rows.get(name)
+        if row:
+            line += f"  (기준 {row['baseline']}, {row['change_pct']:+.1f}%{' ⚠️ 나빠짐' if row['regression'] else ''})"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="mock_server_lidar.py 핫 패스 벤치마크")
+    parser.add_argument("--only", help=f"실행할 항목 (쉼표 구분: {', '.join(SUITES)})")
+    parser.add_argument("--quick", action="store_true", help="반복 수를 줄여 빠르게 실행 (기준값 비교에는 부정확)")
+    parser.add_argument("--revolutions", type=int, default=200, help="항목별 가상 센서 회전 수")
+    parser.add_argument("--repeats", type=int, default=5, help="parse/convert/serialize 반복 횟수")
+    parser.add_argument("--parse-workers", default="0,1,2,4", help="파서 워커 수 (쉼표 구분, 0은 워커 없이 파싱)")
+    parser.add_argument("--fanout-clients", default="1,10,100", help="팬아웃 클라이언트 수 (쉼표 구분)")
+    parser.add_argument("--stall-seconds", type=float, default=6.0, help="읽지 않는 클라이언트 측정 시간 (초)")
+    parser.add_argument("--stall-rate", type=float, default=50.0, help="측정 중 초당 회전 수")
+    parser.add_argument("--output", metavar="PATH", help="보고서를 JSON 파일로 저장")
+    parser.add_argument("--compare", metavar="PATH", help="기준값 보고서와 비교 (나빠진 지표가 있으면 종료 코드 1)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="허용 변화율 (0.2 = 20%%)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"보고서를 기준값 파일로 저장 ({BASELINE_PATH})")
+    parser.add_argument("--json", action="store_true", help="보고서를 JSON으로 출력")
+    args = parser.parse_args()
+
+    suites = args.only.split(",") if args.only else list(SUITES)
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"알 수 없는 항목: {', '.join(sorted(unknown))}")
+    if args.quick:
+        args.revolutions, args.repeats, args.stall_seconds = 40, 2, 2.0
+    config = {
+        "revolutions": args.revolutions,
+        "repeats": args.repeats,
+        "parse_workers": [int(count) for count in args.parse_workers.split(",") if count],
+        "fanout_clients": [int(count) for count in args.fanout_clients.split(",") if count],
+        "stall_seconds": args.stall_seconds,
+        "stall_rate_hz": args.stall_rate
+    }
+
+    report = run(config, suites)
+    comparison = regressions = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        comparison, regressions = compare(report, baseline, args.tolerance)
+        report["comparison"] = {"baseline": args.compare, "baseline_commit": baseline.get("commit"),
+                                "tolerance": args.tolerance, "regressions": regressions, "metrics": comparison}
+
+    for path in filter(None, (args.output, BASELINE_PATH if args.save_baseline else None)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, comparison)
+        if regressions:
+            print(f"⚠️  기준값보다 {args.tolerance * 100:.0f}% 넘게 나빠진 지표 {regressions}개")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
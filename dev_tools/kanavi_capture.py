@@ -0,0 +1,191 @@
+import mmap
+import os
+import struct
+import time
+
+from kanavi_net import pack_ipv4, unpack_ipv4
+
+# Kanavi 캡처 파일 (Little Endian)
+#   파일 헤더 16바이트 = magic 'KNVCAP01', version(u16), reserved
+#   레코드 = 레코드 헤더 16바이트 + 데이터그램
+#   레코드 헤더 = timestamp(f64, 수신 시각), source_ip(u32), source_port(u16), length(u16)
+CAPTURE_MAGIC = b'KNVCAP01'
+CAPTURE_VERSION = 1
+FILE_HEADER = struct.Struct('<8sH6x')
+RECORD_HEADER = struct.Struct('<dIHH')
+
+# libpcap 파일 (Wireshark/tcpdump 캡처)
+PCAP_MAGICS = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9)
+}
+PCAP_HEADER_SIZE = 24
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (101, 12)
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+class KanaviCaptureWriter:
+    """원시 데이터그램을 캡처 파일 끝에 이어서 기록 (append-only)
+
+    파일은 첫 기록 때 열리고 close() 후 다시 기록하면 이어서 씁니다.
+    기록 도중 종료되어 마지막 레코드가 잘려도 읽기 쪽은 그 앞까지 사용합니다.
+    """
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.file = None
+        self.last_flush = 0.0
+        self.stats = {
+            "path": path,
+            "records": 0,
+            "bytes": 0
+        }
+
+    def open(self):
+        """캡처 파일 열기 (새 파일이면 헤더 기록)"""
+        self.file = open(self.path, 'ab', buffering=1024 * 1024)
+        if self.file.tell() == 0:
+            self.file.write(FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION))
+        self.last_flush = time.monotonic()
+
+    def write(self, data, addr, timestamp=None):
+        """데이터그램 1개 기록"""
+        if self.file is None:
+            self.open()
+        length = min(len(data), 0xFFFF)
+        self.file.write(RECORD_HEADER.pack(
+            time.time() if timestamp is None else timestamp,
+            pack_ipv4(addr[0]),
+            addr[1] & 0xFFFF,
+            length
+        ))
+        self.file.write(data[:length])
+        self.stats["records"] += 1
+        self.stats["bytes"] += RECORD_HEADER.size + length
+
+        now = time.monotonic()
+        if now - self.last_flush >= self.flush_interval:
+            self.file.flush()
+            self.last_flush = now
+
+    def close(self):
+        """버퍼를 비우고 파일 닫기"""
+        if self.file:
+            self.file.close()
+            self.file = None
+
+class KanaviCaptureReader:
+    """캡처 파일 읽기 (mmap)
+
+    Kanavi 캡처 파일과 libpcap 파일(Ethernet/Linux SLL/Raw IP, IPv4 UDP)을 모두 읽습니다.
+    반복하면 (timestamp, data, (source_ip, source_port)) 를 기록 순서대로 돌려줍니다.
+    udp_port를 지정하면 pcap에서 해당 목적지 포트의 UDP만 사용합니다.
+    """
+
+    def __init__(self, path, udp_port=None):
+        self.path = path
+        self.udp_port = udp_port
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        magic = bytes(self.buffer[:8])
+        if magic == CAPTURE_MAGIC:
+            _, version = FILE_HEADER.unpack_from(self.buffer, 0)
+            if version != CAPTURE_VERSION:
+                self.close()
+                raise ValueError(f"지원하지 않는 캡처 파일 버전: {version}")
+            self.format = "kanavi"
+        elif magic[:4] in PCAP_MAGICS:
+            self.format = "pcap"
+            self.pcap_endian, self.pcap_ts_scale = PCAP_MAGICS[magic[:4]]
+            self.linktype = struct.unpack_from(self.pcap_endian + 'I', self.buffer, 20)[0] & 0xFFFF
+        else:
+            self.close()
+            raise ValueError(f"Kanavi 캡처 또는 pcap 파일이 아님: {path}")
+
+    def __iter__(self):
+        if self.format == "kanavi":
+            return self.iter_kanavi()
+        return self.iter_pcap()
+
+    def iter_kanavi(self):
+        """Kanavi 캡처 레코드 순회"""
+        buffer = self.buffer
+        size = len(buffer)
+        offset = FILE_HEADER.size
+        while offset + RECORD_HEADER.size <= size:
+            timestamp, source_ip, source_port, length = RECORD_HEADER.unpack_from(buffer, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > size:
+                break  # 기록 도중 잘린 마지막 레코드
+            yield timestamp, buffer[start:start + length], (unpack_ipv4(source_ip), source_port)
+            offset = start + length
+
+    def iter_pcap(self):
+        """pcap 패킷 중 IPv4 UDP 페이로드만 순회"""
+        buffer = self.buffer
+        size = len(buffer)
+        record_header = struct.Struct(self.pcap_endian + 'IIII')
+        offset = PCAP_HEADER_SIZE
+        while offset + record_header.size <= size:
+            ts_sec, ts_frac, captured, _ = record_header.unpack_from(buffer, offset)
+            start = offset + record_header.size
+            if start + captured > size:
+                break
+            offset = start + captured
+
+            udp = self.udp_payload(buffer, start, start + captured)
+            if udp:
+                data, addr = udp
+                yield ts_sec + ts_frac * self.pcap_ts_scale, data, addr
+
+    def udp_payload(self, buffer, start, end):
+        """링크 계층 프레임에서 UDP 페이로드와 송신 주소 추출 (대상이 아니면 None)"""
+        if self.linktype == LINKTYPE_ETHERNET:
+            ether_type_offset = start + 12
+            while ether_type_offset + 2 <= end and buffer[ether_type_offset:ether_type_offset + 2] in (b'\x81\x00', b'\x88\xa8'):
+                ether_type_offset += 4  # VLAN 태그
+            ether_type = buffer[ether_type_offset:ether_type_offset + 2]
+            ip_start = ether_type_offset + 2
+        elif self.linktype == LINKTYPE_LINUX_SLL:
+            ether_type = buffer[start + 14:start + 16]
+            ip_start = start + 16
+        elif self.linktype == LINKTYPE_LINUX_SLL2:
+            ether_type = buffer[start:start + 2]
+            ip_start = start + 20
+        elif self.linktype in LINKTYPE_RAW:
+            ether_type = b'\x08\x00'
+            ip_start = start
+        else:
+            return None
+
+        if ether_type != b'\x08\x00' or ip_start + 20 > end:
+            return None
+        version_ihl = buffer[ip_start]
+        if version_ihl >> 4 != 4 or buffer[ip_start + 9] != 17:
+            return None
+        if struct.unpack_from('>H', buffer, ip_start + 6)[0] & 0x1FFF:
+            return None  # 조각난 패킷의 뒷부분
+
+        udp_start = ip_start + (version_ihl & 0x0F) * 4
+        if udp_start + 8 > end:
+            return None
+        source_port, dest_port, udp_length = struct.unpack_from('>HHH', buffer, udp_start)
+        if self.udp_port is not None and dest_port != self.udp_port:
+            return None
+
+        payload_end = min(udp_start + max(udp_length, 8), end)
+        source_ip = unpack_ipv4(struct.unpack_from('>I', buffer, ip_start + 12)[0])
+        return buffer[udp_start + 8:payload_end], (source_ip, source_port)
+
+    def close(self):
+        """mmap과 파일 닫기"""
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = b''
+        self.file.close()
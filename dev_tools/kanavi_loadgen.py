@@ -0,0 +1,375 @@
+"""Kanavi 라이다 서버 부하 테스트
+
+가상 센서 N개가 프로토콜에 맞는 Kanavi 데이터그램(0xFA 헤더, 0xDDCx 명령, XOR 체크섬)을
+멀티캐스트로 보내고, WebSocket 클라이언트 M개가 서버에서 받은 프레임의 수신 속도,
+지연 시간(서버 수신 시각 → 클라이언트 수신 시각) 백분위수, 시퀀스 누락을 측정합니다.
+
+    # 서버와 같은 PC에서 실행
+    python dev_tools/kanavi_loadgen.py --sensors 4 --models VL-R4,VL-R2 --clients 8 --duration 10
+    # 클라이언트 수를 늘려가며 포화 지점 찾기
+    python dev_tools/kanavi_loadgen.py --sensors 4 --clients 1,4,16,64 --encoding binary --json
+    # 중계 서버 여러 개에 클라이언트를 나눠 접속 (순서대로 번갈아 배정)
+    python dev_tools/kanavi_loadgen.py --url ws://127.0.0.1:8766,ws://127.0.0.1:8767 --clients 100,200
+"""
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import websockets
+
+from mock_server_lidar import KanaviFrameEncoder, KanaviLidarParser, build_kanavi_packet
+
+MODEL_PRODUCT_LINES = {"VL-R2": 0x03, "VL-R4": 0x06, "VL-R270": 0x07}
+
+class KanaviSensorSimulator:
+    """가상 Kanavi 센서 1대 (회전마다 채널 수만큼 Distance Data 패킷 생성)
+
+    정적인 방 + 좌우로 움직이는 물체 + 노이즈 장면을 미리 variants개 프레임으로 만들어 두고
+    순서대로 반복 전송합니다 (전송 중에는 패킷 생성 비용 없음).
+    """
+
+    def __init__(self, model, lidar_id, parser=None, variants=40, seed=0):
+        self.parser = parser or KanaviLidarParser()
+        self.model = model
+        self.lidar_id = lidar_id
+        self.product_line = MODEL_PRODUCT_LINES[model]
+        self.model_info = self.parser.get_model_info(self.product_line)
+        self.frames = self.build_frames(variants, np.random.default_rng(seed))
+        self.next_frame = 0
+
+    def build_frames(self, variants, rng):
+        """회전별 채널 패킷 목록 미리 생성"""
+        pointsize = self.parser.expected_points(self.product_line)
+        hfov = self.model_info['hfov']
+        azimuth = np.radians(hfov / 2 - np.arange(pointsize) * (hfov / pointsize))
+        with np.errstate(divide='ignore'):
+            room = np.minimum(12.0 / np.abs(np.cos(azimuth)), 6.0 / np.abs(np.sin(azimuth)))
+        room = np.minimum(room, 60.0)
+
+        frames = []
+        for index in range(variants):
+            center = int((np.sin(2 * np.pi * index / variants) * 0.5 + 0.5) * (pointsize - 20))
+            packets = []
+            for channel in range(self.model_info['channels']):
+                distances = room + rng.normal(0.0, 0.01, pointsize)
+                distances[center:center + 20] = 5.0
+                detections = (distances < 10.0).astype(np.uint8)
+                packets.append(build_kanavi_packet(self.product_line, self.lidar_id, channel,
+                                                   distances, detections))
+            frames.append(packets)
+        return frames
+
+    def next_packets(self):
+        """다음 회전의 채널 패킷 목록"""
+        packets = self.frames[self.next_frame]
+        self.next_frame = (self.next_frame + 1) % len(self.frames)
+        return packets
+
+class KanaviPacketSender:
+    """가상 센서들의 패킷을 멀티캐스트로 전송 (별도 스레드)
+
+    센서마다 초당 rate회 회전하며, 센서들의 전송 시점을 한 주기 안에 고르게 나눕니다.
+    """
+
+    def __init__(self, sensors, group="224.0.0.5", port=5000, rate=20.0, ttl=1):
+        self.sensors = sensors
+        self.target = (group, port)
+        self.rate = rate
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+        self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.running = False
+        self.thread = None
+        self.stats = {
+            "sensors": len(sensors),
+            "packets": 0,
+            "bytes": 0,
+            "revolutions": 0,
+            "late_ticks": 0,
+            "send_errors": 0,
+            "elapsed_s": 0.0
+        }
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.send_loop, daemon=True)
+        self.thread.start()
+
+    def send_loop(self):
+        """주기에 맞춰 센서별 회전 패킷 전송"""
+        interval = 1.0 / (self.rate * len(self.sensors))
+        start_time = time.perf_counter()
+        next_time = start_time
+        tick = 0
+        while self.running:
+            sensor = self.sensors[tick % len(self.sensors)]
+            for packet in sensor.next_packets():
+                try:
+                    self.socket.sendto(packet, self.target)
+                    self.stats["packets"] += 1
+                    self.stats["bytes"] += len(packet)
+                except OSError:
+                    self.stats["send_errors"] += 1
+            self.stats["revolutions"] += 1
+            tick += 1
+
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                # 한 주기 이상 밀리면 따라잡지 않고 기준 시각 재설정
+                self.stats["late_ticks"] += 1
+                next_time = time.perf_counter()
+        self.stats["elapsed_s"] = round(time.perf_counter() - start_time, 3)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        self.socket.close()
+        elapsed = self.stats["elapsed_s"] or 1.0
+        self.stats["packet_rate"] = round(self.stats["packets"] / elapsed, 1)
+        self.stats["mbps"] = round(self.stats["bytes"] * 8 / elapsed / 1e6, 3)
+
+def frame_identity(message):
+    """수신 메시지 → (스트림 키, sequence, 서버 timestamp), 라이다 데이터가 아니면 None"""
+    if isinstance(message, bytes):
+        magic = message[:2]
+        if magic in (KanaviFrameEncoder.BINARY_MAGIC, KanaviFrameEncoder.SPARSE_MAGIC):
+            # 희소 헤더(KS)는 KL 헤더 뒤에 count만 추가된 구조
+            fields = KanaviFrameEncoder.BINARY_HEADER.unpack_from(message)
+            return (magic.decode(), fields[5], fields[4]), fields[10], fields[11]
+        if magic == KanaviFrameEncoder.FRAME_MAGIC:
+            fields = KanaviFrameEncoder.FRAME_HEADER.unpack_from(message)
+            return ("KF", fields[4], None), fields[9], fields[10]
+        if magic == KanaviFrameEncoder.DELTA_MAGIC:
+            fields = KanaviFrameEncoder.DELTA_HEADER.unpack_from(message)
+            return ("KD", fields[6], fields[5]), fields[7], fields[9]
+        if magic == KanaviFrameEncoder.GRID_MAGIC:
+            fields = KanaviFrameEncoder.GRID_HEADER.unpack_from(message)
+            return ("KG", fields[4], None), fields[10], fields[12]
+        if magic == KanaviFrameEncoder.RELAY_MAGIC:
+            fields = KanaviFrameEncoder.RELAY_HEADER.unpack_from(message)
+            return ("KR", fields[5], fields[4]), fields[7], fields[8]
+        return None
+
+    data = json.loads(message)
+    if data.get("type") not in ("lidar", "lidar_xyz", "lidar_frame", "lidar_delta", "lidar_sparse", "occupancy_grid"):
+        return None
+    lidar_id = data.get("lidar_id", 0)
+    if isinstance(lidar_id, str):
+        lidar_id = int(lidar_id, 16)
+    key = (data["type"], data.get("source_ip"), lidar_id, data.get("channel"))
+    return key, data.get("sequence", 0), data.get("timestamp", 0.0)
+
+class KanaviSwarmClient:
+    """부하 테스트용 WebSocket 클라이언트 1개"""
+
+    def __init__(self, url, options):
+        self.url = url
+        self.options = options
+        self.latencies = []
+        self.last_sequence = {}
+        self.frames = 0
+        self.bytes = 0
+        self.gaps = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    async def run(self, duration):
+        """연결 후 duration초 동안 수신"""
+        async with websockets.connect(self.url, max_size=None) as websocket:
+            await websocket.recv()  # 연결 환영 메시지
+            await websocket.send(json.dumps(dict(self.options, type="start_scan")))
+            start_time = time.perf_counter()
+            deadline = start_time + duration
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(websocket.recv(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                self.record(message, time.time())
+            self.elapsed = time.perf_counter() - start_time
+
+    def record(self, message, received_at):
+        """수신 프레임 1개 기록 (지연 시간, 시퀀스 누락)"""
+        identity = frame_identity(message)
+        if identity is None:
+            if isinstance(message, str) and '"type": "error"' in message:
+                self.errors += 1
+            return
+        key, sequence, timestamp = identity
+        self.frames += 1
+        self.bytes += len(message)
+        self.latencies.append(received_at - timestamp)
+        last = self.last_sequence.get(key)
+        if last is not None and sequence > last + 1:
+            self.gaps += sequence - last - 1
+        self.last_sequence[key] = sequence
+
+    def report(self):
+        elapsed = self.elapsed or 1.0
+        report = {
+            "frames": self.frames,
+            "rate_hz": round(self.frames / elapsed, 1),
+            "mbps": round(self.bytes * 8 / elapsed / 1e6, 3),
+            "sequence_gaps": self.gaps,
+            "errors": self.errors
+        }
+        report.update(latency_percentiles(self.latencies))
+        return report
+
+def latency_percentiles(latencies):
+    """지연 시간 백분위수 (ms)"""
+    if not latencies:
+        return {"latency_p50_ms": None, "latency_p90_ms": None, "latency_p99_ms": None, "latency_max_ms": None}
+    values = np.asarray(latencies) * 1000.0
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        "latency_p50_ms": round(float(p50), 3),
+        "latency_p90_ms": round(float(p90), 3),
+        "latency_p99_ms": round(float(p99), 3),
+        "latency_max_ms": round(float(values.max()), 3)
+    }
+
+async def fetch_server_status(url):
+    """서버 get_status 응답 (실패하면 None)"""
+    try:
+        async with websockets.connect(url, max_size=None) as websocket:
+            await websocket.recv()
+            await websocket.send(json.dumps({"type": "get_status"}))
+            while True:
+                message = await asyncio.wait_for(websocket.recv(), 5.0)
+                if isinstance(message, str):
+                    data = json.loads(message)
+                    if data.get("type") == "status_response":
+                        return data
+    except (OSError, asyncio.TimeoutError, websockets.WebSocketException):
+        return None
+
+async def run_swarm(urls, client_count, options, duration):
+    """클라이언트 client_count개를 서버 주소 목록에 번갈아 배정해 동시에 실행하고 결과 집계"""
+    clients = [KanaviSwarmClient(urls[index % len(urls)], options) for index in range(client_count)]
+    results = await asyncio.gather(*(client.run(duration) for client in clients), return_exceptions=True)
+    failed = sum(1 for result in results if isinstance(result, Exception))
+
+    reports = [client.report() for client in clients]
+    all_latencies = [latency for client in clients for latency in client.latencies]
+    summary = {
+        "clients": client_count,
+        "failed_clients": failed,
+        "frames": sum(report["frames"] for report in reports),
+        "rate_hz_per_client_min": min((report["rate_hz"] for report in reports), default=0.0),
+        "rate_hz_per_client_avg": round(sum(report["rate_hz"] for report in reports) / max(client_count, 1), 1),
+        "mbps_total": round(sum(report["mbps"] for report in reports), 3),
+        "sequence_gaps": sum(report["sequence_gaps"] for report in reports)
+    }
+    summary.update(latency_percentiles(all_latencies))
+
+    statuses = [await fetch_server_status(url) for url in urls]
+    if len(urls) == 1:
+        if statuses[0]:
+            summary["server_dropped_frames"] = statuses[0].get("dropped_frames")
+            summary["server_receiver"] = statuses[0].get("receiver")
+    else:
+        # 서버별 상태와 폐기 프레임 합계
+        dropped = defaultdict(int)
+        for status in statuses:
+            for name, count in ((status or {}).get("dropped_frames") or {}).items():
+                dropped[name] += count
+        summary["server_dropped_frames"] = dict(dropped)
+        summary["servers"] = [{
+            "url": url,
+            "dropped_frames": status.get("dropped_frames") if status else None,
+            "receiver": status.get("receiver") if status else None
+        } for url, status in zip(urls, statuses)]
+    return summary, reports
+
+def print_step(summary):
+    print(f"👥 클라이언트 {summary['clients']}개 (실패 {summary['failed_clients']}): "
+          f"클라이언트당 {summary['rate_hz_per_client_avg']}Hz (최소 {summary['rate_hz_per_client_min']}Hz), "
+          f"합계 {summary['mbps_total']}Mbps")
+    print(f"   - 지연 p50/p90/p99/max: {summary['latency_p50_ms']} / {summary['latency_p90_ms']} / "
+          f"{summary['latency_p99_ms']} / {summary['latency_max_ms']} ms")
+    print(f"   - 시퀀스 누락: {summary['sequence_gaps']}, 서버 폐기: {summary.get('server_dropped_frames')}")
+
+async def main(args):
+    sender = None
+    if args.sensors > 0:
+        parser = KanaviLidarParser()
+        models = args.models.split(",")
+        sensors = [KanaviSensorSimulator(models[index % len(models)], index + 1, parser, seed=index)
+                   for index in range(args.sensors)]
+        sender = KanaviPacketSender(sensors, args.group, args.port, args.rate)
+        sender.start()
+        print(f"📡 가상 센서 {args.sensors}개 전송 시작 ({args.models}, {args.rate}Hz → {args.group}:{args.port})")
+
+    client_steps = [int(count) for count in args.clients.split(",") if count]
+    options = {
+        "encoding": args.encoding,
+        "distance_format": args.distance_format,
+        "frame_mode": args.frame_mode,
+        "stream": args.stream
+    }
+    steps = []
+    try:
+        if any(client_steps):
+            await asyncio.sleep(args.warmup)
+            for client_count in client_steps:
+                summary, reports = await run_swarm(args.url.split(","), client_count, options, args.duration)
+                if args.per_client:
+                    summary["per_client"] = reports
+                steps.append(summary)
+                if not args.json:
+                    print_step(summary)
+        elif sender:
+            await asyncio.sleep(args.duration)
+    finally:
+        if sender:
+            sender.stop()
+
+    report = {"options": options, "sender": sender.stats if sender else None, "steps": steps}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    elif sender:
+        print(f"📡 전송: {sender.stats['packets']}개 패킷 ({sender.stats['packet_rate']}/s, "
+              f"{sender.stats['mbps']}Mbps), 지연된 주기 {sender.stats['late_ticks']}개")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kanavi 라이다 서버 부하 테스트 (가상 센서 + 클라이언트 스웜)")
+    parser.add_argument("--sensors", type=int, default=1, help="가상 센서 수 (0이면 패킷 전송 안 함)")
+    parser.add_argument("--models", default="VL-R4", help="센서 모델 목록 (쉼표 구분, 순서대로 배정)")
+    parser.add_argument("--rate", type=float, default=20.0, help="센서당 초당 회전 수")
+    parser.add_argument("--group", default="224.0.0.5", help="멀티캐스트 그룹")
+    parser.add_argument("--port", type=int, default=5000, help="UDP 포트")
+    parser.add_argument("--url", default="ws://127.0.0.1:8765",
+                        help="서버 WebSocket 주소 (쉼표로 여러 개 지정하면 클라이언트를 번갈아 배정)")
+    parser.add_argument("--clients", default="4", help="클라이언트 수 (쉼표로 여러 단계 지정, 0이면 센서만)")
+    parser.add_argument("--duration", type=float, default=10.0, help="단계별 측정 시간 (초)")
+    parser.add_argument("--warmup", type=float, default=1.0, help="측정 전 대기 시간 (초)")
+    parser.add_argument("--encoding", default="json", choices=["json", "binary"])
+    parser.add_argument("--distance-format", default="float32", choices=list(KanaviFrameEncoder.DISTANCE_FORMATS))
+    parser.add_argument("--frame-mode", default="channel", choices=["channel", "frame"])
+    parser.add_argument("--stream", default="distances", choices=list(KanaviFrameEncoder.STREAMS))
+    parser.add_argument("--per-client", action="store_true", help="클라이언트별 결과 포함")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON으로 출력")
+    args = parser.parse_args()
+    unknown = set(args.models.split(",")) - set(MODEL_PRODUCT_LINES)
+    if unknown:
+        parser.error(f"지원하지 않는 모델: {', '.join(sorted(unknown))}")
+    return args
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,203 @@
+import asyncio
+import math
+import threading
+import time
+from collections import defaultdict
+
+class LatencyHistogram:
+    """로그-선형 버킷 지연 시간 히스토그램 (HDR 방식)
+
+    1µs부터 2배 구간(옥타브)마다 SUB_BUCKETS개의 균등 버킷으로 나눠 값 개수만 셉니다.
+    기록은 O(1)이고 백분위수 오차는 버킷 폭(약 1/SUB_BUCKETS) 이내입니다.
+    """
+
+    MIN_VALUE = 1e-6  # 초
+    OCTAVES = 28  # 1µs ~ 약 268초
+    SUB_BUCKETS = 8
+
+    def __init__(self):
+        self.counts = [0] * (self.OCTAVES * self.SUB_BUCKETS + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def bucket_index(self, value):
+        """값 → 버킷 번호"""
+        if value < self.MIN_VALUE:
+            return 0
+        mantissa, exponent = math.frexp(value / self.MIN_VALUE)  # value/MIN = mantissa × 2^exponent
+        index = (exponent - 1) * self.SUB_BUCKETS + int((mantissa * 2.0 - 1.0) * self.SUB_BUCKETS) + 1
+        return min(index, len(self.counts) - 1)
+
+    def bucket_upper_bound(self, index):
+        """버킷의 상한값 (초)"""
+        if index == 0:
+            return self.MIN_VALUE
+        octave, sub_bucket = divmod(index - 1, self.SUB_BUCKETS)
+        return self.MIN_VALUE * (2 ** octave) * (1.0 + (sub_bucket + 1) / self.SUB_BUCKETS)
+
+    def record(self, value):
+        self.counts[self.bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """백분위수 (버킷 상한값, 최댓값을 넘지 않음)"""
+        if self.count == 0:
+            return 0.0
+        target = max(1, math.ceil(self.count * percent / 100.0))
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(self.bucket_upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        """밀리초 단위 요약"""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000.0, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000.0, 3),
+            "p90_ms": round(self.percentile(90) * 1000.0, 3),
+            "p99_ms": round(self.percentile(99) * 1000.0, 3),
+            "max_ms": round(self.max * 1000.0, 3)
+        }
+
+class PipelineMetrics:
+    """수신 → 파싱 → 필터/격자/공유 메모리 → 큐 → 직렬화 → 전송 단계별 카운터와 지연 시간 히스토그램
+
+    모든 값은 센서·채널 (source_ip, product_line, lidar_id, channel) 레이블별로 집계합니다 (전체 프레임은 channel None).
+    수신 스레드, 파서 풀 수집 스레드, 이벤트 루프에서 함께 기록하므로 잠금으로 보호합니다.
+    """
+
+    STAGES = {
+        "parse": "데이터그램 수신 → 파싱 완료",
+        "filter": "스캔 필터 (범위/시간축 중앙값/고립 포인트)",
+        "grid": "점유 격자 갱신",
+        "publish": "공유 메모리 공개",
+        "queue": "데이터 큐 대기",
+        "serialize": "인코딩별 직렬화",
+        "send": "클라이언트 송신 버퍼 대기 + 전송",
+        "end_to_end": "데이터그램 수신 → 클라이언트 전송 완료"
+    }
+    COUNTERS = {
+        "packets": "파싱된 Distance Data 패킷 수",
+        "bytes": "파싱된 패킷 바이트 수",
+        "throttled": "클라이언트 전송률 제한으로 건너뛴 프레임 수",
+        "queued": "데이터 큐에 넣은 프레임 수",
+        "queue_drops": "데이터 큐가 가득 차 버린 프레임 수",
+        "serialized": "직렬화 횟수 (인코딩별)",
+        "client_drops": "클라이언트 송신 버퍼에서 버린 프레임 수",
+        "sent": "클라이언트로 보낸 프레임 수",
+        "sent_bytes": "클라이언트로 보낸 바이트 수"
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)  # (이름, 레이블) → 값
+        self.histograms = {}  # (단계, 레이블) → LatencyHistogram
+        self.started_at = time.time()
+
+    def count(self, name, labels, amount=1):
+        with self.lock:
+            self.counters[(name, labels)] += amount
+
+    def observe(self, stage, labels, seconds):
+        with self.lock:
+            histogram = self.histograms.get((stage, labels))
+            if histogram is None:
+                histogram = self.histograms[(stage, labels)] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def snapshot(self):
+        """get_metrics 응답용 dict"""
+        with self.lock:
+            counters = sorted(self.counters.items(), key=lambda item: (item[0][0], str(item[0][1])))
+            histograms = sorted(self.histograms.items(), key=lambda item: (item[0][0], str(item[0][1])))
+            return {
+                "uptime_s": round(time.time() - self.started_at, 3),
+                "counters": [
+                    dict(self.label_dict(labels), name=name, value=value)
+                    for (name, labels), value in counters
+                ],
+                "latency": [
+                    dict(self.label_dict(labels), stage=stage, **histogram.summary())
+                    for (stage, labels), histogram in histograms
+                ]
+            }
+
+    def label_dict(self, labels):
+        source_ip, product_line, lidar_id, channel = labels
+        return {"source_ip": source_ip, "product_line": product_line, "lidar_id": lidar_id, "channel": channel}
+
+    def prometheus_labels(self, labels, **extra):
+        source_ip, product_line, lidar_id, channel = labels
+        pairs = [("source_ip", source_ip), ("product_line", product_line), ("lidar_id", lidar_id),
+                 ("channel", "frame" if channel is None else channel)]
+        pairs.extend(extra.items())
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def prometheus_text(self, gauges=()):
+        """Prometheus 텍스트 형식 (0.0.4)
+
+        gauges: 추가로 내보낼 (이름, 설명, 타입, 값) 목록 (레이블 없음)
+        """
+        lines = []
+        with self.lock:
+            by_name = defaultdict(list)
+            for (name, labels), value in self.counters.items():
+                by_name[name].append((labels, value))
+            for name, help_text in self.COUNTERS.items():
+                if name not in by_name:
+                    continue
+                metric = f"kanavi_{name}_total"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in by_name[name]:
+                    lines.append(f"{metric}{self.prometheus_labels(labels)} {value}")
+
+            if self.histograms:
+                metric = "kanavi_stage_latency_seconds"
+                lines.append(f"# HELP {metric} 파이프라인 단계별 지연 시간")
+                lines.append(f"# TYPE {metric} summary")
+                for (stage, labels), histogram in self.histograms.items():
+                    for quantile in (0.5, 0.9, 0.99):
+                        label_text = self.prometheus_labels(labels, stage=stage, quantile=quantile)
+                        lines.append(f"{metric}{label_text} {histogram.percentile(quantile * 100):.9f}")
+                    label_text = self.prometheus_labels(labels, stage=stage)
+                    lines.append(f"{metric}_sum{label_text} {histogram.total:.9f}")
+                    lines.append(f"{metric}_count{label_text} {histogram.count}")
+
+        for name, help_text, metric_type, value in gauges:
+            if value is None:
+                continue
+            lines.append(f"# HELP kanavi_{name} {help_text}")
+            lines.append(f"# TYPE kanavi_{name} {metric_type}")
+            lines.append(f"kanavi_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+async def serve_prometheus(render, host="0.0.0.0", port=9108):
+    """GET /metrics 요청에 render()의 Prometheus 텍스트를 돌려주는 HTTP 서버 시작"""
+
+    async def handle(reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5.0)
+            while (await asyncio.wait_for(reader.readline(), 5.0)) not in (b'\r\n', b'\n', b''):
+                pass  # 요청 헤더 무시
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split('?')[0] in ("/metrics", "/"):
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4; charset=utf-8", render().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain; charset=utf-8", b"not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,14 @@
+import socket
+
+# 캡처 파일, 공유 메모리 등 바이너리 형식에 IPv4 주소를 u32로 기록할 때 공용으로 사용
+
+def pack_ipv4(address):
+    """IPv4 문자열 → u32 (IPv4가 아니면 0)"""
+    try:
+        return int.from_bytes(socket.inet_aton(address), 'big')
+    except (OSError, TypeError):
+        return 0
+
+def unpack_ipv4(value):
+    """u32 → IPv4 문자열"""
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
@@ -0,0 +1,528 @@
+import os
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from kanavi_net import pack_ipv4, unpack_ipv4
+
+def process_alive(pid):
+    """PID 프로세스가 실행 중인지 (확인할 수 없으면 실행 중으로 봄)"""
+    if pid <= 0:
+        return False
+    if sys.platform == "win32":
+        # Windows 공유 메모리는 연결한 프로세스가 모두 닫으면 사라지므로 남아 있으면 사용 중
+        # (os.kill(pid, 0)은 Windows에서 프로세스를 종료시킴)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # 권한 없음 등: 다른 사용자의 실행 중인 프로세스
+    return True
+
+def attach_shared_memory(name, child_process=False):
+    """기존 공유 메모리에 연결 (연결한 쪽이 종료될 때 공유 메모리가 삭제되지 않도록 처리)
+    
+    child_process: 생성한 프로세스의 자식이라 resource_tracker를 공유하면 True
+    (공유 tracker에서 등록을 해제하면 생성한 쪽의 정리와 충돌함)
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if not child_process:
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+class SharedScanRing:
+    """공유 메모리 스캔 슬롯 링 (seqlock 방식)
+
+    공유 메모리 구조:
+      링 헤더 64바이트 = magic 'KNVSCAN1', version, slot_count, max_points, slot_size
+      슬롯 × slot_count = 슬롯 헤더 32바이트 + distances float32[max_points] + filtered float32[max_points]
+                          + detections uint8[max_points]
+
+    슬롯 헤더 (Little Endian):
+      write_seq(u64), timestamp(f64), source_ip(u32), source_port(u16), product_line(u8),
+      lidar_id(u8), channel(u8), flags(u8), num_points(u16), packet_size(u16), data_length(u16)
+
+    flags의 FLAG_FILTERED가 있으면 filtered에 스캔 필터 결과가 들어 있습니다.
+
+    쓰기 쪽은 write_seq를 홀수로 올린 뒤 데이터를 쓰고 다시 짝수로 올립니다.
+    읽기 쪽은 읽기 전후의 write_seq가 같은 짝수일 때만 결과를 사용합니다 (쓰기 1개, 읽기 여러 개).
+    """
+
+    MAGIC = b'KNVSCAN1'
+    VERSION = 2
+    RING_HEADER = struct.Struct('<8sIIII')
+    RING_HEADER_SIZE = 64
+    SLOT_SEQ_SIZE = 8
+    SLOT_FIELDS = struct.Struct('<dIHBBBBHHH')  # write_seq 뒤의 헤더 필드
+    SLOT_HEADER_SIZE = SLOT_SEQ_SIZE + SLOT_FIELDS.size
+    FLAG_FILTERED = 0x01
+
+    def __init__(self, name=None, slot_count=64, max_points=1024, create=True, child_process=False):
+        if create:
+            slot_size = self.compute_slot_size(max_points)
+            size = self.RING_HEADER_SIZE + slot_size * slot_count
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+            self.RING_HEADER.pack_into(self.shm.buf, 0, self.MAGIC, self.VERSION,
+                                       slot_count, max_points, slot_size)
+        else:
+            self.shm = attach_shared_memory(name, child_process)
+            magic, version, slot_count, max_points, slot_size = self.RING_HEADER.unpack_from(self.shm.buf, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                self.shm.close()
+                raise ValueError(f"Kanavi 스캔 링이 아님: {name}")
+
+        self.owner = create
+        self.name = self.shm.name
+        self.slot_count = slot_count
+        self.max_points = max_points
+        self.slot_size = slot_size
+
+        # 슬롯별 필드를 가리키는 NumPy 뷰 (복사 없음)
+        buf = self.shm.buf
+        base = self.RING_HEADER_SIZE
+        self.write_seqs = np.ndarray((slot_count,), dtype='<u8', buffer=buf,
+                                     offset=base, strides=(slot_size,))
+        self.distances = np.ndarray((slot_count, max_points), dtype='<f4', buffer=buf,
+                                    offset=base + self.SLOT_HEADER_SIZE, strides=(slot_size, 4))
+        self.filtered = np.ndarray((slot_count, max_points), dtype='<f4', buffer=buf,
+                                   offset=base + self.SLOT_HEADER_SIZE + max_points * 4, strides=(slot_size, 4))
+        self.detections = np.ndarray((slot_count, max_points), dtype=np.uint8, buffer=buf,
+                                     offset=base + self.SLOT_HEADER_SIZE + max_points * 8,
+                                     strides=(slot_size, 1))
+
+    @classmethod
+    def compute_slot_size(cls, max_points):
+        """슬롯 크기 (8바이트 정렬)"""
+        size = cls.SLOT_HEADER_SIZE + max_points * 9
+        return (size + 7) & ~7
+
+    @classmethod
+    def attach(cls, name, child_process=False):
+        """다른 프로세스가 만든 링에 연결"""
+        return cls(name=name, create=False, child_process=child_process)
+
+    def slot_offset(self, index):
+        return self.RING_HEADER_SIZE + index * self.slot_size
+
+    def write_slot(self, index, parsed_data, source_addr, timestamp, filtered=None):
+        """파싱 결과(와 스캔 필터 결과 filtered)를 슬롯에 기록 후 새 write_seq 반환"""
+        distances = parsed_data['distances']
+        num_points = min(len(distances), self.max_points)
+        seq = int(self.write_seqs[index])
+
+        self.write_seqs[index] = seq + 1  # 쓰기 중 (홀수)
+        self.SLOT_FIELDS.pack_into(
+            self.shm.buf, self.slot_offset(index) + self.SLOT_SEQ_SIZE,
+            timestamp,
+            pack_ipv4(source_addr[0]),
+            source_addr[1] & 0xFFFF,
+            parsed_data['product_line'],
+            parsed_data['lidar_id'],
+            parsed_data['channel'],
+            0 if filtered is None else self.FLAG_FILTERED,
+            num_points,
+            min(parsed_data['packet_size'], 0xFFFF),
+            min(parsed_data['data_length'], 0xFFFF)
+        )
+        self.distances[index, :num_points] = distances[:num_points]
+        if filtered is not None:
+            self.filtered[index, :num_points] = filtered[:num_points]
+        self.detections[index, :num_points] = parsed_data['detections'][:num_points]
+        self.write_seqs[index] = seq + 2  # 쓰기 완료 (짝수)
+        return seq + 2
+
+    def read_slot(self, index, expected_seq=None):
+        """슬롯 복사본 읽기
+
+        반환값: (헤더 dict, distances, detections, filtered), 쓰기 중이거나 덮어써졌으면 None
+        filtered는 기록하지 않았으면 None입니다.
+        """
+        seq = int(self.write_seqs[index])
+        if seq & 1 or (expected_seq is not None and seq != expected_seq):
+            return None
+
+        (timestamp, source_ip, source_port, product_line, lidar_id, channel, flags,
+         num_points, packet_size, data_length) = self.SLOT_FIELDS.unpack_from(
+            self.shm.buf, self.slot_offset(index) + self.SLOT_SEQ_SIZE)
+        num_points = min(num_points, self.max_points)
+        distances = self.distances[index, :num_points].copy()
+        detections = self.detections[index, :num_points].copy()
+        filtered = self.filtered[index, :num_points].copy() if flags & self.FLAG_FILTERED else None
+
+        if int(self.write_seqs[index]) != seq:
+            return None  # 읽는 동안 덮어써짐
+
+        header = {
+            'write_seq': seq,
+            'timestamp': timestamp,
+            'source_addr': (unpack_ipv4(source_ip), source_port),
+            'product_line': product_line,
+            'lidar_id': lidar_id,
+            'channel': channel,
+            'num_points': num_points,
+            'packet_size': packet_size,
+            'data_length': data_length
+        }
+        return header, distances, detections, filtered
+
+    def close(self):
+        """공유 메모리 연결 해제 (생성한 쪽이면 삭제까지)"""
+        # NumPy 뷰가 남아 있으면 buffer를 닫을 수 없으므로 먼저 해제
+        self.write_seqs = self.distances = self.filtered = self.detections = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+class SharedScanPublisher:
+    """센서/채널별 최신 스캔을 같은 PC의 다른 프로세스에 공개하는 공유 메모리 (seqlock 방식)
+
+    공유 메모리 구조:
+      헤더 64바이트 = magic 'KNVPUB01', version, max_streams, depth, max_points, slot_size, writer_pid,
+                     stream_count(u64, 오프셋 32), generation(u64, 오프셋 40)
+      스트림 목록 32바이트 × max_streams = frames(u64), source_ip(u32), product_line(u8), lidar_id(u8),
+                     channel(u8), reserved(u8), model(16s)
+      슬롯 × (max_streams × depth) = 슬롯 헤더 48바이트 + distances float32[max_points] + detections uint8[max_points]
+
+    슬롯 헤더 (Little Endian):
+      write_seq(u64), timestamp(f64), sequence(u32), num_points(u16), channel(u8), reserved(u8),
+      hfov(f32), vfov(f32), hresolution(f32), frame(u32, 스트림 안의 스캔 번호), published_at(f64)
+
+    스트림(센서·채널)마다 depth개 슬롯을 돌려 쓰고, 슬롯을 다 쓴 뒤 스트림의 frames와 전체 generation을
+    올립니다. 슬롯 쓰기는 SharedScanRing과 같은 seqlock(write_seq 홀수 → 쓰기 → 짝수)입니다.
+    쓰기는 한 스레드에서만 합니다 (수신 콜백).
+
+    같은 이름의 공유 메모리가 이미 있으면 writer_pid 프로세스가 끝난(비정상 종료로 남은) 경우에만 교체하고,
+    실행 중인 공개 프로세스가 있거나 Kanavi 공개용이 아니면 FileExistsError를 냅니다 (replace=True면 항상 교체).
+    """
+
+    MAGIC = b'KNVPUB01'
+    VERSION = 2
+    HEADER = struct.Struct('<8sIIIIII')
+    HEADER_SIZE = 64
+    COUNTERS_OFFSET = 32  # stream_count, generation (u64 × 2)
+    STREAM_FIELDS = struct.Struct('<IBBBx16s')  # frames 뒤의 스트림 필드
+    STREAM_SIZE = 32
+    SLOT_SEQ_SIZE = 8
+    SLOT_FIELDS = struct.Struct('<dIHBxfffId')  # write_seq 뒤의 헤더 필드
+    SLOT_HEADER_SIZE = SLOT_SEQ_SIZE + SLOT_FIELDS.size
+
+    def __init__(self, name="kanavi_scans", max_streams=32, depth=4, max_points=1024, replace=False):
+        slot_size = (self.SLOT_HEADER_SIZE + max_points * 5 + 7) & ~7  # 8바이트 정렬
+        size = self.HEADER_SIZE + self.STREAM_SIZE * max_streams + slot_size * max_streams * depth
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self.remove_existing(name, replace)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.shm.buf[:size] = bytes(size)
+        self.HEADER.pack_into(self.shm.buf, 0, self.MAGIC, self.VERSION, max_streams, depth, max_points, slot_size,
+                              os.getpid())
+        self.name = self.shm.name
+        self.max_streams = max_streams
+        self.depth = depth
+        self.max_points = max_points
+        self.slot_size = slot_size
+        self.slots_offset = self.HEADER_SIZE + self.STREAM_SIZE * max_streams
+        self.views = SharedScanViews(self.shm.buf, max_streams, depth, max_points, slot_size)
+        self.stream_index = {}  # (source_ip, product_line, lidar_id, channel) → 스트림 번호
+        self.stats = {"published": 0, "streams": 0, "stream_overflow": 0, "truncated": 0}
+
+    @classmethod
+    def existing_writer(cls, name):
+        """같은 이름의 기존 공유 메모리 → 공개 프로세스 PID (Kanavi 공개용이 아니면 None, 이전 버전이면 0)"""
+        existing = attach_shared_memory(name)
+        try:
+            if existing.size < cls.HEADER.size:
+                return None
+            magic, version = struct.unpack_from('<8sI', existing.buf, 0)
+            if magic != cls.MAGIC:
+                return None
+            return cls.HEADER.unpack_from(existing.buf, 0)[-1] if version == cls.VERSION else 0
+        finally:
+            existing.close()
+
+    def remove_existing(self, name, replace=False):
+        """이미 있는 공유 메모리 삭제 (공개 프로세스가 실행 중이거나 다른 용도면 replace일 때만)
+
+        연결 중인 읽기 쪽은 이전 매핑을 계속 보므로 다시 연결해야 합니다.
+        """
+        writer_pid = self.existing_writer(name)
+        if writer_pid is None:
+            reason = "Kanavi 스캔 공개용이 아님"
+        elif process_alive(writer_pid):
+            reason = f"PID {writer_pid} 프로세스가 공개 중"
+        else:
+            reason = None
+        if reason and not replace:
+            raise FileExistsError(f"공유 메모리 {name}을(를) 사용할 수 없습니다 ({reason}). "
+                                  f"다른 이름을 쓰거나, 더 이상 사용하지 않는다면 교체(--shm-replace)하세요")
+        print(f"⚠️  공유 메모리 {name}을(를) 교체합니다 ({reason or '이전 실행이 남긴 공유 메모리'})")
+        existing = shared_memory.SharedMemory(name=name)
+        existing.close()
+        existing.unlink()
+
+    def stream_for(self, channel_frame):
+        """채널 프레임의 스트림 번호 (처음 보는 센서·채널이면 등록, 자리가 없으면 None)"""
+        key = (channel_frame['source_ip'], channel_frame['product_line'], channel_frame['lidar_id'],
+               channel_frame['channel'])
+        index = self.stream_index.get(key)
+        if index is not None:
+            return index
+        index = len(self.stream_index)
+        if index >= self.max_streams:
+            return None
+        self.STREAM_FIELDS.pack_into(
+            self.shm.buf, self.HEADER_SIZE + index * self.STREAM_SIZE + 8,
+            pack_ipv4(key[0]), key[1], key[2], key[3], channel_frame['model'].encode()[:16])
+        self.stream_index[key] = index
+        self.views.counters[0] = index + 1  # 스트림 목록에 공개 (frames가 0이면 아직 읽을 스캔 없음)
+        self.stats["streams"] = index + 1
+        return index
+
+    def publish(self, channel_frame):
+        """채널 프레임(lidar 메시지 dict)을 스트림의 다음 슬롯에 기록, 스트림이 가득 차면 False"""
+        index = self.stream_for(channel_frame)
+        if index is None:
+            self.stats["stream_overflow"] += 1
+            return False
+        views = self.views
+        frames = int(views.frames[index])
+        slot = index * self.depth + frames % self.depth
+        distances = channel_frame['distances']
+        num_points = len(distances)
+        if num_points > self.max_points:
+            num_points = self.max_points
+            self.stats["truncated"] += 1
+        seq = int(views.write_seqs[slot])
+
+        views.write_seqs[slot] = seq + 1  # 쓰기 중 (홀수)
+        self.SLOT_FIELDS.pack_into(
+            self.shm.buf, self.slots_offset + slot * self.slot_size + self.SLOT_SEQ_SIZE,
+            channel_frame['timestamp'],
+            channel_frame['sequence'] & 0xFFFFFFFF,
+            num_points,
+            channel_frame['channel'],
+            channel_frame['hfov'],
+            channel_frame['vfov'],
+            channel_frame['hresolution'],
+            (frames + 1) & 0xFFFFFFFF,
+            time.time()
+        )
+        views.distances[slot, :num_points] = distances[:num_points]
+        views.detections[slot, :num_points] = channel_frame['detection_data'][:num_points]
+        views.write_seqs[slot] = seq + 2  # 쓰기 완료 (짝수)
+
+        views.frames[index] = frames + 1
+        views.counters[1] += 1  # generation
+        self.stats["published"] += 1
+        return True
+
+    def get_stats(self):
+        return dict(self.stats, name=self.name, max_streams=self.max_streams, depth=self.depth,
+                    max_points=self.max_points, bytes=self.shm.size, writer_pid=os.getpid())
+
+    def close(self):
+        """공유 메모리 삭제 (읽기 쪽이 연결되어 있어도 이름만 사라지고 매핑은 유지됨)"""
+        self.views = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class SharedScanViews:
+    """SharedScanPublisher 공유 메모리의 카운터/스트림/슬롯 필드를 가리키는 NumPy 뷰 (복사 없음)"""
+
+    def __init__(self, buf, max_streams, depth, max_points, slot_size):
+        publisher = SharedScanPublisher
+        slots_offset = publisher.HEADER_SIZE + publisher.STREAM_SIZE * max_streams
+        slot_count = max_streams * depth
+        self.counters = np.ndarray((2,), dtype='<u8', buffer=buf, offset=publisher.COUNTERS_OFFSET)
+        self.frames = np.ndarray((max_streams,), dtype='<u8', buffer=buf, offset=publisher.HEADER_SIZE,
+                                 strides=(publisher.STREAM_SIZE,))
+        self.write_seqs = np.ndarray((slot_count,), dtype='<u8', buffer=buf, offset=slots_offset,
+                                     strides=(slot_size,))
+        self.distances = np.ndarray((slot_count, max_points), dtype='<f4', buffer=buf,
+                                    offset=slots_offset + publisher.SLOT_HEADER_SIZE, strides=(slot_size, 4))
+        self.detections = np.ndarray((slot_count, max_points), dtype=np.uint8, buffer=buf,
+                                     offset=slots_offset + publisher.SLOT_HEADER_SIZE + max_points * 4,
+                                     strides=(slot_size, 1))
+
+class SharedScanReader:
+    """SharedScanPublisher가 공개한 스캔 읽기 (다른 프로세스에서 사용)
+
+    latest()/updates()가 돌려주는 스캔의 distances/detections는 공유 메모리를 직접 가리키는 뷰입니다.
+    쓰기 쪽이 depth개 스캔 뒤에 같은 슬롯을 덮어쓰므로, 뷰를 다 사용한 뒤 valid(scan)이 True일 때만
+    결과를 믿어야 합니다 (오래 보관하려면 read()로 복사).
+
+        reader = SharedScanReader("kanavi_scans")
+        cursor = {}
+        while True:
+            generation = reader.wait(generation)
+            for scan in reader.updates(cursor):
+                process(scan['distances'])
+                if not reader.valid(scan): ...  # 처리 중 덮어써짐
+    """
+
+    def __init__(self, name="kanavi_scans", child_process=False):
+        self.shm = attach_shared_memory(name, child_process)
+        magic, version, max_streams, depth, max_points, slot_size, self.writer_pid = \
+            SharedScanPublisher.HEADER.unpack_from(self.shm.buf, 0)
+        if magic != SharedScanPublisher.MAGIC or version != SharedScanPublisher.VERSION:
+            self.shm.close()
+            raise ValueError(f"Kanavi 스캔 공유 메모리가 아님: {name}")
+        self.name = name
+        self.max_streams = max_streams
+        self.depth = depth
+        self.max_points = max_points
+        self.slot_size = slot_size
+        self.slots_offset = SharedScanPublisher.HEADER_SIZE + SharedScanPublisher.STREAM_SIZE * max_streams
+        self.views = SharedScanViews(self.shm.buf, max_streams, depth, max_points, slot_size)
+        self.stream_cache = {}  # 스트림 번호 → 스트림 정보 (등록 후 바뀌지 않음)
+        self.stats = {"scans": 0, "missed": 0, "torn": 0}
+
+    def generation(self):
+        """지금까지 공개된 스캔 수 (새 스캔 확인용)"""
+        return int(self.views.counters[1])
+
+    def wait(self, generation=None, timeout=1.0, spin_seconds=0.001):
+        """generation이 바뀔 때까지 대기 → 새 generation (시간 초과면 현재 값)
+
+        spin_seconds 동안은 바쁜 대기로 확인하고 (마이크로초 단위 지연), 그 뒤에는 짧게 잠들며 확인합니다.
+        """
+        counters = self.views.counters
+        if generation is None:
+            return int(counters[1])
+        start = time.perf_counter()
+        while True:
+            current = int(counters[1])
+            if current != generation:
+                return current
+            elapsed = time.perf_counter() - start
+            if elapsed >= timeout:
+                return current
+            if elapsed >= spin_seconds:
+                time.sleep(0.0001)
+
+    def streams(self):
+        """공개된 스트림(센서·채널) 목록"""
+        return [self.stream_info(index) for index in range(int(self.views.counters[0]))]
+
+    def stream_info(self, index):
+        info = self.stream_cache.get(index)
+        if info is None:
+            source_ip, product_line, lidar_id, channel, model = SharedScanPublisher.STREAM_FIELDS.unpack_from(
+                self.shm.buf, SharedScanPublisher.HEADER_SIZE + index * SharedScanPublisher.STREAM_SIZE + 8)
+            source_ip = unpack_ipv4(source_ip)
+            info = self.stream_cache[index] = {
+                "stream": index,
+                "sensor_id": f"{source_ip}/0x{product_line:02X}/0x{lidar_id:02X}",
+                "source_ip": source_ip,
+                "product_line": product_line,
+                "lidar_id": lidar_id,
+                "channel": channel,
+                "model": model.rstrip(b'\0').decode()
+            }
+        return dict(info, frames=int(self.views.frames[index]))
+
+    def scan_at(self, index, frame):
+        """스트림 index의 frame번째(1부터) 스캔 뷰, 쓰기 중이거나 덮어써졌으면 None"""
+        slot = index * self.depth + (frame - 1) % self.depth
+        seq = int(self.views.write_seqs[slot])
+        if seq & 1 or seq == 0:
+            return None
+        (timestamp, sequence, num_points, channel, hfov, vfov, hresolution,
+         slot_frame, published_at) = SharedScanPublisher.SLOT_FIELDS.unpack_from(
+            self.shm.buf, self.slots_offset + slot * self.slot_size + SharedScanPublisher.SLOT_SEQ_SIZE)
+        if int(self.views.write_seqs[slot]) != seq or slot_frame != frame & 0xFFFFFFFF:
+            return None  # 헤더를 읽는 동안 또는 그 전에 다음 스캔으로 덮어써짐
+        num_points = min(num_points, self.max_points)
+        info = self.stream_cache.get(index) or self.stream_info(index)
+        return {
+            "stream": index,
+            "sensor_id": info["sensor_id"],
+            "source_ip": info["source_ip"],
+            "lidar_id": info["lidar_id"],
+            "model": info["model"],
+            "channel": channel,
+            "sequence": sequence,
+            "timestamp": timestamp,
+            "published_at": published_at,
+            "hfov": hfov,
+            "vfov": vfov,
+            "hresolution": hresolution,
+            "distances": self.views.distances[slot, :num_points],
+            "detections": self.views.detections[slot, :num_points],
+            "slot": slot,
+            "write_seq": seq
+        }
+
+    def latest(self, index):
+        """스트림의 최신 스캔 뷰 (아직 없거나 쓰기 중이면 None)"""
+        frames = int(self.views.frames[index])
+        return self.scan_at(index, frames) if frames else None
+
+    def updates(self, cursor):
+        """cursor(스트림 번호 → 읽은 frames) 이후 새로 공개된 스캔 뷰 목록 (cursor 갱신)
+
+        빈 cursor로 시작하면 스트림마다 남아 있는 최근 depth개부터 돌려줍니다.
+        depth개보다 많이 밀린 스캔은 건너뛰고 stats["missed"]에 셉니다.
+        """
+        scans = []
+        for index in range(int(self.views.counters[0])):
+            frames = int(self.views.frames[index])
+            last = cursor.get(index)
+            if frames == last:
+                continue
+            first = max(frames - self.depth + 1, 1)
+            if last is not None:
+                # 처음 보는 스트림은 남아 있는 스캔부터 시작 (연결 전 스캔은 누락으로 세지 않음)
+                first = max(first, last + 1)
+                self.stats["missed"] += first - last - 1
+            for frame in range(first, frames + 1):
+                scan = self.scan_at(index, frame)
+                if scan is None:
+                    self.stats["torn"] += 1
+                else:
+                    scans.append(scan)
+            cursor[index] = frames
+        self.stats["scans"] += len(scans)
+        return scans
+
+    def valid(self, scan):
+        """스캔 뷰를 사용하는 동안 슬롯이 덮어써지지 않았는지 확인"""
+        return int(self.views.write_seqs[scan["slot"]]) == scan["write_seq"]
+
+    def read(self, index, retries=3):
+        """스트림의 최신 스캔 복사본 (distances/detections 복사, 덮어써지면 재시도) 또는 None"""
+        for _ in range(retries):
+            scan = self.latest(index)
+            if scan is None:
+                return None
+            scan["distances"] = scan["distances"].copy()
+            scan["detections"] = scan["detections"].copy()
+            if self.valid(scan):
+                return scan
+            self.stats["torn"] += 1
+        return None
+
+    def close(self):
+        """공유 메모리 연결 해제 (반환한 뷰는 더 이상 사용할 수 없음)"""
+        self.views = None
+        self.stream_cache.clear()
+        self.shm.close()
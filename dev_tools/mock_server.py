@@ -1,44 +1,158 @@
+import argparse
 import asyncio
 import websockets
 import json
-import random
+import time
+import numpy as np
 from datetime import datetime
 
+# 모델별 스캔 설정과 노이즈 모델 (거리 노이즈 표준편차 = noise_m + noise_ratio × 거리)
+SCAN_MODELS = {
+    "VL-R2": {"channels": 2, "hfov": 120, "vfov": [0.0, 3.0], "max_range": 30.0,
+              "noise_m": 0.02, "noise_ratio": 0.002, "dropout": 0.01},
+    "VL-R4": {"channels": 4, "hfov": 100, "vfov": [-1.1, 0.0, 1.1, 2.2], "max_range": 50.0,
+              "noise_m": 0.015, "noise_ratio": 0.001, "dropout": 0.005},
+    "VL-R270": {"channels": 1, "hfov": 270, "vfov": [0.0], "max_range": 25.0,
+                "noise_m": 0.03, "noise_ratio": 0.003, "dropout": 0.02}
+}
+
+class SceneSimulator:
+    """모든 클라이언트가 공유하는 가상 라이다 장면 (NumPy 벡터 연산)
+
+    센서를 중심으로 한 직사각형 방(벽) + 지면 + 움직이는 원기둥 물체(사람, 기둥 크기)를
+    채널 × 포인트 광선으로 한 번에 교차 계산하고, 모델별 노이즈(거리 비례 가우시안, 무효 포인트)를 더합니다.
+    광선 방향은 lib/lidar.dart의 to3DPoints와 같습니다 (방위각은 HFOV/2에서 hresolution씩 감소,
+    z = -거리 × sin(vfov)이므로 vfov가 양수인 채널이 아래를 향함).
+    """
+
+    HRESOLUTION = 0.25  # 도
+    SENSOR_HEIGHT = 1.0  # 지면 위 센서 높이 (m)
+
+    def __init__(self, model="VL-R4", room=(8.0, 15.0, 6.0), objects=4, seed=0):
+        self.model_name = model
+        self.model = SCAN_MODELS[model]
+        self.rng = np.random.default_rng(seed)
+        self.point_size = int(round(self.model["hfov"] / self.HRESOLUTION))
+        self.sequence = 0
+
+        # 광선 방향 (채널 × 포인트)
+        azimuth = np.radians(self.model["hfov"] / 2 - np.arange(self.point_size) * self.HRESOLUTION)
+        vertical = np.radians(np.array(self.model["vfov"]))[:, None]
+        self.direction_x = np.sin(azimuth)[None, :]
+        self.direction_y = np.cos(azimuth)[None, :]
+        self.cos_vertical = np.cos(vertical)
+
+        # 정적 장면 (방의 벽과 지면)은 한 번만 계산: 수평 거리 → 광선 거리
+        half_width, front, back = room
+        with np.errstate(divide='ignore'):
+            wall_x = half_width / np.abs(self.direction_x)
+            wall_y = np.where(self.direction_y > 0, front / self.direction_y, back / -self.direction_y)
+            ground = np.where(vertical > 0, self.SENSOR_HEIGHT / np.sin(vertical), np.inf)
+        self.static_ranges = np.minimum(np.minimum(wall_x, wall_y) / self.cos_vertical, ground)
+
+        # 움직이는 물체: 반지름, 왕복 궤적 중심/진폭/주기/위상
+        self.object_radius = self.rng.uniform(0.25, 0.6, objects)
+        self.object_center = np.column_stack([self.rng.uniform(-half_width * 0.6, half_width * 0.6, objects),
+                                              self.rng.uniform(2.0, front * 0.7, objects)])
+        self.object_amplitude = self.rng.uniform(1.0, half_width * 0.5, (objects, 2))
+        self.object_period = self.rng.uniform(3.0, 10.0, objects)
+        self.object_phase = self.rng.uniform(0.0, 2 * np.pi, objects)
+
+    def object_positions(self, t):
+        """시각 t(초)의 물체 중심 (objects × 2)"""
+        angle = 2 * np.pi * t / self.object_period + self.object_phase
+        return self.object_center + self.object_amplitude * np.column_stack([np.sin(angle), np.sin(angle * 0.7)])
+
+    def scan(self, t):
+        """시각 t의 전체 채널 거리 배열 (channels × point_size, float32)"""
+        ranges = self.static_ranges.copy()
+        positions = self.object_positions(t)
+        # 광선-원기둥 교차: 수평 거리 s = b - sqrt(b² - |c|² + r²), b = 광선 방향 · 중심
+        for (center_x, center_y), radius in zip(positions, self.object_radius):
+            projection = self.direction_x[0] * center_x + self.direction_y[0] * center_y
+            discriminant = projection ** 2 - (center_x ** 2 + center_y ** 2 - radius ** 2)
+            hit = (discriminant >= 0) & (projection > 0)
+            horizontal = np.where(hit, projection - np.sqrt(np.maximum(discriminant, 0.0)), np.inf)
+            np.minimum(ranges, horizontal[None, :] / self.cos_vertical, out=ranges)
+
+        # 노이즈 모델: 거리 비례 가우시안 + 최대 거리 근처일수록 늘어나는 무효 포인트
+        model = self.model
+        ranges += self.rng.normal(0.0, 1.0, ranges.shape) * (model["noise_m"] + model["noise_ratio"] * ranges)
+        dropout = model["dropout"] * (1.0 + 4.0 * np.clip(ranges / model["max_range"], 0.0, 1.0) ** 4)
+        ranges[(self.rng.random(ranges.shape) < dropout) | (ranges > model["max_range"])] = 0.0
+        return np.clip(ranges, 0.0, model["max_range"]).astype(np.float32)
+
+    def frame_messages(self, t):
+        """시각 t의 채널별 lidar JSON 메시지 목록 (모든 클라이언트에 같은 문자열 전송)"""
+        self.sequence += 1
+        distances = self.scan(t).astype(np.float64).round(2)
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return [json.dumps({
+            "type": "lidar",
+            "model": self.model_name,
+            "pointsize": self.point_size,
+            "channel": channel,
+            "hfov": self.model["hfov"],
+            "vfov": self.model["vfov"][channel],
+            "hresolution": self.HRESOLUTION,
+            "distances": distances[channel].tolist(),
+            "max": self.model["max_range"],
+            "sequence": self.sequence,
+            "timestamp": timestamp
+        }) for channel in range(self.model["channels"])]
+
 class LidarServer:
-    def __init__(self):
-        self.scanning = False
-        self.model_name = "R4"
-        self.point_size = 400
-        self.hfov = 100
-        self.vfov = [-1.1, 0, 1.1, 2.2]
-        self.max_range = 50
-        self.channels = 4
-    
-    async def send_lidar_data(self, websocket):
-        """라이다 데이터 송신"""
-        for channel in range(self.channels):
-            data = {
-                "type": "lidar",
-                "model": self.model_name,
-                "pointsize": self.point_size,
-                "channel": channel,
-                "hfov": self.hfov,
-                "vfov": self.vfov,
-                "distances": [round(random.uniform(0.0, self.max_range), 2) for _ in range(self.point_size)],
-                "max": self.max_range,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            await websocket.send(json.dumps(data))
-            await asyncio.sleep(0.1)
-    
+    """공유 시뮬레이터 1개의 프레임을 스캔 중인 모든 클라이언트에 같은 메시지로 전송"""
+
+    MAX_WRITE_BUFFER = 1024 * 1024  # 송신 버퍼가 이보다 쌓인 느린 클라이언트는 프레임을 건너뜀
+
+    def __init__(self, simulator, rate_hz=20.0):
+        self.simulator = simulator
+        self.rate_hz = rate_hz
+        self.scanning_clients = set()
+        self.stats = {"frames": 0, "late_frames": 0, "skipped_sends": 0}
+
+    @property
+    def model_name(self):
+        return self.simulator.model_name
+
+    @property
+    def channels(self):
+        return self.simulator.model["channels"]
+
+    async def run(self):
+        """rate_hz마다 한 회전을 만들어 스캔 중인 클라이언트에 브로드캐스트"""
+        interval = 1.0 / self.rate_hz
+        start_time = time.perf_counter()
+        next_time = start_time
+        while True:
+            next_time += interval
+            if self.scanning_clients:
+                messages = self.simulator.frame_messages(time.perf_counter() - start_time)
+                # 송신 버퍼가 밀린 클라이언트는 이번 회전을 건너뜀 (쌓이지 않게)
+                clients = [websocket for websocket in self.scanning_clients
+                           if websocket.transport.get_write_buffer_size() <= self.MAX_WRITE_BUFFER]
+                self.stats["skipped_sends"] += len(self.scanning_clients) - len(clients)
+                for message in messages:
+                    websockets.broadcast(clients, message)
+                self.stats["frames"] += 1
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # 한 주기 이상 밀리면 따라잡지 않고 기준 시각 재설정
+                self.stats["late_frames"] += 1
+                next_time = time.perf_counter()
+                await asyncio.sleep(0)
+
     async def handle_message(self, websocket, message):
         """클라이언트 메시지 처리"""
         try:
             data = json.loads(message)
             message_type = data.get("type", "unknown")
-            
+
             print(f"수신된 메시지: {message_type}")
-            
+
             # 각 메시지 타입별 처리
             if message_type == "test1":
                 response = {
@@ -48,7 +162,7 @@ class LidarServer:
                     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
                 await websocket.send(json.dumps(response))
-            
+
             elif message_type == "ping":
                 client_timestamp = data.get("timestamp", "")
                 response = {
@@ -59,41 +173,44 @@ class LidarServer:
                     "latency_check": "OK"
                 }
                 await websocket.send(json.dumps(response))
-            
+
             elif message_type == "start_scan":
-                self.scanning = True
+                self.scanning_clients.add(websocket)
                 response = {
                     "type": "scan_status",
                     "status": "스캔이 시작되었습니다",
-                    "scanning": self.scanning,
+                    "scanning": True,
                     "message": f"모델 {self.model_name} 스캔 시작"
                 }
                 await websocket.send(json.dumps(response))
-            
+
             elif message_type == "stop_scan":
-                self.scanning = False
+                self.scanning_clients.discard(websocket)
                 response = {
                     "type": "scan_status",
                     "status": "스캔이 중지되었습니다",
-                    "scanning": self.scanning,
+                    "scanning": False,
                     "message": "스캔 중지됨"
                 }
                 await websocket.send(json.dumps(response))
-            
+
             elif message_type == "get_status":
                 response = {
                     "type": "status_response",
                     "status": "정상 작동 중",
-                    "scanning": self.scanning,
+                    "scanning": websocket in self.scanning_clients,
                     "model": self.model_name,
                     "channels": self.channels,
-                    "hfov": self.hfov,
-                    "max_range": self.max_range,
-                    "point_size": self.point_size,
+                    "hfov": self.simulator.model["hfov"],
+                    "max_range": self.simulator.model["max_range"],
+                    "point_size": self.simulator.point_size,
+                    "rate_hz": self.rate_hz,
+                    "scanning_clients": len(self.scanning_clients),
+                    "simulator": self.stats,
                     "uptime": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
                 await websocket.send(json.dumps(response))
-            
+
             else:
                 # 알 수 없는 메시지 타입
                 response = {
@@ -102,7 +219,7 @@ class LidarServer:
                     "received_data": data
                 }
                 await websocket.send(json.dumps(response))
-        
+
         except json.JSONDecodeError:
             # JSON이 아닌 텍스트 메시지 처리
             response = {
@@ -111,7 +228,7 @@ class LidarServer:
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             }
             await websocket.send(json.dumps(response))
-        
+
         except Exception as e:
             # 기타 오류 처리
             error_response = {
@@ -122,24 +239,10 @@ class LidarServer:
             await websocket.send(json.dumps(error_response))
 
 async def handler(websocket, *args):
-    server = LidarServer()
+    server = websocket.server.lidar_server
     print(f"클라이언트 연결됨: {websocket.remote_address}")
-    
+
     try:
-        # 라이다 데이터 송신 태스크
-        async def lidar_data_sender():
-            while True:
-                if server.scanning:  # 스캔이 활성화된 경우에만 데이터 송신
-                    await server.send_lidar_data(websocket)
-                    await asyncio.sleep(1)  # 1초마다 전체 채널 데이터 송신
-                else:
-                    await asyncio.sleep(0.1)  # 스캔 중지 시 대기
-        
-        # 메시지 수신 태스크
-        async def message_receiver():
-            async for message in websocket:
-                await server.handle_message(websocket, message)
-        
         # 연결 알림 메시지
         welcome_message = {
             "type": "connection",
@@ -147,37 +250,52 @@ async def handler(websocket, *args):
             "server_info": {
                 "model": server.model_name,
                 "channels": server.channels,
-                "hfov": server.hfov,
-                "max_range": server.max_range
+                "hfov": server.simulator.model["hfov"],
+                "max_range": server.simulator.model["max_range"],
+                "rate_hz": server.rate_hz
             },
             "instructions": "스캔을 시작하려면 'start_scan' 메시지를 보내세요"
         }
         await websocket.send(json.dumps(welcome_message))
-        
-        # 두 태스크를 동시에 실행
-        await asyncio.gather(
-            lidar_data_sender(),
-            message_receiver()
-        )
-        
+
+        # 라이다 데이터는 공유 시뮬레이터 태스크가 전송하므로 메시지 수신만 처리
+        async for message in websocket:
+            await server.handle_message(websocket, message)
+
     except websockets.ConnectionClosed:
         print(f"클라이언트 연결 종료: {websocket.remote_address}")
     except Exception as e:
         print(f"연결 처리 중 오류: {e}")
+    finally:
+        server.scanning_clients.discard(websocket)
 
-async def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="가상 라이다 장면 WebSocket 서버 (Flutter 뷰어 테스트용)")
+    parser.add_argument("--model", default="VL-R4", choices=list(SCAN_MODELS), help="시뮬레이션할 센서 모델")
+    parser.add_argument("--rate", type=float, default=20.0, help="초당 회전 수 (Hz)")
+    parser.add_argument("--objects", type=int, default=4, help="움직이는 물체 수")
+    parser.add_argument("--seed", type=int, default=0, help="장면/노이즈 난수 시드")
+    parser.add_argument("--port", type=int, default=8765, help="WebSocket 포트")
+    return parser.parse_args()
+
+async def main(args):
     print("WebSocket 서버 시작 중...")
-    async with websockets.serve(handler, "0.0.0.0", 8765):
-        print("🚀 WebSocket 서버가 ws://0.0.0.0:8765 에서 실행 중입니다.")
+    server = LidarServer(SceneSimulator(args.model, objects=args.objects, seed=args.seed), args.rate)
+    async with websockets.serve(handler, "0.0.0.0", args.port) as websocket_server:
+        websocket_server.lidar_server = server
+        asyncio.create_task(server.run())
+        print(f"🚀 WebSocket 서버가 ws://0.0.0.0:{args.port} 에서 실행 중입니다.")
+        print(f"🎯 가상 {args.model} 장면: {server.channels}채널 × {server.simulator.point_size}포인트, "
+              f"{args.rate}Hz, 물체 {args.objects}개")
         print("📡 지원하는 메시지 타입:")
         print("   - test1: 테스트 메시지")
         print("   - ping: 핑 테스트")
         print("   - start_scan: 라이다 스캔 시작")
         print("   - stop_scan: 라이다 스캔 중지")
         print("   - get_status: 서버 상태 확인")
-        print("🔄 라이다 데이터는 스캔 시작 후 자동 송신됩니다.")
-        
+        print("🔄 모든 클라이언트가 같은 장면을 받으며, 라이다 데이터는 스캔 시작 후 자동 송신됩니다.")
+
         await asyncio.Future()  # 서버 계속 실행
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main(parse_args()))
@@ -1,13 +1,42 @@
+import argparse
 import asyncio
+import base64
 import websockets
 import json
+import os
 import socket
 import struct
-import threading
+import sys
 from datetime import datetime
-from collections import defaultdict
+from collections import OrderedDict, defaultdict, deque
 import time
 import queue
+import zlib
+import threading
+import functools
+import multiprocessing
+import numpy as np
+from kanavi_shm import SharedScanPublisher, SharedScanRing
+from kanavi_capture import KanaviCaptureReader, KanaviCaptureWriter
+from kanavi_metrics import PipelineMetrics, serve_prometheus
+
+EMPTY_DISTANCES = np.zeros(0, dtype=np.float32)
+EMPTY_DETECTIONS = np.zeros(0, dtype=np.uint8)
+
+# 로그 출력 수준 (패킷마다 찍는 디버그 로그는 LOG_DEBUG에서만)
+LOG_QUIET, LOG_INFO, LOG_DEBUG = 0, 1, 2
+LOG_LEVELS = {"quiet": LOG_QUIET, "info": LOG_INFO, "debug": LOG_DEBUG}
+log_level = LOG_INFO
+
+def set_log_level(name):
+    """로그 출력 수준 설정 ("quiet", "info", "debug")"""
+    global log_level
+    log_level = LOG_LEVELS[name]
+
+def log(level, message):
+    """현재 로그 수준 이하의 메시지만 출력"""
+    if level <= log_level:
+        print(message)
 
 class KanaviLidarParser:
     """Kanavi VL-Series LiDAR 프로토콜 파서"""
@@ -19,41 +48,61 @@ class KanaviLidarParser:
             0x06: {"name": "VL-R4", "channels": 4, "hfov": 100, "interface": "Ethernet"},
             0x07: {"name": "VL-R270", "channels": 1, "hfov": 270, "interface": "Ethernet"}
         }
+        # 모델별 채널 고정 수직각 (도)
+        self.vfov_maps = {
+            "VL-R4": {0: -1.1, 1: 0.0, 2: 1.1, 3: 2.2},
+            "VL-R2": {0: 0.0, 1: 3.0}
+        }
+        self.stats = {
+            "packets": 0,
+            "invalid": 0,
+            "checksum_errors": 0,
+            "parse_errors": 0,
+            "resyncs": 0,        # 아래 세 항목은 KanaviStreamParser가 집계
+            "skipped_bytes": 0,
+            "truncated": 0
+        }
         
-    def parse_kanavi_packet(self, data):
-        """Kanavi VL-Series 패킷 파싱"""
+    def parse_kanavi_packet(self, data, as_points=False):
+        """Kanavi VL-Series 패킷 파싱
+        
+        거리/Detection은 NumPy 배열('distances', 'detections')로 반환합니다.
+        as_points=True이면 기존 포인트 dict 목록('points')도 함께 생성합니다.
+        """
+        self.stats["packets"] += 1
         try:
             if len(data) < 8:  # 최소 헤더 크기
+                self.stats["invalid"] += 1
                 return None
             
             # 프로토콜 구조 파싱 (Big Endian)
             header = data[0]
             if header != 0xFA:  # 시작 바이트 확인
+                self.stats["invalid"] += 1
                 return None
             
             product_line = data[1]
             lidar_id = data[2]
-            command = struct.unpack('>H', data[3:5])[0]  # Big Endian 2바이트
-            data_length = struct.unpack('>H', data[5:7])[0]  # Big Endian 2바이트
+            command, data_length = struct.unpack_from('>HH', data, 3)  # Big Endian 2바이트씩
             
             # Distance Data 명령인지 확인 (0xDDCX 형태)
             if (command & 0xFF00) != 0xDD00:
+                self.stats["invalid"] += 1
                 return None
                 
             channel = command & 0x00FF  # 채널 번호 (0xC0~0xCF에서 채널 추출)
             if (channel & 0xF0) != 0xC0:
+                self.stats["invalid"] += 1
                 return None
-                
-            actual_channel = channel & 0x0F  # 실제 채널 번호 (0~15)
             
             # 데이터 영역 파싱
             data_start = 7
             data_end = data_start + data_length
             
             if len(data) < data_end + 1:  # 체크섬 포함 확인
+                self.stats["invalid"] += 1
                 return None
             
-            packet_data = data[data_start:data_end]
             checksum = data[data_end]
             
             # 체크섬 검증 (Header부터 DataLength까지 XOR - Distance Data는 예외)
@@ -62,200 +111,2828 @@ class KanaviLidarParser:
                 calculated_checksum ^= data[i]
                 
             if calculated_checksum != checksum:
-                print(f"체크섬 오류: 계산값={calculated_checksum:02X}, 수신값={checksum:02X}")
+                self.stats["checksum_errors"] += 1
+                log(LOG_DEBUG, f"체크섬 오류: 계산값={calculated_checksum:02X}, 수신값={checksum:02X}")
                 return None
             
-            # Distance Data 파싱 - Kanavi 실제 구조에 맞게 수정
-            points = []
-            
-            # 디버그 정보 추가
-            print(f"🔍 디버그: 채널 {actual_channel}, 패킷 크기: {len(data)}바이트, "
-                  f"데이터 길이: {len(packet_data)}바이트")
-            
-            model_info = self.lidar_models.get(product_line, {
-                "name": f"Unknown_{product_line:02X}",
-                "channels": 4,
-                "hfov": 360,
-                "interface": "Unknown"
-            })
-            
-            # VL-R4의 경우 400포인트 예상
-            expected_points = 400 if product_line == 0x06 else 360  # VL-R4는 400, 나머지는 추정
+            return self.decode_packet(data, 0, product_line, lidar_id, command, data_length, len(data), as_points)
             
-            if len(packet_data) >= expected_points * 2:
-                # 거리 데이터: 각 포인트당 2바이트 (Distance_D + Distance_F)
-                valid_points = 0
-                zero_distance_count = 0
-                
-                # 거리 데이터 파싱 (2바이트씩)
-                for i in range(expected_points):
-                    if i * 2 + 1 >= len(packet_data):
-                        break
-                        
-                    distance_d = packet_data[i * 2]      # 정수부
-                    distance_f = packet_data[i * 2 + 1]  # 소수부
-                    
-                    # 거리 계산 (미터 단위)
-                    distance = distance_d + (distance_f / 100.0)
-                    
-                    # 각도 계산 (HFoV를 포인트 수로 균등 분할)
-                    hfov = model_info["hfov"]
-                    
-                    # Detection 정보 (마지막 바이트에서 추출하거나 기본값)
-                    detection = 0
-                    if len(packet_data) > expected_points * 2:
-                        # 추가 Detection 데이터가 있는 경우
-                        detection_offset = expected_points * 2
-                        if i < len(packet_data) - detection_offset:
-                            detection = packet_data[detection_offset + (i % (len(packet_data) - detection_offset))]
-                    
-                    points.append({
-                        'channel': actual_channel,
-                        'distance': distance,
-                        'detection': detection,
-                        'point_index': i
-                    })
-                    if distance > 0:  # 유효한 거리값 체크크
-                        valid_points += 1
-                    else:
-                        zero_distance_count += 1
-                
-                print(f"   → 포인트: {expected_points}개 = 유효 포인트: {valid_points} / 무효 포인트: {zero_distance_count}개")
-            
-            return {
-                'points': points,
-                'product_line': product_line,
-                'lidar_id': lidar_id,
-                'channel': actual_channel,
-                'model_info': model_info,
-                'num_points': len(points),
-                'raw_command': command,
-                'packet_size': len(data),
-                'data_length': len(packet_data)
+        except (IndexError, struct.error, ValueError) as e:
+            # 길이 검사를 통과했지만 형식이 맞지 않는 패킷만 집계 (그 밖의 예외는 코드 오류이므로 그대로 전달)
+            self.stats["parse_errors"] += 1
+            log(LOG_INFO, f"Kanavi 파싱 오류: {e}")
+            return None
+    
+    def decode_packet(self, data, offset, product_line, lidar_id, command, data_length, packet_size, as_points=False):
+        """헤더/체크섬 검증이 끝난 패킷(data[offset:])의 거리 데이터를 디코딩해 결과 dict 생성"""
+        actual_channel = command & 0x0F
+        
+        # 디버그 정보 추가 (문자열 생성 비용도 아끼도록 수준을 먼저 확인)
+        if log_level >= LOG_DEBUG:
+            print(f"🔍 디버그: 채널 {actual_channel}, 패킷 크기: {packet_size}바이트, "
+                  f"데이터 길이: {data_length}바이트")
+        
+        model_info = self.get_model_info(product_line)
+        
+        expected_points = self.expected_points(product_line)
+        
+        distances, detections = self.decode_distance_data(data, offset + 7, data_length, expected_points)
+        
+        if log_level >= LOG_DEBUG and len(distances) > 0:
+            valid_points = int(np.count_nonzero(distances))
+            zero_distance_count = len(distances) - valid_points
+            print(f"   → 포인트: {expected_points}개 = 유효 포인트: {valid_points} / 무효 포인트: {zero_distance_count}개")
+        
+        parsed_data = {
+            'distances': distances,
+            'detections': detections,
+            'product_line': product_line,
+            'lidar_id': lidar_id,
+            'channel': actual_channel,
+            'model_info': model_info,
+            'num_points': len(distances),
+            'raw_command': command,
+            'packet_size': packet_size,
+            'data_length': data_length
+        }
+        
+        # 호환용 포인트 dict 목록 (요청 시에만 생성)
+        if as_points:
+            parsed_data['points'] = self.to_point_dicts(parsed_data)
+        
+        return parsed_data
+    
+    def get_model_info(self, product_line):
+        """제품 코드별 모델 정보 (미지원 모델은 기본값)"""
+        return self.lidar_models.get(product_line, {
+            "name": f"Unknown_{product_line:02X}",
+            "channels": 4,
+            "hfov": 360,
+            "interface": "Unknown"
+        })
+    
+    def expected_points(self, product_line):
+        """패킷당 포인트 수 (VL-R4는 400, 나머지는 추정값 360)"""
+        return 400 if product_line == 0x06 else 360
+    
+    def get_vfov(self, model_name, channel):
+        """채널의 고정 수직각 (단일값, 맵에 없으면 0.0)"""
+        return self.vfov_maps.get(model_name, {}).get(channel, 0.0)
+    
+    def decode_distance_data(self, data, data_start, data_length, expected_points):
+        """Distance_D/Distance_F 바이트 쌍을 복사 없이 배열로 디코딩
+        
+        반환값: (float32 거리 배열[m], uint8 Detection 배열)
+        """
+        if data_length < expected_points * 2:
+            return EMPTY_DISTANCES, EMPTY_DETECTIONS
+        
+        # 거리 데이터: 각 포인트당 2바이트 (Distance_D 정수부 + Distance_F 소수부)
+        pairs = np.frombuffer(data, dtype=np.uint8, count=expected_points * 2, offset=data_start)
+        distances = self.pairs_to_distances(pairs)
+        
+        # Detection 정보: 거리 데이터 뒤에 추가 바이트가 있으면 포인트 순서대로 사용, 없으면 0
+        detections = np.zeros(expected_points, dtype=np.uint8)
+        detection_count = min(expected_points, data_length - expected_points * 2)
+        if detection_count > 0:
+            detections[:detection_count] = np.frombuffer(
+                data, dtype=np.uint8, count=detection_count,
+                offset=data_start + expected_points * 2)
+        
+        return distances, detections
+    
+    def pairs_to_distances(self, pairs):
+        """Distance_D/Distance_F 바이트 쌍(마지막 축) → float32 거리 배열[m]
+        
+        패킷 하나(포인트 × 2)와 배치(패킷 수 × 포인트 × 2) 모두 같은 계산을 사용합니다.
+        """
+        centimeters = pairs[..., 0::2].astype(np.uint16) * 100 + pairs[..., 1::2]
+        return centimeters.astype(np.float32) / np.float32(100.0)
+    
+    def to_point_dicts(self, parsed_data):
+        """디코딩된 배열을 기존 포인트 dict 목록 형태로 변환 (호환용)"""
+        channel = parsed_data['channel']
+        return [
+            {
+                'channel': channel,
+                'distance': distance,
+                'detection': detection,
+                'point_index': i
             }
-            
-        except Exception as e:
-            print(f"Kanavi 파싱 오류: {e}")
+            for i, (distance, detection) in enumerate(zip(
+                parsed_data['distances'].astype(np.float64).round(2).tolist(),
+                parsed_data['detections'].tolist()))
+        ]
+
+def build_kanavi_packet(product_line, lidar_id, channel, distances, detections=None):
+    """Kanavi Distance Data 패킷 생성 (parse_kanavi_packet의 역변환, 테스트/부하 생성용)
+    
+    distances: 미터 단위 거리 배열, detections: 포인트별 Detection 바이트 (선택)
+    """
+    centimeters = np.clip(np.rint(np.asarray(distances, dtype=np.float64) * 100.0), 0, 255 * 100 + 99)
+    centimeters = centimeters.astype(np.uint16)
+    pairs = np.empty(len(centimeters) * 2, dtype=np.uint8)
+    pairs[0::2] = centimeters // 100  # Distance_D (정수부)
+    pairs[1::2] = centimeters % 100   # Distance_F (소수부)
+    payload = pairs.tobytes()
+    if detections is not None:
+        payload += np.asarray(detections, dtype=np.uint8).tobytes()
+    
+    header = struct.pack('>BBBHH', 0xFA, product_line, lidar_id, 0xDDC0 | (channel & 0x0F), len(payload))
+    checksum = 0
+    for byte in header:  # Header ~ DataLength XOR
+        checksum ^= byte
+    return header + payload + bytes([checksum])
+
+class KanaviStreamParser:
+    """바이트 스트림/데이터그램 배치용 Kanavi 패킷 파서 (디코딩은 KanaviLidarParser 재사용)
+
+    임의로 나뉜 바이트 조각(캡처 파일, TCP/시리얼, 패킷 여러 개가 붙은 데이터그램)에서 0xFA 헤더를 찾아
+    Command/Data Length/체크섬을 검증하고, 손상된 구간은 한 바이트씩 건너뛰며 다음 패킷 경계로 재동기화합니다.
+    parse_many는 배치의 패킷을 포인트 수별로 모아 거리/Detection을 NumPy 연산 한 번으로 디코딩합니다.
+    카운터는 parser.stats에 함께 집계합니다 (packets: 검증한 패킷, resyncs: 동기를 잃은 횟수,
+    skipped_bytes: 버린 바이트 수, truncated: 끝이 잘려 버린 패킷 수).
+    """
+
+    HEADER = struct.Struct('>BBBHH')  # Header, Product Line, LiDAR ID, Command, Data Length
+    MAX_DATA_LENGTH = 4096  # 이보다 긴 Data Length는 손상된 헤더로 간주 (VL-R4 패킷도 1200바이트 이하)
+
+    def __init__(self, parser=None):
+        self.parser = parser or KanaviLidarParser()
+        self.stats = self.parser.stats
+        self.pending = b""  # feed: 다음 조각을 기다리는 미완성 패킷
+        self.synced = True
+
+    def feed(self, chunk, as_points=False):
+        """바이트 조각 추가 → 완성된 패킷 결과 목록 (끝의 미완성 패킷은 다음 조각까지 보관)"""
+        data = self.pending + bytes(chunk) if self.pending else bytes(chunk)
+        headers = []
+        self.pending = data[self.scan(data, headers):]
+        return [result for result in (self.decode(data, header, as_points) for header in headers) if result]
+
+    def flush(self):
+        """보관 중인 미완성 패킷 버리기 (스트림 종료/재연결 시)"""
+        if self.pending:
+            self.stats["truncated"] += 1
+            self.pending = b""
+        self.synced = True
+
+    def parse_many(self, batch, as_points=False):
+        """데이터그램 배치 [(data, addr), ...]를 한 번에 파싱 → [(parsed_data, addr), ...]
+
+        데이터그램 경계를 패킷 경계로 보고 조각을 이어 붙이지 않습니다 (데이터그램 안에서 끝나지 않는 패킷은 truncated).
+        패킷이 하나도 없고 체크섬 오류나 잘림도 아닌 데이터그램은 invalid로 셉니다.
+        """
+        stats = self.stats
+        packets = []
+        headers = []
+        for data, addr in batch:
+            if not isinstance(data, bytes):
+                data = bytes(data)  # memoryview는 find 미지원, 수신 버퍼 재사용과도 분리
+            errors = stats["checksum_errors"] + stats["truncated"]
+            self.synced = True
+            self.scan(data, headers, final=True)
+            if not headers and stats["checksum_errors"] + stats["truncated"] == errors:
+                stats["invalid"] += 1
+            for header in headers:
+                packets.append((data, header, addr))
+            headers.clear()
+
+        if as_points or log_level >= LOG_DEBUG or len(packets) < 2:
+            results = [(self.decode(data, header, as_points), addr) for data, header, addr in packets]
+            return [result for result in results if result[0]]
+        return self.decode_batch(packets)
+
+    def scan(self, data, headers, final=False):
+        """data에서 완성된 패킷 헤더 (start, product_line, lidar_id, command, data_length)를 모두 찾아
+        headers에 추가 → 처리하지 못한 나머지의 시작 위치
+
+        final이면 뒤에 이어질 조각이 없으므로 끝나지 않는 패킷을 truncated로 세고 그 뒤를 계속 찾습니다.
+        """
+        stats = self.stats
+        unpack_header = self.HEADER.unpack_from
+        end = len(data)
+        position = 0
+        while position < end:
+            start = position if data[position] == 0xFA else data.find(b'\xfa', position)
+            if start < 0:
+                self.discard(end - position)
+                return end
+            if start > position:
+                self.discard(start - position)
+            if end - start < 8:  # 헤더 + 체크섬보다 짧음 → 다음 조각 대기
+                if not final:
+                    return start
+                stats["truncated"] += 1
+                self.discard(end - start)
+                return end
+
+            _, product_line, lidar_id, command, data_length = unpack_header(data, start)
+            if (command & 0xFFF0) != 0xDDC0 or data_length > self.MAX_DATA_LENGTH:
+                self.discard(1)
+                position = start + 1
+                continue
+            checksum_index = start + 7 + data_length
+            if checksum_index >= end:
+                if not final:
+                    return start
+                stats["truncated"] += 1
+                self.discard(1)
+                position = start + 1
+                continue
+
+            stats["packets"] += 1
+            # 체크섬: Header ~ Data Length XOR (Distance Data 제외)
+            checksum = (0xFA ^ product_line ^ lidar_id ^ (command >> 8) ^ (command & 0xFF)
+                        ^ (data_length >> 8) ^ (data_length & 0xFF))
+            if checksum != data[checksum_index]:
+                stats["checksum_errors"] += 1
+                log(LOG_DEBUG, f"체크섬 오류: 계산값={checksum:02X}, 수신값={data[checksum_index]:02X} (재동기화)")
+                self.discard(1)
+                position = start + 1
+                continue
+
+            headers.append((start, product_line, lidar_id, command, data_length))
+            self.synced = True
+            position = checksum_index + 1
+        return end
+
+    def discard(self, count):
+        """재동기화 중 버린 바이트 집계 (동기 상태에서 처음 버릴 때 resyncs 증가)"""
+        if self.synced:
+            self.stats["resyncs"] += 1
+            self.synced = False
+        self.stats["skipped_bytes"] += count
+
+    def decode(self, data, header, as_points=False):
+        """검증한 패킷 하나 디코딩 (실패하면 None)"""
+        start, product_line, lidar_id, command, data_length = header
+        try:
+            return self.parser.decode_packet(data, start, product_line, lidar_id, command,
+                                             data_length, data_length + 8, as_points)
+        except ValueError as e:
+            self.stats["parse_errors"] += 1
+            log(LOG_INFO, f"Kanavi 파싱 오류: {e}")
             return None
 
+    def decode_batch(self, packets):
+        """검증한 패킷 [(data, header, addr), ...]을 포인트 수별로 모아 한 번에 디코딩 → [(parsed_data, addr), ...]
+
+        패킷마다 거리 2바이트 × N + Detection N바이트(모자라면 0으로 채움)를 이어 붙여 (패킷 수 × 3N) 배열로 변환하고,
+        결과 배열의 행을 패킷별 distances/detections로 나눠 줍니다 (거리는 pairs_to_distances로 계산).
+        """
+        parser = self.parser
+        results = [None] * len(packets)
+        groups = defaultdict(list)  # 패킷당 포인트 수 → 패킷 번호
+        for index, (data, header, addr) in enumerate(packets):
+            points = parser.expected_points(header[1])
+            if header[4] >= points * 2:
+                groups[points].append(index)
+            else:
+                results[index] = (self.decode(data, header), addr)  # 거리 데이터 부족 → 빈 배열
+
+        for points, indices in groups.items():
+            record_size = points * 3
+            chunks = []
+            for index in indices:
+                data, (start, _, _, _, data_length), _ = packets[index]
+                chunk = data[start + 7:start + 7 + min(data_length, record_size)]
+                chunks.append(chunk if len(chunk) == record_size else chunk + bytes(record_size - len(chunk)))
+            records = np.frombuffer(b"".join(chunks), dtype=np.uint8).reshape(len(indices), record_size)
+            distances = parser.pairs_to_distances(records[:, :points * 2])
+            detections = records[:, points * 2:].copy()
+            for row, index in enumerate(indices):
+                _, (start, product_line, lidar_id, command, data_length), addr = packets[index]
+                results[index] = ({
+                    'distances': distances[row],
+                    'detections': detections[row],
+                    'product_line': product_line,
+                    'lidar_id': lidar_id,
+                    'channel': command & 0x0F,
+                    'model_info': parser.get_model_info(product_line),
+                    'num_points': points,
+                    'raw_command': command,
+                    'packet_size': data_length + 8,
+                    'data_length': data_length
+                }, addr)
+        return [result for result in results if result[0]]
+
+IP_MULTICAST_ALL = 49  # Linux <linux/in.h> (socket 모듈에 상수 없음)
+
+class KanaviDatagramProtocol(asyncio.DatagramProtocol):
+    """asyncio UDP 프로토콜 - 수신한 데이터그램을 KanaviLidarReceiver로 전달"""
+    
+    def __init__(self, receiver):
+        self.receiver = receiver
+    
+    def datagram_received(self, data, addr):
+        if self.receiver.recorder:
+            self.receiver.recorder.write(data, addr)
+        self.receiver.handle_datagram(data, addr)
+    
+    def error_received(self, exc):
+        print(f"패킷 수신 오류: {exc}")
+
 class KanaviLidarReceiver:
-    """Kanavi 라이다 UDP 수신기 (멀티캐스트 지원)"""
+    """Kanavi 라이다 UDP 수신기 (멀티캐스트 지원, asyncio 이벤트 루프에서 동작)
     
-    def __init__(self, listen_port=2020, multicast_group="224.0.0.5"):
+    batch_size > 0이면 소켓이 읽기 가능해질 때마다 미리 할당한 버퍼로 최대 batch_size개의
+    데이터그램을 한 번에 읽습니다 (배치 수신). 0이면 DatagramProtocol로 하나씩 받습니다.
+    """
+    
+    MAX_DATAGRAM_SIZE = 2048  # 최대 2KB 패킷
+    
+    def __init__(self, listen_port=2020, multicast_group="224.0.0.5",
+                 batch_size=64, receive_buffer_size=4 * 1024 * 1024):
         self.listen_port = listen_port
         self.multicast_group = multicast_group  # Kanavi 기본 멀티캐스트 그룹
+        self.endpoint = f"{multicast_group}:{listen_port}"  # 센서 목록에 표시할 수신 엔드포인트
         self.parser = KanaviLidarParser()
+        self.stream_parser = KanaviStreamParser(self.parser)  # 배치 파싱 (카운터는 self.parser.stats)
         self.running = False
         self.socket = None
+        self.transport = None
         self.data_callback = None
+        self.raw_callback = None
+        self.recorder = None
+        self.batch_size = batch_size
+        self.receive_buffer_size = receive_buffer_size  # SO_RCVBUF 요청값 (None이면 OS 기본값)
+        self.receive_buffers = []
+        self.reader_loop = None
+        self.stats = {
+            "mode": "batched" if batch_size > 0 else "datagram",
+            "datagrams": 0,
+            "bytes": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "receive_buffer_bytes": None
+        }
         
     def set_data_callback(self, callback):
         """데이터 수신 콜백 설정"""
         self.data_callback = callback
     
-    def start_receiving(self):
-        """UDP 멀티캐스트 수신 시작"""
+    def set_raw_callback(self, callback):
+        """원시 데이터그램 배치 콜백 설정 (설정하면 이 수신기는 파싱하지 않음)
+        
+        callback([(bytes, addr), ...]) 형태로 호출됩니다.
+        """
+        self.raw_callback = callback
+    
+    def set_recorder(self, recorder):
+        """수신한 원시 데이터그램을 KanaviCaptureWriter에 기록"""
+        self.recorder = recorder
+    
+    def multicast_request(self):
+        """멀티캐스트 그룹 가입/탈퇴 요청 구조체"""
+        return struct.pack("4sl", socket.inet_aton(self.multicast_group), socket.INADDR_ANY)
+    
+    def create_socket(self):
+        """멀티캐스트 그룹에 가입한 논블로킹 UDP 소켓 생성"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
-            # UDP 소켓 생성
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            
-            # 멀티캐스트 그룹 조인
-            self.socket.bind(('', self.listen_port))  # 모든 인터페이스에서 수신
-            
-            # 멀티캐스트 그룹에 참여
-            mreq = struct.pack("4sl", socket.inet_aton(self.multicast_group), socket.INADDR_ANY)
-            self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-            
-            self.socket.settimeout(1.0)  # 1초 타임아웃
-            
-            self.running = True
-            print(f"🎯 Kanavi 멀티캐스트 수신 시작:")
-            print(f"   - 멀티캐스트 그룹: {self.multicast_group}")
-            print(f"   - 포트: {self.listen_port}")
-            print(f"📡 파서 타입: Kanavi VL-Series")
-            
-            while self.running:
-                try:
-                    data, addr = self.socket.recvfrom(2048)  # 최대 2KB 패킷
-                    
-                    # Kanavi 프로토콜 파싱
-                    parsed_data = self.parser.parse_kanavi_packet(data)
-                    
-                    if parsed_data and self.data_callback:
-                        self.data_callback(parsed_data, addr)
-                        
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    print(f"패킷 수신 오류: {e}")
-                    
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if self.receive_buffer_size:
+                # 파서가 잠시 밀려도 커널에서 버려지지 않도록 수신 버퍼 확대
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+            self.stats["receive_buffer_bytes"] = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+            sock.bind(('', self.listen_port))  # 모든 인터페이스에서 수신
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, self.multicast_request())
+            if sys.platform.startswith("linux"):
+                # 같은 포트에서 다른 그룹을 받는 수신기와 패킷이 섞이지 않도록 가입한 그룹만 수신
+                sock.setsockopt(socket.IPPROTO_IP, IP_MULTICAST_ALL, 0)
+            sock.setblocking(False)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+    
+    async def start_receiving(self):
+        """UDP 멀티캐스트 수신 시작 (이미 수신 중이면 무시)
+        
+        반환값: 수신 중이면 True, 소켓 초기화에 실패하면 False
+        """
+        if self.running:
+            return True
+        
+        try:
+            self.socket = self.create_socket()
+            loop = asyncio.get_running_loop()
+            if self.batch_size > 0 and self.start_batched_reader(loop):
+                self.stats["mode"] = "batched"
+            else:
+                self.stats["mode"] = "datagram"
+                self.transport, _ = await loop.create_datagram_endpoint(
+                    lambda: KanaviDatagramProtocol(self), sock=self.socket)
         except Exception as e:
             print(f"멀티캐스트 UDP 소켓 초기화 오류: {e}")
             print("💡 해결 방법:")
             print("   1. 관리자 권한으로 실행")
-            print("   2. 방화벽에서 포트 5000 허용")
+            print(f"   2. 방화벽에서 포트 {self.listen_port} 허용")
             print("   3. 네트워크 어댑터에서 멀티캐스트 활성화")
-        finally:
-            if self.socket:
+            self.close_socket()
+            return False
+        
+        self.running = True
+        print(f"🎯 Kanavi 멀티캐스트 수신 시작:")
+        print(f"   - 멀티캐스트 그룹: {self.multicast_group}")
+        print(f"   - 포트: {self.listen_port}")
+        print(f"   - 수신 방식: {self.stats['mode']} (수신 버퍼 {self.stats['receive_buffer_bytes']}바이트)")
+        print(f"📡 파서 타입: Kanavi VL-Series")
+        return True
+    
+    def start_batched_reader(self, loop):
+        """소켓 읽기 이벤트에 배치 수신 함수 등록 (add_reader 미지원 루프면 False)"""
+        if not self.receive_buffers:
+            self.receive_buffers = [bytearray(self.MAX_DATAGRAM_SIZE) for _ in range(self.batch_size)]
+        try:
+            loop.add_reader(self.socket.fileno(), self.drain_socket)
+        except NotImplementedError:
+            # Windows ProactorEventLoop 등은 add_reader를 지원하지 않음
+            return False
+        self.reader_loop = loop
+        return True
+    
+    def drain_socket(self):
+        """읽기 가능한 데이터그램을 최대 batch_size개까지 한 번에 읽어 처리"""
+        received = []
+        for buffer in self.receive_buffers:
+            try:
+                nbytes, addr = self.socket.recvfrom_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                print(f"패킷 수신 오류: {e}")
+                break
+            received.append((nbytes, addr))
+        
+        if not received:
+            return
+        
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(received))
+        
+        if self.recorder:
+            now = time.time()
+            for buffer, (nbytes, addr) in zip(self.receive_buffers, received):
+                self.recorder.write(memoryview(buffer)[:nbytes], addr, now)
+        
+        if self.raw_callback:
+            # 파서 풀 등 다른 곳에서 파싱 - 버퍼 재사용을 위해 복사해서 전달
+            batch = [(bytes(memoryview(buffer)[:nbytes]), addr)
+                     for buffer, (nbytes, addr) in zip(self.receive_buffers, received)]
+            self.stats["datagrams"] += len(batch)
+            self.stats["bytes"] += sum(nbytes for nbytes, _ in received)
+            self.raw_callback(batch)
+            return
+        
+        # 배치 파서가 데이터그램을 bytes로 복사하므로 버퍼 재사용 가능
+        self.stats["datagrams"] += len(received)
+        self.stats["bytes"] += sum(nbytes for nbytes, _ in received)
+        self.parse_batch([(memoryview(buffer)[:nbytes], addr)
+                          for buffer, (nbytes, addr) in zip(self.receive_buffers, received)])
+    
+    def read_kernel_drops(self):
+        """커널이 이 소켓에서 버린 데이터그램 수 (/proc/net/udp, Linux 전용)"""
+        if not self.socket:
+            return None
+        try:
+            inode = str(os.fstat(self.socket.fileno()).st_ino)
+            with open("/proc/net/udp") as f:
+                next(f)  # 헤더
+                for line in f:
+                    fields = line.split()
+                    if len(fields) >= 13 and fields[9] == inode:
+                        return int(fields[12])
+        except (OSError, ValueError):
+            pass
+        return None
+    
+    def get_stats(self):
+        """수신 통계 (커널 드롭 수 포함)"""
+        stats = dict(self.stats)
+        stats["kernel_drops"] = self.read_kernel_drops()
+        if self.recorder:
+            stats["recorder"] = dict(self.recorder.stats)
+        return stats
+    
+    def handle_datagram(self, data, addr):
+        """수신한 데이터그램 파싱 후 콜백 호출"""
+        self.stats["datagrams"] += 1
+        self.stats["bytes"] += len(data)
+        if self.raw_callback:
+            self.raw_callback([(bytes(data), addr)])
+            return
+        self.parse_batch([(data, addr)])
+    
+    def parse_batch(self, batch):
+        """데이터그램 배치를 한 번에 파싱 후 패킷마다 콜백 호출 (데이터그램 하나에 여러 패킷이 붙어 있어도 모두 전달)"""
+        # 수신 시각과 파싱 시간은 단계별 지연 측정용 (파싱 시간은 배치 평균)
+        received_at = time.time()
+        parse_start = time.perf_counter()
+        results = self.stream_parser.parse_many(batch)
+        if not results or not self.data_callback:
+            return
+        parse_seconds = (time.perf_counter() - parse_start) / len(results)
+        for parsed_data, addr in results:
+            parsed_data['parse_seconds'] = parse_seconds
+            parsed_data['received_at'] = received_at
+            parsed_data['endpoint'] = self.endpoint
+            try:
+                self.data_callback(parsed_data, addr)
+            except Exception as e:
+                print(f"패킷 수신 오류: {e}")
+    
+    def close_socket(self):
+        """멀티캐스트 그룹 탈퇴 후 소켓 닫기"""
+        if self.reader_loop and self.socket:
+            self.reader_loop.remove_reader(self.socket.fileno())
+        self.reader_loop = None
+        if self.socket:
+            try:
+                self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_DROP_MEMBERSHIP, self.multicast_request())
+            except OSError:
+                pass
+        if self.transport:
+            self.transport.close()  # 소켓도 함께 닫힘
+        elif self.socket:
+            self.socket.close()
+        self.transport = None
+        self.socket = None
+    
+    def stop_receiving(self):
+        """수신 즉시 중지"""
+        self.running = False
+        self.close_socket()
+        if self.recorder:
+            self.recorder.close()
+
+class KanaviReplaySource(KanaviLidarReceiver):
+    """캡처 파일 재생 소스 (KanaviLidarReceiver 대신 사용)
+    
+    기록된 데이터그램을 기록 당시 간격대로 같은 콜백(파싱 또는 원시 배치)에 전달합니다.
+    speed: 1.0이면 실시간, N이면 N배속, 0이면 대기 없이 최대 속도
+    """
+    
+    def __init__(self, capture_path, speed=1.0, loop=False, batch_size=64, udp_port=None):
+        super().__init__(listen_port=udp_port, multicast_group=None, batch_size=batch_size)
+        self.capture_path = capture_path
+        self.endpoint = f"replay:{os.path.basename(capture_path)}"
+        self.speed = speed
+        self.loop = loop
+        self.replay_task = None
+        self.stats.update({
+            "mode": "replay",
+            "capture": capture_path,
+            "speed": speed,
+            "loops": 0,
+            "max_lag_ms": 0.0,
+            "elapsed_s": 0.0,
+            "finished": False
+        })
+    
+    async def start_receiving(self):
+        """재생 시작 (이미 재생 중이면 무시)"""
+        if self.running:
+            return True
+        try:
+            KanaviCaptureReader(self.capture_path, self.listen_port).close()
+        except (OSError, ValueError) as e:
+            print(f"캡처 파일 열기 오류: {e}")
+            return False
+        
+        self.running = True
+        self.stats["finished"] = False
+        self.replay_task = asyncio.create_task(self.replay_loop())
+        speed = f"{self.speed}배속" if self.speed > 0 else "최대 속도"
+        print(f"▶️  캡처 재생 시작: {self.capture_path} ({speed}{', 반복' if self.loop else ''})")
+        return True
+    
+    async def replay_loop(self):
+        """캡처 파일을 끝까지 재생 (loop이면 처음부터 반복)"""
+        start_time = time.perf_counter()
+        try:
+            while self.running:
+                reader = KanaviCaptureReader(self.capture_path, self.listen_port)
                 try:
-                    # 멀티캐스트 그룹에서 탈퇴
-                    mreq = struct.pack("4sl", socket.inet_aton(self.multicast_group), socket.INADDR_ANY)
-                    self.socket.setsockopt(socket.IPPROTO_IP, socket.IP_DROP_MEMBERSHIP, mreq)
-                except:
-                    pass
-                self.socket.close()
+                    await self.replay_records(reader)
+                finally:
+                    reader.close()
+                if not self.loop:
+                    break
+                self.stats["loops"] += 1
+        except Exception as e:
+            print(f"캡처 재생 오류: {e}")
+        finally:
+            self.stats["elapsed_s"] = round(time.perf_counter() - start_time, 3)
+            if self.running:
+                self.stats["finished"] = True
+                self.running = False
+                print(f"⏹️  캡처 재생 완료: {self.stats['datagrams']}개 데이터그램, {self.stats['elapsed_s']}초")
+    
+    async def replay_records(self, reader):
+        """기록 간격에 맞춰 데이터그램을 batch_size개 이하의 배치로 전달"""
+        batch_size = max(self.batch_size, 1)
+        start_time = time.perf_counter()
+        first_timestamp = None
+        batch = []
+        for timestamp, data, addr in reader:
+            if not self.running:
+                return
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            
+            if self.speed > 0:
+                delay = start_time + (timestamp - first_timestamp) / self.speed - time.perf_counter()
+                if delay > 0.001:
+                    if batch:
+                        self.dispatch_batch(batch)
+                        batch = []
+                    await asyncio.sleep(delay)
+                elif delay < 0:
+                    self.stats["max_lag_ms"] = round(max(self.stats["max_lag_ms"], -delay * 1000.0), 3)
+            
+            batch.append((data, addr))
+            if len(batch) >= batch_size:
+                self.dispatch_batch(batch)
+                batch = []
+                await asyncio.sleep(0)  # 최대 속도에서도 다른 태스크가 돌 수 있도록 양보
+        
+        if batch and self.running:
+            self.dispatch_batch(batch)
+    
+    def dispatch_batch(self, batch):
+        """재생 배치를 수신 콜백으로 전달"""
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        self.stats["datagrams"] += len(batch)
+        self.stats["bytes"] += sum(len(data) for data, _ in batch)
+        if self.raw_callback:
+            self.raw_callback(batch)
+        else:
+            self.parse_batch(batch)
     
     def stop_receiving(self):
-        """수신 중지"""
+        """재생 즉시 중지"""
         self.running = False
+        if self.replay_task:
+            self.replay_task.cancel()
+            self.replay_task = None
+
+class KanaviRelaySource(KanaviLidarReceiver):
+    """상위 서버 중계 소스 (KanaviLidarReceiver 대신 사용)
+    
+    상위 KanaviWebSocketServer에 WebSocket 하나로 접속해 relay 스트림(바이너리 'KR')을 받고,
+    센서 식별 정보와 상위 서버의 시퀀스/수신 시각을 유지한 채 같은 데이터 콜백에 전달합니다.
+    연결이 끊기면 RECONNECT_DELAY 범위에서 간격을 늘려 가며 다시 접속합니다.
+    """
+    
+    RECONNECT_DELAY = (0.5, 5.0)  # 재접속 대기 (최소, 최대) 초
+    
+    def __init__(self, upstream_url, distance_format="uint16"):
+        super().__init__(listen_port=None, multicast_group=None, batch_size=0)
+        self.upstream_url = upstream_url
+        self.endpoint = f"relay:{upstream_url}"
+        self.distance_format = distance_format  # uint16이면 cm 단위 (파서 분해능과 같아 손실 없음)
+        self.relay_task = None
+        self.stats.update({
+            "mode": "relay",
+            "upstream": upstream_url,
+            "connected": False,
+            "connects": 0,
+            "disconnects": 0,
+            "frames": 0,
+            "decode_errors": 0,
+            "upstream_errors": 0
+        })
+    
+    async def start_receiving(self):
+        """상위 서버 중계 시작 (이미 중계 중이면 무시, 접속은 백그라운드에서 재시도)"""
+        if self.running:
+            return True
+        self.running = True
+        self.relay_task = asyncio.create_task(self.relay_loop())
+        print(f"🔁 상위 서버 중계 시작: {self.upstream_url} (relay 스트림, {self.distance_format})")
+        return True
+    
+    async def relay_loop(self):
+        """상위 서버 접속 → start_scan(relay) → 프레임 수신, 끊기면 재접속"""
+        delay = self.RECONNECT_DELAY[0]
+        while self.running:
+            try:
+                async with websockets.connect(self.upstream_url, max_size=None) as websocket:
+                    await websocket.send(json.dumps({
+                        "type": "start_scan",
+                        "encoding": "binary",
+                        "distance_format": self.distance_format,
+                        "frame_mode": "channel",
+                        "stream": "relay"
+                    }))
+                    self.stats["connected"] = True
+                    self.stats["connects"] += 1
+                    delay = self.RECONNECT_DELAY[0]
+                    print(f"🔗 상위 서버 연결: {self.upstream_url}")
+                    async for message in websocket:
+                        if isinstance(message, bytes):
+                            self.handle_relay_frame(message)
+                        else:
+                            self.handle_upstream_message(message)
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                if self.stats["connected"] or self.stats["connects"] == 0:
+                    print(f"⚠️  상위 서버 연결 끊김: {self.upstream_url} ({e})")
+            finally:
+                if self.stats["connected"]:
+                    self.stats["disconnects"] += 1
+                self.stats["connected"] = False
+            if self.running:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RECONNECT_DELAY[1])
+    
+    def handle_upstream_message(self, message):
+        """상위 서버 텍스트 메시지 (연결 직후의 JSON 스냅샷 등은 무시, 오류만 출력)"""
+        try:
+            data = json.loads(message)
+        except json.JSONDecodeError:
+            return
+        if data.get("type") == "error":
+            self.stats["upstream_errors"] += 1
+            print(f"❌ 상위 서버 오류: {data.get('message')}")
+    
+    def handle_relay_frame(self, payload):
+        """중계 프레임 디코딩 후 parse_kanavi_packet 결과 형태로 콜백 호출"""
+        self.stats["datagrams"] += 1
+        self.stats["bytes"] += len(payload)
+        decode_start = time.perf_counter()
+        try:
+            frame = KanaviFrameEncoder.decode_relay(payload)
+        except (ValueError, struct.error) as e:
+            self.stats["decode_errors"] += 1
+            log(LOG_INFO, f"중계 프레임 오류: {e}")
+            return
+        self.stats["frames"] += 1
+        if not self.data_callback:
+            return
+        product_line = frame['product_line']
+        parsed_data = {
+            'distances': frame['distances'],
+            'detections': frame['detections'],
+            'product_line': product_line,
+            'lidar_id': frame['lidar_id'],
+            'channel': frame['channel'],
+            'model_info': self.parser.get_model_info(product_line),
+            'num_points': len(frame['distances']),
+            'packet_size': len(payload),
+            'parse_seconds': time.perf_counter() - decode_start,
+            'received_at': frame['timestamp'],  # 상위 서버 수신 시각 (전체 지연에 중계 구간 포함)
+            'sequence': frame['sequence'],  # 상위 서버 시퀀스 유지 (클라이언트 누락 검사용)
+            'endpoint': self.endpoint
+        }
+        self.data_callback(parsed_data, (frame['source_ip'], 0))
+    
+    def get_stats(self):
+        return dict(self.stats)
+    
+    def stop_receiving(self):
+        """중계 즉시 중지 (상위 서버 연결 종료)"""
+        self.running = False
+        if self.relay_task:
+            self.relay_task.cancel()
+            self.relay_task = None
+
+def parser_worker_main(worker_index, ring_name, input_queue, result_queue, slot_credits, stop_event,
+                       scan_filter=None):
+    """파서 워커 프로세스: 원시 데이터그램 배치를 파싱하고 스캔 필터까지 적용해 공유 메모리 슬롯에 기록
+    
+    scan_filter는 워커마다 따로 가진 복사본입니다. 같은 센서는 항상 같은 워커로 오므로
+    채널별 시간축 필터 상태가 워커 안에서 이어집니다. 수집 스레드에는 슬롯 번호와 필터 시간만 보냅니다.
+    
+    slot_credits는 수집 스레드가 읽고 돌려준 빈 슬롯 수입니다. 빈 슬롯이 없으면 모은 결과를 먼저 보내고
+    기다리므로 수집되지 않은 슬롯을 덮어쓰지 않습니다. 입력 큐에 쌓인 배치는 한꺼번에 처리해 결과를 한 번에 보냅니다.
+    """
+    ring = SharedScanRing.attach(ring_name, child_process=True)
+    parser = KanaviLidarParser()
+    stream_parser = KanaviStreamParser(parser)
+    if scan_filter:
+        scan_filter.reset()
+    slot = 0
+    results = []
+    consumed = 0  # 결과를 보내지 않은 처리 완료 데이터그램 수 (메인 프로세스 흐름 제어용)
+    try:
+        while True:
+            item = input_queue.get()
+            while item is not None:
+                batch, received_at, endpoint = item
+                for parsed_data, addr in stream_parser.parse_many(batch):
+                    if parsed_data['num_points'] == 0:
+                        continue
+                    if not slot_credits.acquire(block=False):
+                        # 빈 슬롯 없음: 모은 결과를 보내 수집 스레드가 슬롯을 돌려주게 함
+                        if results:
+                            result_queue.put((worker_index, consumed, results, worker_stats(parser, scan_filter)))
+                            results, consumed = [], 0
+                        while not slot_credits.acquire(timeout=0.5):
+                            if stop_event.is_set():
+                                return
+                    filtered = filter_seconds = None
+                    if scan_filter:
+                        filter_start = time.perf_counter()
+                        filtered = scan_filter.apply(dict(
+                            parsed_data, source_ip=str(addr[0]),
+                            vfov=parser.get_vfov(parsed_data['model_info']['name'], parsed_data['channel'])))
+                        filter_seconds = time.perf_counter() - filter_start
+                    # 슬롯 timestamp에는 메인 프로세스의 수신 시각 기록
+                    write_seq = ring.write_slot(slot, parsed_data, addr, received_at, filtered)
+                    results.append((slot, write_seq, endpoint, filter_seconds))
+                    slot = (slot + 1) % ring.slot_count
+                consumed += len(batch)
+                try:
+                    item = input_queue.get_nowait()
+                except queue.Empty:
+                    break
+            
+            # 결과가 없어도(모두 버린 패킷) 처리한 데이터그램 수와 파서 통계는 전달
+            result_queue.put((worker_index, consumed, results, worker_stats(parser, scan_filter)))
+            results, consumed = [], 0
+            if item is None:  # 종료 신호
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+
+def worker_stats(parser, scan_filter):
+    """워커가 결과와 함께 보내는 통계 (파서, 스캔 필터)"""
+    return dict(parser.stats), dict(scan_filter.stats) if scan_filter else None
+
+class KanaviParserPool:
+    """멀티 프로세스 센서 파이프라인 풀
+    
+    원시 데이터그램을 센서(source_ip, product_line, lidar_id) 기준으로 워커에 분배합니다.
+    워커는 파싱, 스캔 필터(scan_filter가 있으면)까지 처리해 거리/필터 결과/Detection 배열을
+    공유 메모리 슬롯에 기록하고, 슬롯 번호만 돌려줍니다. 수집 스레드는 슬롯을 읽어 콜백에 전달합니다.
+    같은 센서는 항상 같은 워커가 처리하므로 채널 내 순서와 시간축 필터 상태가 유지됩니다.
+    
+    흐름 제어:
+    - 워커는 수집 스레드가 돌려준 빈 슬롯에만 기록하므로 결과를 덮어써 잃지 않습니다.
+    - 워커별로 처리 중인 데이터그램이 max_in_flight를 넘으면 새 배치는 워커에 보내지 않고
+      backpressure_drops로 집계합니다 (수집이 밀려도 큐가 끝없이 늘지 않음).
+    
+    수집 스레드에 남는 일(센서 상태, 격자, 조립, 기록, 공유 메모리 공개)은 패킷당 비용이 필터보다 작아서
+    센서가 여러 대면 워커 수(CPU 코어 수까지)에 따라 처리량이 늘어납니다.
+    """
+    
+    def __init__(self, worker_count, parser=None, scan_filter=None, slots_per_worker=256, max_points=1024,
+                 max_in_flight=None):
+        self.worker_count = worker_count
+        self.parser = parser or KanaviLidarParser()  # 모델 정보 조회용
+        self.scan_filter = scan_filter  # 워커마다 복사해 사용할 KanaviScanFilter (None이면 필터 없음)
+        self.slots_per_worker = slots_per_worker
+        self.max_points = max_points
+        self.max_in_flight = max_in_flight or slots_per_worker * 2  # 워커별 처리 중 데이터그램 상한
+        self.rings = []
+        self.input_queues = []
+        self.slot_credits = []
+        self.workers = []
+        self.in_flight = []  # 워커별 결과를 받지 않은 데이터그램 수
+        self.stop_event = None
+        self.result_queue = None
+        self.collector_thread = None
+        self.data_callback = None
+        self.running = False
+        self.lock = threading.Lock()  # in_flight(수신 스레드와 수집 스레드), sensor_workers(수신 스레드끼리)
+        self.worker_parser_stats = {}  # 워커 번호 → 워커 파서 통계
+        self.worker_filter_stats = {}  # 워커 번호 → 워커 스캔 필터 통계
+        self.sensor_workers = {}  # (source_ip, product_line, lidar_id) → 워커 번호
+        self.stats = {
+            "workers": worker_count,
+            "submitted": 0,
+            "decoded": 0,
+            "result_batches": 0,
+            "backpressure_drops": 0,
+            "overrun_drops": 0
+        }
+    
+    def start(self, data_callback):
+        """워커 프로세스와 결과 수집 스레드 시작"""
+        if self.running:
+            return
+        self.data_callback = data_callback
+        self.result_queue = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        
+        for worker_index in range(self.worker_count):
+            ring = SharedScanRing(slot_count=self.slots_per_worker, max_points=self.max_points)
+            input_queue = multiprocessing.Queue()
+            slot_credits = multiprocessing.Semaphore(self.slots_per_worker)
+            worker = multiprocessing.Process(
+                target=parser_worker_main,
+                args=(worker_index, ring.name, input_queue, self.result_queue, slot_credits, self.stop_event,
+                      self.scan_filter),
+                daemon=True
+            )
+            worker.start()
+            self.rings.append(ring)
+            self.input_queues.append(input_queue)
+            self.slot_credits.append(slot_credits)
+            self.workers.append(worker)
+        self.in_flight = [0] * self.worker_count
+        
+        self.running = True
+        self.collector_thread = threading.Thread(target=self.collect_results, daemon=True)
+        self.collector_thread.start()
+        print(f"⚙️  파서 워커 {self.worker_count}개 시작")
+    
+    def worker_for(self, data, addr):
+        """센서(source_ip, product_line, lidar_id)로 담당 워커 선택
+        
+        처음 본 센서부터 차례로 워커에 배정하므로 센서 수가 워커 수 이상이면 워커마다 고르게 나뉩니다.
+        """
+        sensor = (addr[0], data[1] if len(data) > 1 else 0, data[2] if len(data) > 2 else 0)
+        worker_index = self.sensor_workers.get(sensor)
+        if worker_index is None:
+            with self.lock:
+                worker_index = self.sensor_workers.setdefault(sensor, len(self.sensor_workers) % self.worker_count)
+        return worker_index
+    
+    def submit_batch(self, batch, endpoint=None):
+        """원시 데이터그램 배치를 워커별로 나눠 전달 (endpoint: 배치를 받은 수신 엔드포인트)"""
+        if not self.running:
+            return
+        received_at = time.time()
+        shards = defaultdict(list)
+        for data, addr in batch:
+            shards[self.worker_for(data, addr)].append((data, addr))
+        for worker_index, shard in shards.items():
+            with self.lock:
+                if self.in_flight[worker_index] + len(shard) > self.max_in_flight:
+                    # 워커/수집이 밀림: 큐에 쌓지 않고 버림
+                    self.stats["backpressure_drops"] += len(shard)
+                    continue
+                self.in_flight[worker_index] += len(shard)
+            self.input_queues[worker_index].put((shard, received_at, endpoint))
+        self.stats["submitted"] += len(batch)
+    
+    def pending(self):
+        """워커에 보냈지만 결과를 받지 않은 데이터그램 수"""
+        with self.lock:
+            return sum(self.in_flight)
+    
+    def collect_results(self):
+        """워커 결과를 읽어 parse_kanavi_packet과 같은 형태로 콜백 호출"""
+        while self.running:
+            try:
+                item = self.result_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if item is None:
+                break
+            
+            worker_index, consumed, results, (parser_stats, filter_stats) = item
+            self.worker_parser_stats[worker_index] = parser_stats
+            if filter_stats is not None:
+                self.worker_filter_stats[worker_index] = filter_stats
+            self.stats["result_batches"] += 1
+            with self.lock:
+                self.in_flight[worker_index] -= consumed
+            ring = self.rings[worker_index]
+            slot_credits = self.slot_credits[worker_index]
+            for slot, write_seq, endpoint, filter_seconds in results:
+                slot_data = ring.read_slot(slot, write_seq)
+                slot_credits.release()  # 복사본을 읽었으므로 콜백 전에 슬롯 반환
+                if slot_data is None:
+                    # 흐름 제어로 일어나지 않아야 함 (발생하면 버그)
+                    self.stats["overrun_drops"] += 1
+                    continue
+                header, distances, detections, filtered = slot_data
+                parsed_data = self.build_parsed_data(header, distances, detections)
+                parsed_data['endpoint'] = endpoint
+                if filtered is not None:
+                    parsed_data['filtered'] = filtered
+                    parsed_data['filter_seconds'] = filter_seconds
+                self.stats["decoded"] += 1
+                if self.data_callback:
+                    try:
+                        self.data_callback(parsed_data, header['source_addr'])
+                    except Exception as e:
+                        print(f"파서 풀 콜백 오류: {e}")
+    
+    def build_parsed_data(self, header, distances, detections):
+        """공유 메모리 슬롯 내용을 parse_kanavi_packet 결과 형태로 변환"""
+        product_line = header['product_line']
+        return {
+            'distances': distances,
+            'detections': detections,
+            'product_line': product_line,
+            'lidar_id': header['lidar_id'],
+            'channel': header['channel'],
+            'model_info': self.parser.get_model_info(product_line),
+            'num_points': header['num_points'],
+            'raw_command': 0xDDC0 | header['channel'],
+            'packet_size': header['packet_size'],
+            'data_length': header['data_length'],
+            'received_at': header['timestamp']
+        }
+    
+    def parser_stats(self):
+        """워커 파서 통계 합계"""
+        totals = defaultdict(int)
+        for stats in list(self.worker_parser_stats.values()):
+            for name, value in stats.items():
+                totals[name] += value
+        return dict(totals)
+    
+    def filter_stats(self):
+        """워커 스캔 필터 통계 합계"""
+        totals = {"frames": 0, "points_in": 0, "points_out": 0}
+        for stats in list(self.worker_filter_stats.values()):
+            for name, value in stats.items():
+                totals[name] += value
+        return totals
+    
+    def stop(self):
+        """워커 종료 및 공유 메모리 정리"""
+        if not self.running:
+            return
+        self.running = False
+        self.stop_event.set()  # 빈 슬롯을 기다리는 워커 깨우기
+        for input_queue in self.input_queues:
+            input_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
+        if self.collector_thread:
+            self.collector_thread.join(timeout=2.0)
+        for ring in self.rings:
+            ring.close()
+        self.rings = []
+        self.input_queues = []
+        self.slot_credits = []
+        self.workers = []
+        self.in_flight = []
+        self.collector_thread = None
+        print("⚙️  파서 워커 종료")
+
+def sensor_id(source_ip, product_line, lidar_id):
+    """센서 식별 문자열 (예: "192.168.0.10/0x06/0x01")"""
+    return f"{source_ip}/0x{product_line:02X}/0x{lidar_id:02X}"
+
+def stream_key(data):
+    """송신 버퍼/전송률 제한/최신 프레임 캐시의 스트림 키 (type, source_ip, product_line, lidar_id, channel)
+
+    모델이 다른 센서가 같은 lidar_id를 써도 섞이지 않도록 product_line을 포함합니다.
+    stream_key[1:]은 메트릭 레이블 (source_ip, product_line, lidar_id, channel)입니다.
+    """
+    return (data["type"], data["source_ip"], data["product_line"], data["lidar_id"], data.get("channel"))
+
+class KanaviSensorRegistry:
+    """(source_ip, product_line, lidar_id)별 센서 목록과 상태
+
+    처음 패킷이 들어온 센서를 자동 등록하고 모델 정보, 수신 엔드포인트, 채널별 시퀀스 번호,
+    패킷/바이트 수, 마지막 수신 시각을 관리합니다.
+    수신 콜백은 파서 풀 수집 스레드에서도 호출되므로 잠금으로 보호합니다.
+    """
+
+    def __init__(self, parser, stale_timeout=5.0):
+        self.parser = parser
+        self.stale_timeout = stale_timeout  # 이 시간(초) 동안 패킷이 없으면 offline
+        self.sensors = {}  # (source_ip, product_line, lidar_id) → 센서 상태
+        self.lock = threading.Lock()
+
+    def update(self, parsed_data, source_ip, endpoint, timestamp):
+        """패킷 1개 반영 후 (센서 상태, 이 채널의 새 시퀀스 번호) 반환"""
+        product_line = parsed_data['product_line']
+        lidar_id = parsed_data['lidar_id']
+        channel = parsed_data['channel']
+        key = (source_ip, product_line, lidar_id)
+        with self.lock:
+            sensor = self.sensors.get(key)
+            if sensor is None:
+                model_info = parsed_data['model_info']
+                sensor = self.sensors[key] = {
+                    "sensor_id": sensor_id(source_ip, product_line, lidar_id),
+                    "source_ip": source_ip,
+                    "product_line": product_line,
+                    "lidar_id": lidar_id,
+                    "model": model_info['name'],
+                    "channels": model_info['channels'],
+                    "hfov": model_info['hfov'],
+                    "vfov": [self.parser.get_vfov(model_info['name'], index)
+                             for index in range(model_info['channels'])],
+                    "endpoints": set(),
+                    "first_seen": timestamp,
+                    "last_seen": timestamp,
+                    "packets": 0,
+                    "bytes": 0,
+                    "sequences": defaultdict(int)  # 채널 → 프레임 번호
+                }
+                log(LOG_INFO, f"🛰️  새 센서: {sensor['sensor_id']} ({sensor['model']}, {endpoint})")
+            if endpoint is not None:
+                sensor['endpoints'].add(endpoint)
+            sensor['last_seen'] = max(sensor['last_seen'], timestamp)
+            sensor['packets'] += 1
+            sensor['bytes'] += parsed_data['packet_size']
+            sensor['sequences'][channel] += 1
+            return sensor, sensor['sequences'][channel]
+
+    def get_sensors(self, now=None):
+        """get_sensors 응답용 센서 목록"""
+        now = time.time() if now is None else now
+        with self.lock:
+            sensors = sorted(self.sensors.values(), key=lambda sensor: sensor['sensor_id'])
+            result = []
+            for sensor in sensors:
+                elapsed = sensor['last_seen'] - sensor['first_seen']
+                result.append({
+                    "sensor_id": sensor['sensor_id'],
+                    "source_ip": sensor['source_ip'],
+                    "product_line": f"0x{sensor['product_line']:02X}",
+                    "lidar_id": f"0x{sensor['lidar_id']:02X}",
+                    "model": sensor['model'],
+                    "channels": sensor['channels'],
+                    "hfov": sensor['hfov'],
+                    "vfov": sensor['vfov'],
+                    "endpoints": sorted(sensor['endpoints']),
+                    "online": now - sensor['last_seen'] < self.stale_timeout,
+                    "last_seen_s": round(now - sensor['last_seen'], 3),
+                    "packets": sensor['packets'],
+                    "bytes": sensor['bytes'],
+                    # 채널별 패킷 수 / 채널 수 / 경과 시간 = 초당 회전 수 (평균)
+                    "scan_rate_hz": round(sensor['packets'] / sensor['channels'] / elapsed, 2) if elapsed > 0 else None
+                })
+            return result
+
+class KanaviFrameAssembler:
+    """채널별 스캔을 센서 단위의 한 프레임(한 회전)으로 묶는 조립기
+    
+    모델의 채널 수(VL-R4: 4, VL-R2: 2)만큼 모이면 프레임을 완성합니다.
+    이미 받은 채널이 다시 들어오면(다음 회전 시작) 또는 timeout이 지나면
+    모인 채널만으로 불완전 프레임을 내보냅니다 (emit_partial=False면 버림).
+    timeout은 이 서버에 도착한 시각(time.monotonic())으로 재므로, 중계 모드처럼 프레임 timestamp가
+    상위 서버 시각이어도 전송 지연·시계 차이와 관계없이 동작합니다.
+    """
+    
+    def __init__(self, timeout=0.1, emit_partial=True):
+        self.timeout = timeout
+        self.emit_partial = emit_partial
+        self.pending = {}  # 센서 키 → {"channels": {채널: 프레임}, "timestamp": 첫 채널 시각, "started": 도착 시각}
+        self.frame_sequences = defaultdict(int)
+        self.lock = threading.Lock()  # 수신 스레드(파서 풀)와 이벤트 루프에서 함께 사용
+        self.stats = {"complete": 0, "partial": 0, "discarded": 0}
+    
+    def sensor_key(self, channel_frame):
+        return (channel_frame['source_ip'], channel_frame['product_line'], channel_frame['lidar_id'])
+    
+    def add(self, channel_frame, channel_count, now=None):
+        """채널 프레임 추가 후 완성된 프레임 목록 반환 (now: 도착 시각, 기본값 time.monotonic())"""
+        if now is None:
+            now = time.monotonic()
+        key = self.sensor_key(channel_frame)
+        completed = []
+        with self.lock:
+            pending = self.pending.get(key)
+            if pending and channel_frame['channel'] in pending['channels']:
+                # 누락 채널이 있는 상태로 다음 회전이 시작됨
+                completed.extend(self.flush(key, complete=False))
+                pending = None
+            if pending is None:
+                pending = self.pending[key] = {"channels": {}, "timestamp": channel_frame['timestamp'], "started": now}
+            pending['channels'][channel_frame['channel']] = channel_frame
+            if len(pending['channels']) >= channel_count:
+                completed.extend(self.flush(key, complete=True))
+        return completed
+    
+    def expire(self, now):
+        """timeout이 지난 미완성 프레임 내보내기 (now: add()와 같은 time.monotonic() 기준)"""
+        completed = []
+        with self.lock:
+            for key in [key for key, pending in self.pending.items()
+                        if now - pending['started'] >= self.timeout]:
+                completed.extend(self.flush(key, complete=False))
+        return completed
+    
+    def flush(self, key, complete):
+        """센서 키의 대기 채널로 프레임 생성 (lock 보유 상태에서 호출)"""
+        pending = self.pending.pop(key)
+        if not complete and not self.emit_partial:
+            self.stats["discarded"] += 1
+            return []
+        self.stats["complete" if complete else "partial"] += 1
+        
+        channels = [pending['channels'][channel] for channel in sorted(pending['channels'])]
+        first = channels[0]
+        self.frame_sequences[key] += 1
+        return [{
+            "type": "lidar_frame",
+            "model": first['model'],
+            "hfov": first['hfov'],
+            "hresolution": first['hresolution'],
+            "source_ip": first['source_ip'],
+            "lidar_id": first['lidar_id'],
+            "product_line": first['product_line'],
+            "sensor_id": first.get('sensor_id'),
+            "sequence": self.frame_sequences[key],
+            "timestamp": pending['timestamp'],
+            "complete": complete,
+            "channels": channels
+        }]
+
+def azimuth_start(channel_frame):
+    """첫 포인트의 방위각 (구독으로 잘린 프레임이 아니면 HFOV/2)"""
+    return channel_frame.get('azimuth_start', channel_frame['hfov'] / 2)
+
+def azimuth_offset(channel_frame):
+    """HFOV/2 대비 첫 포인트 방위각 차이 (0.01° 단위, 바이너리 헤더용)"""
+    return int(round((channel_frame['hfov'] / 2 - azimuth_start(channel_frame)) * 100)) & 0xFFFF
+
+class KanaviPointProjector:
+    """거리 배열 → XYZ 포인트 변환 (float32)
+    
+    (시작 방위각, hresolution, vfov, pointsize)별 방향 벡터 테이블을 한 번만 계산해 두고
+    거리 배열과 곱하기만 합니다. 좌표계는 lib/lidar.dart의 to3DPoints와 같습니다.
+    구독 방위각 범위마다 테이블이 생기므로 최근에 쓴 max_tables개만 보관합니다 (LRU).
+    """
+    
+    def __init__(self, parser=None, hresolution=0.25, max_tables=256):
+        self.tables = OrderedDict()  # 키 → 방향 벡터 테이블 (최근 사용 순)
+        self.max_tables = max_tables
+        # 알려진 모델/채널 테이블 미리 생성
+        parser = parser or KanaviLidarParser()
+        for product_line, model_info in parser.lidar_models.items():
+            for channel in range(model_info['channels']):
+                self.get_table(model_info['hfov'] / 2, hresolution,
+                               parser.get_vfov(model_info['name'], channel),
+                               parser.expected_points(product_line))
+    
+    def get_table(self, azimuth_start, hresolution, vfov, pointsize):
+        """포인트별 단위 방향 벡터 (pointsize × 3, float32)"""
+        key = (float(azimuth_start), float(hresolution), float(vfov), pointsize)
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+        else:
+            # 방위각: 시작 방위각(전체 스캔은 HFOV/2)부터 hresolution씩 감소 (반시계)
+            azimuth = np.radians(azimuth_start - np.arange(pointsize) * hresolution)
+            vertical = np.radians(vfov)
+            table = np.empty((pointsize, 3), dtype=np.float32)
+            table[:, 0] = np.cos(vertical) * np.sin(azimuth)
+            table[:, 1] = np.cos(vertical) * np.cos(azimuth)
+            table[:, 2] = -np.sin(vertical)  # 왼손좌표계 -> 오른손좌표계
+            self.tables[key] = table
+            if len(self.tables) > self.max_tables:
+                self.tables.popitem(last=False)
+        return table
+    
+    def project(self, channel_frame):
+        """채널 프레임의 거리 배열을 XYZ 배열(pointsize × 3)로 변환"""
+        distances = channel_frame['distances']
+        table = self.get_table(azimuth_start(channel_frame), channel_frame['hresolution'],
+                               channel_frame['vfov'], len(distances))
+        return distances[:, None] * table
+
+class KanaviDeltaCodec:
+    """채널별 키프레임/델타 압축 상태
+    
+    keyframe_interval 프레임마다 전체 거리(cm)와 Detection을 키프레임으로 보내고, 그 사이에는
+    마지막 키프레임 대비 거리가 threshold_cm보다 크게 바뀌었거나 Detection이 바뀐 포인트의
+    인덱스, 거리 변화량(cm), Detection 값만 보냅니다.
+    델타는 항상 직전 프레임이 아닌 키프레임 기준이므로 중간 프레임이 버려져도 복원할 수 있습니다.
+    송신 버퍼는 키프레임을 델타보다 먼저 버리지 않으며 (KanaviClientSession.enqueue의 pinned),
+    그래도 키프레임을 놓친 클라이언트는 resync로 현재 키프레임을 다시 받으면 됩니다.
+    """
+    
+    def __init__(self, keyframe_interval=20, threshold_cm=0):
+        self.keyframe_interval = keyframe_interval
+        self.threshold_cm = threshold_cm
+        self.streams = {}  # (source_ip, product_line, lidar_id, channel, view_key) → 상태
+        self.stats = {"keyframes": 0, "deltas": 0, "released_streams": 0}
+    
+    def stream_key(self, frame):
+        # 구독 설정(view_key)이 다른 프레임은 포인트 구성이 달라 별도 상태로 관리
+        return (frame['source_ip'], frame['product_line'], frame['lidar_id'], frame['channel'], frame.get('view_key'))
+    
+    def update(self, frame):
+        """프레임을 키프레임 또는 델타로 변환 (같은 프레임은 한 번만 계산)"""
+        key = self.stream_key(frame)
+        state = self.streams.get(key)
+        if state and state['last_sequence'] == frame['sequence']:
+            return state['last_result']
+        
+        centimeters = np.rint(frame['distances'] * 100.0).astype(np.int32)
+        detections = frame['detection_data']
+        result = None
+        if (state is not None and state['frames_since_keyframe'] + 1 < self.keyframe_interval
+                and len(centimeters) == len(state['keyframe_cm'])):
+            diff = centimeters - state['keyframe_cm']
+            changed = np.flatnonzero((np.abs(diff) > self.threshold_cm) | (detections != state['keyframe_detections']))
+            # 바뀐 포인트가 많아 델타(5바이트/포인트)가 키프레임(3바이트/포인트)보다 커지면 키프레임으로 전환
+            if len(changed) * 5 < len(centimeters) * 3:
+                state['frames_since_keyframe'] += 1
+                result = {
+                    "kind": "delta",
+                    "keyframe_sequence": state['keyframe_sequence'],
+                    "indices": changed.astype(np.uint16),
+                    "deltas_cm": np.clip(diff[changed], -32768, 32767).astype(np.int16),
+                    "detections": detections[changed]
+                }
+                self.stats["deltas"] += 1
+        
+        if result is None:
+            state = self.streams[key] = {
+                "keyframe": frame,
+                "keyframe_cm": centimeters,
+                "keyframe_detections": detections,
+                "keyframe_sequence": frame['sequence'],
+                "frames_since_keyframe": 0
+            }
+            result = self.keyframe_result(state)
+            self.stats["keyframes"] += 1
+        
+        state['last_sequence'] = frame['sequence']
+        state['last_result'] = result
+        return result
+    
+    def keyframe_result(self, state):
+        return {
+            "kind": "key",
+            "keyframe_sequence": state['keyframe_sequence'],
+            "distances_cm": np.clip(state['keyframe_cm'], 0, 0xFFFF).astype(np.uint16)
+        }
+    
+    def retain_views(self, view_keys):
+        """view_keys에 없는 구독 설정의 상태 해제 (그 구독을 쓰는 클라이언트가 없음)"""
+        for key in [key for key in self.streams if key[-1] not in view_keys]:
+            del self.streams[key]
+            self.stats["released_streams"] += 1
+    
+    def current_keyframes(self, view_key=None):
+        """resync용 (키프레임 원본, 키프레임 결과) 목록 (view_key 구독 설정의 스트림만)"""
+        return [(state['keyframe'], self.keyframe_result(state))
+                for key, state in self.streams.items() if key[-1] == view_key]
+
+class KanaviScanFilter:
+    """장애물 검출용 스캔 필터 (거리/높이 범위 → 시간축 중앙값 → 고립 포인트 제거)
+
+    채널마다 최근 temporal_window개 스캔을 링 버퍼에 보관하고 포인트별 중앙값을 사용하므로
+    한두 스캔에만 나타나는 노이즈와 깜빡이는 포인트가 사라집니다. 스캔 수가 짝수면 낮은 쪽 중앙값을 쓰므로
+    결과는 항상 실제로 측정된 값이고, 절반 이상이 무효(0)면 무효입니다 (무효와 거리의 평균을 만들지 않음).
+    고립 포인트 제거는 좌우 neighbor_radius개 포인트 중 거리 차이가 허용값 이내인 이웃이
+    min_neighbors개 미만인 포인트를 지웁니다.
+    결과는 원래 길이의 거리 배열이며 제거된 포인트는 0입니다 (인덱스-방위각 관계 유지).
+    """
+
+    def __init__(self, min_range=0.1, max_range=None, min_height=None, temporal_window=3,
+                 min_neighbors=1, neighbor_radius=2, neighbor_tolerance=0.3, relative_tolerance=0.05):
+        self.min_range = min_range
+        self.max_range = max_range
+        self.min_height = min_height  # 센서 기준 높이(m)가 이보다 낮은 포인트 제거 (지면), None이면 사용 안 함
+        self.temporal_window = max(1, temporal_window)
+        self.min_neighbors = min_neighbors
+        self.neighbor_radius = neighbor_radius
+        self.neighbor_tolerance = neighbor_tolerance  # 이웃 거리 차이 허용값 (m)
+        self.relative_tolerance = relative_tolerance  # 거리에 비례한 추가 허용값
+        self.history = {}  # (source_ip, product_line, lidar_id, channel) → 최근 스캔 링 버퍼
+        self.stats = {"frames": 0, "points_in": 0, "points_out": 0}
+
+    def stream_key(self, channel_frame):
+        return (channel_frame['source_ip'], channel_frame['product_line'],
+                channel_frame['lidar_id'], channel_frame['channel'])
+
+    def apply(self, channel_frame):
+        """채널 프레임 필터링 → 남은 포인트만 값이 있는 float32 거리 배열"""
+        distances = channel_frame['distances']
+        gated = self.gate(distances, channel_frame['vfov'])
+        filtered = self.temporal_median(self.stream_key(channel_frame), gated)
+        if self.min_neighbors > 0:
+            filtered = self.remove_isolated(filtered)
+
+        self.stats["frames"] += 1
+        self.stats["points_in"] += int(np.count_nonzero(distances))
+        self.stats["points_out"] += int(np.count_nonzero(filtered))
+        return filtered
+
+    def gate(self, distances, vfov):
+        """거리/높이 범위 밖의 포인트를 0으로"""
+        valid = distances >= max(self.min_range, 1e-6)
+        if self.max_range is not None:
+            valid &= distances <= self.max_range
+        if self.min_height is not None:
+            # 높이 = -거리 × sin(수직각) (KanaviPointProjector와 같은 좌표계)
+            valid &= distances * -np.sin(np.radians(vfov)) >= self.min_height
+        return np.where(valid, distances, np.float32(0.0))
+
+    def temporal_median(self, key, gated):
+        """같은 채널의 최근 temporal_window개 스캔의 포인트별 낮은 쪽 중앙값"""
+        if self.temporal_window == 1:
+            return gated
+        state = self.history.get(key)
+        if state is None or state['scans'].shape[1] != len(gated):
+            state = self.history[key] = {
+                "scans": np.zeros((self.temporal_window, len(gated)), dtype=np.float32),
+                "next": 0,
+                "count": 0
+            }
+        state['scans'][state['next']] = gated
+        state['next'] = (state['next'] + 1) % self.temporal_window
+        state['count'] = min(state['count'] + 1, self.temporal_window)
+        # 아직 창이 다 차지 않았으면 쌓인 스캔만 사용
+        count = state['count']
+        return np.partition(state['scans'][:count], (count - 1) // 2, axis=0)[(count - 1) // 2]
+
+    def remove_isolated(self, distances):
+        """비슷한 거리의 이웃이 min_neighbors개 미만인 포인트 제거"""
+        radius = self.neighbor_radius
+        padded = np.pad(distances, radius)
+        tolerance = self.neighbor_tolerance + distances * self.relative_tolerance
+        neighbors = np.zeros(len(distances), dtype=np.int8)
+        for offset in range(-radius, radius + 1):
+            if offset == 0:
+                continue
+            neighbor = padded[radius + offset:radius + offset + len(distances)]
+            neighbors += (neighbor > 0) & (np.abs(neighbor - distances) <= tolerance)
+        return np.where((distances > 0) & (neighbors >= self.min_neighbors), distances, np.float32(0.0))
+
+    def reset(self):
+        """시간축 필터 상태 초기화"""
+        self.history.clear()
+
+def sparse_points(channel_frame):
+    """채널 프레임의 남은 포인트 (인덱스 uint16, 거리 float32, Detection uint8)
+
+    필터 결과('filtered')가 없으면 거리 0이 아닌 포인트를 사용합니다.
+    """
+    distances = channel_frame.get('filtered')
+    if distances is None:
+        distances = channel_frame['distances']
+    indices = np.flatnonzero(distances)
+    return indices.astype(np.uint16), distances[indices], channel_frame['detection_data'][indices]
+
+class KanaviOccupancyGrid:
+    """센서별 2D 점유 격자 (센서 중심, size × size m, resolution m 격자)
+
+    채널 스캔마다 포인트 방향의 광선이 지나는 격자 칸을 비어 있음(-MISS), 포인트가 닿은 칸을
+    점유(+HIT)로 로그 오즈(int16, ±LIMIT)를 누적합니다. 광선 칸 인덱스는
+    (시작 방위각, hresolution, vfov, pointsize)별로 한 번만 계산해 두므로 스캔마다
+    마스크와 인덱스 대입만 계산합니다. 거리 0(무효) 포인트의 광선은 건너뜁니다.
+    높이(min_height~max_height) 밖에 닿은 포인트(지면, 천장)는 점유로 세지 않습니다.
+
+    publish()는 publish_rate_hz마다 바뀐 센서 격자를 uint8(128: 미확인, 클수록 점유)로 변환해
+    keyframe_interval번마다 키프레임, 그 사이에는 마지막 키프레임과의 XOR을 zlib 압축해 내보냅니다.
+    압축한 델타가 압축한 격자보다 작지 않으면(바뀐 칸이 많으면) 델타 대신 새 키프레임을 보냅니다.
+    델타가 키프레임 기준이므로 중간 갱신이 버려져도 복원할 수 있습니다.
+    """
+
+    HIT = 12  # 점유 로그 오즈 증가량
+    MISS = 3  # 비어 있음 로그 오즈 감소량
+    LIMIT = 127  # 로그 오즈 범위 (uint8 변환: 값 + 128)
+    UNKNOWN = 128
+
+    def __init__(self, resolution=0.1, size=40.0, min_height=None, max_height=None,
+                 publish_rate_hz=2.0, keyframe_interval=10, parser=None):
+        self.resolution = resolution
+        self.cells = int(np.ceil(size / resolution))  # 한 변의 칸 수
+        self.origin = -self.cells * resolution / 2  # 격자 (0, 0) 칸의 모서리 좌표 (m, 센서 기준)
+        self.max_range = self.cells * resolution / 2 * np.sqrt(2)  # 격자 모서리까지 거리
+        self.sample_step = resolution / 2  # 광선 샘플 간격 (대각선으로 지나는 칸도 포함)
+        self.min_height = min_height
+        self.max_height = max_height
+        self.publish_interval = 1.0 / publish_rate_hz
+        self.keyframe_interval = keyframe_interval
+        self.projector = KanaviPointProjector(parser)  # 포인트 방향 벡터 테이블 공유
+        # (시작 방위각, hresolution, vfov, pointsize) → 광선 샘플별 칸 번호 (격자 밖은 마지막 여분 칸 번호)
+        self.ray_tables = {}
+        self.grids = {}  # sensor_id → 센서 격자 상태
+        self.lock = threading.Lock()  # 수신 스레드(파서 풀)와 이벤트 루프에서 함께 사용
+        self.stats = {"scans": 0, "publishes": 0, "keyframes": 0, "deltas": 0, "bytes": 0}
+
+    def ray_table(self, key):
+        """포인트별 광선 샘플(sample_step 간격)이 지나는 칸 번호 (pointsize × 샘플 수, int32)"""
+        table = self.ray_tables.get(key)
+        if table is None:
+            directions = self.projector.get_table(*key)
+            ranges = (np.arange(int(np.ceil(self.max_range / self.sample_step))) + 0.5) * self.sample_step
+            columns = np.floor((directions[:, 0, None] * ranges - self.origin) / self.resolution).astype(np.int32)
+            rows = np.floor((directions[:, 1, None] * ranges - self.origin) / self.resolution).astype(np.int32)
+            inside = (columns >= 0) & (columns < self.cells) & (rows >= 0) & (rows < self.cells)
+            table = self.ray_tables[key] = np.where(inside, rows * self.cells + columns, self.cells * self.cells)
+        return table
+
+    def update(self, channel_frame):
+        """채널 스캔 1개로 센서 격자 갱신 (필터 결과 'filtered'가 있으면 사용)"""
+        distances = channel_frame.get('filtered')
+        if distances is None:
+            distances = channel_frame['distances']
+        table_key = (float(azimuth_start(channel_frame)), float(channel_frame['hresolution']),
+                     float(channel_frame['vfov']), len(distances))
+        table = self.ray_table(table_key)
+        valid = distances > 0
+        steps = np.minimum((distances / self.sample_step).astype(np.int32), table.shape[1])
+
+        # 포인트에 닿기 전까지의 샘플은 비어 있음 (무효 포인트는 steps 0)
+        passed = np.arange(table.shape[1]) < steps[:, None]
+        free = np.zeros(self.cells * self.cells + 1, dtype=bool)  # 마지막 칸: 격자 밖 샘플
+        free[table[passed]] = True
+
+        # 격자 안, 높이 범위 안에서 닿은 포인트는 점유
+        hit = valid & (steps < table.shape[1])
+        if self.min_height is not None or self.max_height is not None:
+            heights = distances * self.projector.get_table(*table_key)[:, 2]
+            if self.min_height is not None:
+                hit &= heights >= self.min_height
+            if self.max_height is not None:
+                hit &= heights <= self.max_height
+        occupied = np.zeros_like(free)
+        occupied[table[np.flatnonzero(hit), steps[hit]]] = True
+        free = free[:-1] & ~occupied[:-1]
+        occupied = occupied[:-1]
+
+        key = channel_frame.get('sensor_id') or sensor_id(channel_frame['source_ip'], channel_frame['product_line'],
+                                                         channel_frame['lidar_id'])
+        with self.lock:
+            state = self.grids.get(key)
+            if state is None:
+                state = self.grids[key] = {
+                    "sensor_id": key,
+                    "source_ip": channel_frame['source_ip'],
+                    "product_line": channel_frame['product_line'],
+                    "lidar_id": channel_frame['lidar_id'],
+                    "log_odds": np.zeros(self.cells * self.cells, dtype=np.int16),
+                    "keyframe": None,
+                    "keyframe_sequence": 0,
+                    "keyframe_update": None,
+                    "sequence": 0,
+                    "dirty": False,
+                    "last_publish": 0.0
+                }
+            log_odds = state['log_odds']
+            log_odds[free] -= self.MISS
+            log_odds[occupied] += self.HIT
+            np.clip(log_odds, -self.LIMIT, self.LIMIT, out=log_odds)
+            state['timestamp'] = channel_frame['timestamp']
+            state['dirty'] = True
+            self.stats["scans"] += 1
+
+    def publish(self, now):
+        """publish_interval이 지난 갱신된 센서 격자의 키프레임/델타 목록"""
+        updates = []
+        with self.lock:
+            for state in self.grids.values():
+                if not state['dirty'] or now - state['last_publish'] < self.publish_interval:
+                    continue
+                state['dirty'] = False
+                state['last_publish'] = now
+                state['sequence'] += 1
+                updates.append(self.encode_state(state))
+        return updates
+
+    def encode_state(self, state):
+        """센서 격자 → 키프레임 또는 마지막 키프레임 대비 XOR 델타 (lock 보유 상태에서 호출)"""
+        cells = (state['log_odds'] + self.UNKNOWN).astype(np.uint8)
+        keyframe = state['keyframe'] is None or state['sequence'] - state['keyframe_sequence'] >= self.keyframe_interval
+        # 직렬화 방식과 관계없이 한 번만 압축
+        body = zlib.compress(cells.tobytes(), 1)
+        if not keyframe:
+            delta_body = zlib.compress(np.bitwise_xor(cells, state['keyframe']).tobytes(), 1)
+            # 델타가 줄여 주는 것이 없으면 키프레임으로 전환 (이후 델타의 기준도 새 키프레임)
+            if len(delta_body) < len(body):
+                body = delta_body
+            else:
+                keyframe = True
+        if keyframe:
+            state['keyframe'] = cells
+            state['keyframe_sequence'] = state['sequence']
+        update = {
+            "type": "occupancy_grid",
+            "kind": "key" if keyframe else "delta",
+            "sensor_id": state['sensor_id'],
+            "source_ip": state['source_ip'],
+            "product_line": state['product_line'],
+            "lidar_id": state['lidar_id'],
+            "sequence": state['sequence'],
+            "keyframe_sequence": state['keyframe_sequence'],
+            "timestamp": state['timestamp'],
+            "width": self.cells,
+            "height": self.cells,
+            "resolution": self.resolution,
+            "origin": self.origin,
+            "body": body
+        }
+        if keyframe:
+            state['keyframe_update'] = update
+        self.stats["publishes"] += 1
+        self.stats["keyframes" if keyframe else "deltas"] += 1
+        self.stats["bytes"] += len(update['body'])
+        return update
+
+    def current_keyframes(self):
+        """resync용 센서별 마지막 키프레임 목록"""
+        with self.lock:
+            return [state['keyframe_update'] for state in self.grids.values() if state['keyframe_update']]
+
+    def reset(self):
+        """모든 센서 격자 초기화"""
+        with self.lock:
+            self.grids.clear()
+
+class KanaviFrameEncoder:
+    """라이다 프레임 직렬화 (JSON 텍스트 / 바이너리)
+    
+    바이너리 프레임 구조 (Little Endian):
+      헤더 40바이트 = magic 'KL', version, distance_format, product_line, channel,
+                     lidar_id, reserved, hfov(f32), vfov(f32), hresolution(f32),
+                     max(f32), sequence(u32), timestamp(f64), pointsize(u16), azimuth_offset(u16)
+      본문 = distances (float32[m] 또는 uint16[cm]) 또는 XYZ (float32[m] × 3) + detections (uint8)
+    
+    stream="points_xyz"이면 거리 대신 서버에서 변환한 XYZ 좌표를 보냅니다
+    (JSON: type "lidar_xyz"와 "points" [x0, y0, z0, x1, ...], 바이너리: distance_format 2).
+    
+    stream="distances_delta"이면 KanaviDeltaCodec의 키프레임/델타를 보냅니다 (JSON: type "lidar_delta").
+    델타 바이너리 구조: 헤더 44바이트 = magic 'KD', version, kind(0: 키, 1: 델타), compressed,
+      product_line, channel, lidar_id, sequence(u32), keyframe_sequence(u32), timestamp(f64),
+      pointsize(u16), count(u16), hfov(f32), vfov(f32), hresolution(f32), azimuth_offset(u16), reserved(u16)
+      본문 (compressed=1이면 zlib) = 키: distances uint16[cm] × pointsize + detections uint8 × pointsize
+                                      델타: indices uint16 × count + deltas int16[cm] × count
+                                            + detections uint8 × count
+    
+    stream="points_sparse"이면 KanaviScanFilter를 통과한 포인트만 (인덱스, 거리)로 보냅니다
+    (JSON: type "lidar_sparse"). 희소 바이너리 구조: 헤더 44바이트 = magic 'KS', KL 헤더와 같은 필드 +
+      count(u16), reserved(u16)
+      본문 = indices uint16 × count + distances (float32[m] 또는 uint16[cm]) × count + detections uint8 × count
+    
+    stream="occupancy_grid"이면 포인트 대신 KanaviOccupancyGrid의 센서별 점유 격자를 보냅니다
+    (JSON: type "occupancy_grid", 본문은 base64). 격자 바이너리 구조: 헤더 40바이트 = magic 'KG', version,
+      kind(0: 키, 1: 델타), product_line, lidar_id, width(u16), height(u16), resolution(f32),
+      origin_x(f32), origin_y(f32), sequence(u32), keyframe_sequence(u32), timestamp(f64), reserved(u16)
+      본문 (zlib) = 키: 칸 값 uint8 × width × height (행 = y, 128: 미확인, 클수록 점유)
+                    델타: 마지막 키프레임과의 XOR uint8 × width × height
+    
+    get_history 결과는 여러 프레임을 한 메시지로 묶어 보냅니다 (라이브 프레임과 섞이지 않음).
+    JSON: type "history_chunk"의 "frames"에 채널 프레임 메시지 목록.
+    바이너리: 헤더 12바이트 = magic 'KH', version, reserved, request_id(u32), chunk(u16), count(u16)
+      본문 = (length(u32) + 바이너리 프레임) × count
+    
+    stream="relay"는 다른 서버(KanaviRelaySource)가 받아 자기 파이프라인에 다시 넣는 중계용 스트림입니다
+    (바이너리 전용, 구독과 관계없이 전체 스캔). 중계 바이너리 구조: 헤더 28바이트 = magic 'KR', version,
+      distance_format, product_line, channel, lidar_id, reserved, source_ip(IPv4 4바이트), sequence(u32),
+      timestamp(f64, 상위 서버의 데이터그램 수신 시각), pointsize(u16), reserved(u16)
+      본문 = distances (float32[m] 또는 uint16[cm]) + detections (uint8)
+    
+    azimuth_offset: 구독(방위각 범위)으로 잘린 스캔의 첫 포인트 위치 = HFOV/2 - azimuth_offset/100 (도),
+    전체 스캔이면 0. 다운샘플링된 스캔의 hresolution은 포인트 간 실제 간격입니다.
+    """
+    
+    BINARY_MAGIC = b'KL'
+    BINARY_VERSION = 1
+    BINARY_HEADER = struct.Struct('<2sBBBBBxffffIdHH')
+    DISTANCE_FORMATS = {"float32": 0, "uint16": 1}
+    XYZ_FORMAT = 2
+    STREAMS = ("distances", "points_xyz", "distances_delta", "points_sparse", "occupancy_grid", "relay")
+    COMPRESSIONS = ("none", "zlib")
+    DELTA_MAGIC = b'KD'
+    DELTA_HEADER = struct.Struct('<2sBBBBBBIIdHHfffHxx')
+    SPARSE_MAGIC = b'KS'
+    SPARSE_HEADER = struct.Struct('<2sBBBBBxffffIdHHHxx')
+    GRID_MAGIC = b'KG'
+    GRID_HEADER = struct.Struct('<2sBBBBHHfffIIdxx')
+    HISTORY_MAGIC = b'KH'
+    HISTORY_HEADER = struct.Struct('<2sBxIHH')
+    HISTORY_LENGTH = struct.Struct('<I')
+    RELAY_MAGIC = b'KR'
+    RELAY_HEADER = struct.Struct('<2sBBBBBx4sIdHxx')
+    
+    # 전체 프레임(lidar_frame) 바이너리 구조:
+    #   헤더 32바이트 = magic 'KF', version, distance_format, product_line, lidar_id,
+    #                  channel_count, complete, hfov(f32), hresolution(f32), sequence(u32),
+    #                  timestamp(f64), reserved(4)
+    #   채널 블록 × channel_count = channel(u8), vfov(f32), max(f32), pointsize(u16),
+    #                  azimuth_offset(u16) (16바이트) + distances + detections (4바이트 정렬 패딩)
+    FRAME_MAGIC = b'KF'
+    FRAME_HEADER = struct.Struct('<2sBBBBBBffId4x')
+    FRAME_CHANNEL_HEADER = struct.Struct('<BxxxffHH')
+    
+    def __init__(self, projector=None, delta_codec=None):
+        self.projector = projector or KanaviPointProjector()
+        self.delta_codec = delta_codec or KanaviDeltaCodec()
+    
+    def encode(self, frame, encoding="json", distance_format="float32", stream="distances", compression="none"):
+        """클라이언트가 선택한 인코딩/스트림으로 프레임 직렬화"""
+        if stream == "distances_delta" and frame['type'] == "lidar":
+            return self.encode_delta(frame, self.delta_codec.update(frame), encoding, compression)
+        if stream == "points_sparse" and frame['type'] == "lidar":
+            return self.encode_sparse(frame, encoding, distance_format)
+        if stream == "relay" and frame['type'] == "lidar":
+            return self.encode_relay(frame, distance_format)
+        if frame['type'] == "occupancy_grid":
+            return self.encode_grid(frame, encoding)
+        if frame['type'] == "lidar_frame":
+            if encoding == "binary":
+                return self.encode_binary_frame(frame, distance_format, stream)
+            return self.encode_json_frame(frame, stream)
+        if encoding == "binary":
+            return self.encode_binary(frame, distance_format, stream)
+        return self.encode_json(frame, stream)
+    
+    def json_fields(self, frame):
+        """채널 프레임을 JSON 호환 dict로 변환"""
+        distances = frame['distances']
+        message = dict(frame)
+        message.pop('view_key', None)
+        message.pop('filtered', None)
+        message['distances'] = distances.astype(np.float64).round(2).tolist()
+        message['detection_data'] = frame['detection_data'].tolist()
+        message['max'] = round(float(distances.max()), 2)
+        message['lidar_id'] = f"0x{frame['lidar_id']:02X}"
+        message['product_line'] = f"0x{frame['product_line']:02X}"
+        return message
+    
+    def xyz_list(self, channel_frame):
+        """XYZ 좌표를 평탄화한 리스트 (mm 단위까지 반올림)"""
+        return self.projector.project(channel_frame).astype(np.float64).round(3).ravel().tolist()
+    
+    def encode_json(self, frame, stream="distances"):
+        """기존 JSON 메시지 형식으로 직렬화"""
+        message = self.json_fields(frame)
+        if stream == "points_xyz":
+            message['type'] = "lidar_xyz"
+            message['stream'] = stream
+            message['points'] = self.xyz_list(frame)
+            del message['distances']
+        return json.dumps(message)
+    
+    def encode_json_frame(self, frame, stream="distances"):
+        """전체 프레임을 JSON으로 직렬화 (채널별 공통 필드는 프레임 수준에만 포함)"""
+        message = dict(frame)
+        message.pop('view_key', None)
+        message['lidar_id'] = f"0x{frame['lidar_id']:02X}"
+        message['product_line'] = f"0x{frame['product_line']:02X}"
+        message['stream'] = stream
+        channels = []
+        for channel_frame in frame['channels']:
+            channel_message = {
+                "channel": channel_frame['channel'],
+                "vfov": channel_frame['vfov'],
+                "pointsize": channel_frame['pointsize'],
+                "detection_data": channel_frame['detection_data'].tolist(),
+                "max": round(float(channel_frame['distances'].max()), 2)
+            }
+            if stream == "points_xyz":
+                channel_message['points'] = self.xyz_list(channel_frame)
+            else:
+                channel_message['distances'] = channel_frame['distances'].astype(np.float64).round(2).tolist()
+            channels.append(channel_message)
+        message['channels'] = channels
+        return json.dumps(message)
+    
+    def format_code(self, distance_format, stream):
+        """바이너리 헤더의 distance_format 값"""
+        if stream == "points_xyz":
+            return self.XYZ_FORMAT
+        return self.DISTANCE_FORMATS[distance_format]
+    
+    def pack_values(self, channel_frame, distance_format, stream="distances"):
+        """채널 데이터를 Little Endian 바이트로 변환 (float32[m], uint16[cm] 또는 XYZ float32)"""
+        if stream == "points_xyz":
+            return self.projector.project(channel_frame).astype('<f4', copy=False).tobytes()
+        distances = channel_frame['distances']
+        if distance_format == "uint16":
+            # 센티미터 단위 정수 (Distance_D/F 분해능과 동일)
+            return np.rint(distances * 100.0).astype('<u2').tobytes()
+        return distances.astype('<f4', copy=False).tobytes()
+    
+    def encode_binary_frame(self, frame, distance_format="float32", stream="distances"):
+        """전체 프레임을 바이너리로 직렬화"""
+        parts = [self.FRAME_HEADER.pack(
+            self.FRAME_MAGIC,
+            self.BINARY_VERSION,
+            self.format_code(distance_format, stream),
+            frame['product_line'],
+            frame['lidar_id'],
+            len(frame['channels']),
+            1 if frame['complete'] else 0,
+            frame['hfov'],
+            frame['hresolution'],
+            frame['sequence'] & 0xFFFFFFFF,
+            frame['timestamp']
+        )]
+        for channel_frame in frame['channels']:
+            distances = channel_frame['distances']
+            parts.append(self.FRAME_CHANNEL_HEADER.pack(
+                channel_frame['channel'], channel_frame['vfov'], float(distances.max()), len(distances),
+                azimuth_offset(channel_frame)))
+            parts.append(self.pack_values(channel_frame, distance_format, stream))
+            parts.append(channel_frame['detection_data'].tobytes())
+            padding = -len(distances) % 4
+            if padding:
+                parts.append(bytes(padding))
+        return b''.join(parts)
+    
+    def encode_delta(self, frame, delta, encoding="json", compression="none"):
+        """KanaviDeltaCodec 결과(키프레임/델타)를 직렬화"""
+        is_key = delta['kind'] == "key"
+        if encoding != "binary":
+            message = {
+                "type": "lidar_delta",
+                "kind": delta['kind'],
+                "model": frame['model'],
+                "channel": frame['channel'],
+                "hfov": frame['hfov'],
+                "vfov": frame['vfov'],
+                "hresolution": frame['hresolution'],
+                "source_ip": frame['source_ip'],
+                "lidar_id": f"0x{frame['lidar_id']:02X}",
+                "product_line": f"0x{frame['product_line']:02X}",
+                "sequence": frame['sequence'],
+                "keyframe_sequence": delta['keyframe_sequence'],
+                "timestamp": frame['timestamp'],
+                "pointsize": frame['pointsize']
+            }
+            if 'azimuth_start' in frame:
+                message['azimuth_start'] = frame['azimuth_start']
+            if frame.get('sensor_id'):
+                message['sensor_id'] = frame['sensor_id']
+            if is_key:
+                message['distances_cm'] = delta['distances_cm'].tolist()
+                message['detection_data'] = frame['detection_data'].tolist()
+            else:
+                message['indices'] = delta['indices'].tolist()
+                message['deltas_cm'] = delta['deltas_cm'].tolist()
+                message['detection_data'] = delta['detections'].tolist()
+            return json.dumps(message)
+        
+        if is_key:
+            body = delta['distances_cm'].astype('<u2', copy=False).tobytes() + frame['detection_data'].tobytes()
+            count = frame['pointsize']
+        else:
+            body = (delta['indices'].astype('<u2', copy=False).tobytes()
+                    + delta['deltas_cm'].astype('<i2', copy=False).tobytes() + delta['detections'].tobytes())
+            count = len(delta['indices'])
+        compressed = compression == "zlib"
+        if compressed:
+            body = zlib.compress(body, 6)
+        header = self.DELTA_HEADER.pack(
+            self.DELTA_MAGIC,
+            self.BINARY_VERSION,
+            0 if is_key else 1,
+            1 if compressed else 0,
+            frame['product_line'],
+            frame['channel'],
+            frame['lidar_id'],
+            frame['sequence'] & 0xFFFFFFFF,
+            delta['keyframe_sequence'] & 0xFFFFFFFF,
+            frame['timestamp'],
+            frame['pointsize'],
+            count,
+            frame['hfov'],
+            frame['vfov'],
+            frame['hresolution'],
+            azimuth_offset(frame)
+        )
+        return header + body
+    
+    def encode_sparse(self, frame, encoding="json", distance_format="float32"):
+        """필터를 통과한 포인트만 (인덱스, 거리)로 직렬화"""
+        indices, distances, detections = sparse_points(frame)
+        if encoding == "json":
+            message = {
+                "type": "lidar_sparse",
+                "model": frame['model'],
+                "channel": frame['channel'],
+                "hfov": frame['hfov'],
+                "vfov": frame['vfov'],
+                "hresolution": frame['hresolution'],
+                "source_ip": frame['source_ip'],
+                "lidar_id": f"0x{frame['lidar_id']:02X}",
+                "product_line": f"0x{frame['product_line']:02X}",
+                "sequence": frame['sequence'],
+                "timestamp": frame['timestamp'],
+                "pointsize": frame['pointsize'],
+                "count": len(indices),
+                "indices": indices.tolist(),
+                "distances": distances.astype(np.float64).round(2).tolist(),
+                "detection_data": detections.tolist()
+            }
+            if 'azimuth_start' in frame:
+                message['azimuth_start'] = frame['azimuth_start']
+            if frame.get('sensor_id'):
+                message['sensor_id'] = frame['sensor_id']
+            return json.dumps(message)
+        
+        if distance_format == "uint16":
+            values = np.rint(distances * 100.0).astype('<u2').tobytes()
+        else:
+            values = distances.astype('<f4', copy=False).tobytes()
+        header = self.SPARSE_HEADER.pack(
+            self.SPARSE_MAGIC,
+            self.BINARY_VERSION,
+            self.DISTANCE_FORMATS[distance_format],
+            frame['product_line'],
+            frame['channel'],
+            frame['lidar_id'],
+            frame['hfov'],
+            frame['vfov'],
+            frame['hresolution'],
+            float(distances.max()) if len(distances) else 0.0,
+            frame['sequence'] & 0xFFFFFFFF,
+            frame['timestamp'],
+            frame['pointsize'],
+            azimuth_offset(frame),
+            len(indices)
+        )
+        return b''.join((header, indices.astype('<u2', copy=False).tobytes(), values, detections.tobytes()))
+    
+    def encode_grid(self, update, encoding="json"):
+        """점유 격자 키프레임/델타 직렬화 (본문은 KanaviOccupancyGrid에서 압축한 bytes)"""
+        if encoding == "json":
+            return json.dumps({
+                "type": "occupancy_grid",
+                "kind": update['kind'],
+                "sensor_id": update['sensor_id'],
+                "source_ip": update['source_ip'],
+                "lidar_id": f"0x{update['lidar_id']:02X}",
+                "product_line": f"0x{update['product_line']:02X}",
+                "sequence": update['sequence'],
+                "keyframe_sequence": update['keyframe_sequence'],
+                "timestamp": update['timestamp'],
+                "width": update['width'],
+                "height": update['height'],
+                "resolution": update['resolution'],
+                "origin": [update['origin'], update['origin']],
+                "compression": "zlib",
+                "cells": base64.b64encode(update['body']).decode('ascii')
+            })
+        header = self.GRID_HEADER.pack(
+            self.GRID_MAGIC,
+            self.BINARY_VERSION,
+            0 if update['kind'] == "key" else 1,
+            update['product_line'],
+            update['lidar_id'],
+            update['width'],
+            update['height'],
+            update['resolution'],
+            update['origin'],
+            update['origin'],
+            update['sequence'] & 0xFFFFFFFF,
+            update['keyframe_sequence'] & 0xFFFFFFFF,
+            update['timestamp']
+        )
+        return header + update['body']
+    
+    def encode_history_chunk(self, request_id, chunk, payloads, encoding="json"):
+        """직렬화된 기록 프레임 목록을 메시지 하나로 묶기"""
+        if encoding == "json":
+            # 이미 직렬화된 JSON 프레임을 다시 파싱하지 않고 배열로 이어 붙임
+            header = json.dumps({"type": "history_chunk", "request_id": request_id, "chunk": chunk,
+                                 "count": len(payloads)})
+            return header[:-1] + ', "frames": [' + ", ".join(payloads) + "]}"
+        parts = [self.HISTORY_HEADER.pack(self.HISTORY_MAGIC, self.BINARY_VERSION, request_id & 0xFFFFFFFF,
+                                          chunk & 0xFFFF, len(payloads))]
+        for payload in payloads:
+            parts.append(self.HISTORY_LENGTH.pack(len(payload)))
+            parts.append(payload)
+        return b''.join(parts)
+    
+    def encode_binary(self, frame, distance_format="float32", stream="distances"):
+        """고정 헤더 + 패킹된 배열 형태의 바이너리 프레임으로 직렬화"""
+        distances = frame['distances']
+        header = self.BINARY_HEADER.pack(
+            self.BINARY_MAGIC,
+            self.BINARY_VERSION,
+            self.format_code(distance_format, stream),
+            frame['product_line'],
+            frame['channel'],
+            frame['lidar_id'],
+            frame['hfov'],
+            frame['vfov'],
+            frame['hresolution'],
+            float(distances.max()),
+            frame['sequence'] & 0xFFFFFFFF,
+            frame['timestamp'],
+            len(distances),
+            azimuth_offset(frame)
+        )
+        return b''.join((header, self.pack_values(frame, distance_format, stream),
+                         frame['detection_data'].tobytes()))
+    
+    def encode_relay(self, frame, distance_format="uint16"):
+        """중계 스트림 프레임 직렬화 (센서 식별 정보와 상위 서버 시퀀스/수신 시각 포함)"""
+        header = self.RELAY_HEADER.pack(
+            self.RELAY_MAGIC,
+            self.BINARY_VERSION,
+            self.DISTANCE_FORMATS[distance_format],
+            frame['product_line'],
+            frame['channel'],
+            frame['lidar_id'],
+            socket.inet_aton(frame['source_ip']),
+            frame['sequence'] & 0xFFFFFFFF,
+            frame['timestamp'],
+            len(frame['distances'])
+        )
+        return b''.join((header, self.pack_values(frame, distance_format), frame['detection_data'].tobytes()))
+    
+    @classmethod
+    def decode_relay(cls, payload):
+        """중계 스트림 프레임 → dict (distances float32[m], detections uint8), 형식이 다르면 ValueError"""
+        if len(payload) < cls.RELAY_HEADER.size or payload[:2] != cls.RELAY_MAGIC:
+            raise ValueError("중계 프레임이 아님")
+        (_, version, distance_format, product_line, channel, lidar_id, source_ip,
+         sequence, timestamp, pointsize) = cls.RELAY_HEADER.unpack_from(payload)
+        if version != cls.BINARY_VERSION:
+            raise ValueError(f"지원하지 않는 중계 프레임 버전: {version}")
+        if distance_format == cls.DISTANCE_FORMATS["uint16"]:
+            value_size = 2
+        elif distance_format == cls.DISTANCE_FORMATS["float32"]:
+            value_size = 4
+        else:
+            raise ValueError(f"지원하지 않는 거리 형식: {distance_format}")
+        offset = cls.RELAY_HEADER.size
+        if len(payload) != offset + pointsize * (value_size + 1):
+            raise ValueError(f"중계 프레임 길이 불일치: {len(payload)}바이트 (포인트 {pointsize}개)")
+        if value_size == 2:
+            centimeters = np.frombuffer(payload, dtype='<u2', count=pointsize, offset=offset)
+            distances = centimeters.astype(np.float32) / np.float32(100.0)
+        else:
+            distances = np.frombuffer(payload, dtype='<f4', count=pointsize, offset=offset).astype(np.float32)
+        detections = np.frombuffer(payload, dtype=np.uint8, count=pointsize,
+                                   offset=offset + pointsize * value_size).copy()
+        return {
+            "product_line": product_line,
+            "channel": channel,
+            "lidar_id": lidar_id,
+            "source_ip": socket.inet_ntoa(source_ip),
+            "sequence": sequence,
+            "timestamp": timestamp,
+            "distances": distances,
+            "detections": detections
+        }
+
+class KanaviFrameCache:
+    """스트림(센서/채널, 전체 프레임은 센서)별 최신 프레임과 직렬화 결과 캐시
+
+    브로드캐스트가 프레임마다 만드는 직렬화 결과 dict를 그대로 보관하므로 추가 직렬화 비용이 없고,
+    새 클라이언트에 보낼 때 없는 인코딩만 한 번 직렬화해 같은 dict에 넣어 둡니다.
+    스캔이 중지된 뒤에도 마지막 프레임을 유지합니다.
+    """
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.entries = {}  # 스트림 키 → {"frame": 원본 프레임, "encoded": (view_key, 인코딩 설정) → 직렬화 결과}
+        self.stats = {"updates": 0, "snapshots": 0, "frames_sent": 0, "hits": 0, "misses": 0}
+
+    def update(self, stream_key, data):
+        """최신 프레임 교체 → 이 프레임의 직렬화 결과 dict (브로드캐스트에서 채움)"""
+        entry = self.entries[stream_key] = {"frame": data, "encoded": {}}
+        self.stats["updates"] += 1
+        return entry["encoded"]
+
+    def snapshot(self, session):
+        """세션 설정에 맞는 최신 프레임 목록 [(스트림 키, 직렬화 결과, 타임스탬프)]"""
+        frames = []
+        for stream_key, entry in list(self.entries.items()):
+            data = entry["frame"]
+            if not session.accepts(data):
+                continue
+            view_key = session.subscription.view_key
+            view = session.subscription.apply(data)
+            if view is None:
+                continue
+            encoding_key = (view_key,) + session.encoding_key()
+            payload = entry["encoded"].get(encoding_key)
+            if payload is None:
+                payload = entry["encoded"][encoding_key] = self.encoder.encode(view, *encoding_key[1:])
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+            frames.append((stream_key, payload, data["timestamp"]))
+        self.stats["snapshots"] += 1
+        self.stats["frames_sent"] += len(frames)
+        return frames
+
+    def get_stats(self):
+        return dict(self.stats, streams=len(self.entries))
+
+class KanaviScanHistory:
+    """센서/채널별 최근 스캔 링 버퍼 (고정 메모리, 선택적으로 메모리 매핑 파일)
+
+    스트림마다 capacity개 스캔을 구조화 배열 하나(timestamp, sequence, distances, detections)에
+    덮어쓰며 보관하므로 포인트별 Python 객체가 없고, 메모리는
+    스트림 수 × capacity × (12 + pointsize × 5) 바이트로 고정됩니다.
+    directory를 지정하면 배열을 np.memmap 파일로 만들어 프로세스 메모리 대신 페이지 캐시에 둡니다.
+    """
+
+    def __init__(self, capacity=600, directory=None):
+        self.capacity = capacity
+        self.directory = directory
+        self.streams = {}  # (sensor_id, channel) → {"meta": 채널 프레임 정보, "records": 구조화 배열, ...}
+        self.lock = threading.Lock()  # 수신 스레드(파서 풀)와 이벤트 루프에서 함께 사용
+        self.stats = {"scans": 0, "queries": 0, "overwritten": 0}
+
+    def record_dtype(self, pointsize):
+        return np.dtype([("timestamp", "<f8"), ("sequence", "<u4"),
+                         ("distances", "<f4", (pointsize,)), ("detections", "u1", (pointsize,))])
+
+    def allocate(self, key, pointsize):
+        """스트림 링 버퍼 배열 생성 (directory가 있으면 메모리 매핑 파일)"""
+        dtype = self.record_dtype(pointsize)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"{key[0].replace('/', '_')}_ch{key[1]}.knvhist"
+            return np.memmap(os.path.join(self.directory, name), dtype=dtype, mode="w+", shape=(self.capacity,))
+        return np.zeros(self.capacity, dtype=dtype)
+
+    def add(self, channel_frame):
+        """채널 스캔 1개 기록 (가장 오래된 스캔 덮어쓰기)"""
+        distances = channel_frame['distances']
+        key = (channel_frame['sensor_id'], channel_frame['channel'])
+        with self.lock:
+            state = self.streams.get(key)
+            if state is None or state['pointsize'] != len(distances):
+                # 처음 보는 스트림 (포인트 수가 바뀌면 이전 기록은 버림)
+                state = self.streams[key] = {
+                    "meta": {name: channel_frame[name] for name in
+                             ("model", "channel", "hfov", "vfov", "hresolution", "source_ip",
+                              "lidar_id", "product_line", "sensor_id")},
+                    "pointsize": len(distances),
+                    "records": self.allocate(key, len(distances)),
+                    "next": 0,
+                    "count": 0
+                }
+            records = state['records']
+            slot = state['next']
+            records['timestamp'][slot] = channel_frame['timestamp']
+            records['sequence'][slot] = channel_frame['sequence'] & 0xFFFFFFFF
+            records['distances'][slot] = distances
+            records['detections'][slot] = channel_frame['detection_data']
+            state['next'] = (slot + 1) % self.capacity
+            state['count'] = min(state['count'] + 1, self.capacity)
+            self.stats["scans"] += 1
+
+    def query(self, start, end, subscription):
+        """시간 범위 [start, end] 안의 스캔 위치 [(timestamp, 스트림 키, 슬롯)] (시간순)
+
+        구독 설정의 센서/채널만 고릅니다. 실제 배열은 read()로 읽습니다.
+        """
+        found = []
+        with self.lock:
+            for key, state in self.streams.items():
+                if not subscription.allows_sensor(key[0]) or not subscription.allows_channel(key[1]):
+                    continue
+                timestamps = state['records']['timestamp'][:state['count']]
+                for slot in np.flatnonzero((timestamps >= start) & (timestamps <= end)):
+                    found.append((float(timestamps[slot]), key, int(slot)))
+        found.sort(key=lambda item: item[0])
+        self.stats["queries"] += 1
+        return found
+
+    def read(self, key, slot, timestamp):
+        """query() 결과 위치의 채널 프레임 (배열 복사), 그 사이 덮어썼으면 None"""
+        with self.lock:
+            state = self.streams.get(key)
+            if state is None or slot >= state['count'] or state['records']['timestamp'][slot] != timestamp:
+                self.stats["overwritten"] += 1
+                return None
+            record = state['records'][slot]
+            frame = dict(state['meta'])
+            frame.update({
+                "type": "lidar",
+                "pointsize": state['pointsize'],
+                "distances": record['distances'].copy(),
+                "detection_data": record['detections'].copy(),
+                "sequence": int(record['sequence']),
+                "timestamp": float(record['timestamp'])
+            })
+            return frame
+
+    def time_range(self):
+        """기록된 가장 오래된/최신 스캔 시각 (기록이 없으면 (None, None))"""
+        with self.lock:
+            timestamps = [state['records']['timestamp'][:state['count']] for state in self.streams.values()
+                          if state['count']]
+        if not timestamps:
+            return None, None
+        return min(float(values.min()) for values in timestamps), max(float(values.max()) for values in timestamps)
+
+    def get_stats(self):
+        oldest, newest = self.time_range()
+        with self.lock:
+            return dict(self.stats,
+                        streams=len(self.streams),
+                        capacity=self.capacity,
+                        memory_mapped=bool(self.directory),
+                        bytes=sum(state['records'].nbytes for state in self.streams.values()),
+                        oldest=oldest,
+                        newest=newest)
+
+class KanaviSubscription:
+    """클라이언트별 구독 설정 (센서, 채널, 방위각 범위, 다운샘플링, 최대 거리, 전송률 제한)
+    
+    apply()는 직렬화 전에 NumPy 슬라이싱으로 필요한 포인트만 남긴 프레임을 만듭니다.
+    방위각은 lib/lidar.dart와 같이 HFOV/2에서 시작해 포인트마다 hresolution씩 감소합니다.
+    """
+    
+    FIELDS = ("sensors", "channels", "azimuth_min", "azimuth_max", "decimation", "max_range", "rate_hz")
+    
+    def __init__(self, channels=None, azimuth_min=None, azimuth_max=None, decimation=1,
+                 max_range=None, rate_hz=None, sensors=None):
+        self.sensors = None if sensors is None else frozenset(sensors)  # sensor_id 목록
+        self.channels = None if channels is None else frozenset(channels)
+        self.azimuth_min = azimuth_min
+        self.azimuth_max = azimuth_max
+        self.decimation = decimation
+        self.max_range = max_range
+        self.rate_hz = rate_hz
+        # 같은 설정의 클라이언트끼리 잘라낸 프레임/직렬화 결과를 공유하기 위한 키 (센서, 전송률 제외)
+        view = (None if self.channels is None else tuple(sorted(self.channels)),
+                azimuth_min, azimuth_max, decimation, max_range)
+        self.view_key = None if view == (None, None, None, 1, None) else view
+    
+    @classmethod
+    def from_message(cls, options, current=None):
+        """subscribe 메시지로 구독 생성 (지정하지 않은 항목은 current 값 유지, null이면 해제)"""
+        values = current.to_dict() if current else {}
+        values.update({name: options[name] for name in cls.FIELDS if name in options})
+        
+        sensors = values.get("sensors")
+        if sensors is not None:
+            if not isinstance(sensors, list) or not all(isinstance(sensor, str) for sensor in sensors):
+                raise ValueError("sensors는 sensor_id 문자열 목록이어야 합니다")
+        channels = values.get("channels")
+        if channels is not None:
+            if not isinstance(channels, list) or not all(isinstance(channel, int) and 0 <= channel < 16
+                                                         for channel in channels):
+                raise ValueError("channels는 0~15 채널 번호 목록이어야 합니다")
+        azimuth_min = cls.number(values, "azimuth_min")
+        azimuth_max = cls.number(values, "azimuth_max")
+        if azimuth_min is not None and azimuth_max is not None and azimuth_min > azimuth_max:
+            raise ValueError("azimuth_min은 azimuth_max보다 클 수 없습니다")
+        decimation = values.get("decimation")
+        if decimation is None:
+            decimation = 1
+        if not isinstance(decimation, int) or isinstance(decimation, bool) or not 1 <= decimation <= 64:
+            raise ValueError("decimation은 1~64 정수여야 합니다")
+        max_range = cls.number(values, "max_range")
+        rate_hz = cls.number(values, "rate_hz")
+        if (max_range is not None and max_range <= 0) or (rate_hz is not None and rate_hz <= 0):
+            raise ValueError("max_range와 rate_hz는 0보다 커야 합니다")
+        return cls(channels, azimuth_min, azimuth_max, decimation, max_range, rate_hz, sensors)
+    
+    @staticmethod
+    def number(values, name):
+        value = values.get(name)
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{name}은 숫자여야 합니다")
+        return float(value)
+    
+    def to_dict(self):
+        return {
+            "sensors": None if self.sensors is None else sorted(self.sensors),
+            "channels": None if self.channels is None else sorted(self.channels),
+            "azimuth_min": self.azimuth_min,
+            "azimuth_max": self.azimuth_max,
+            "decimation": self.decimation,
+            "max_range": self.max_range,
+            "rate_hz": self.rate_hz
+        }
+    
+    def allows_sensor(self, sensor_id):
+        return self.sensors is None or sensor_id in self.sensors
+    
+    def allows_channel(self, channel):
+        return self.channels is None or channel in self.channels
+    
+    def apply(self, data):
+        """구독에 맞게 잘라낸 프레임 (전송할 포인트가 없으면 None)"""
+        if self.view_key is None:
+            return data
+        if data['type'] == "lidar_frame":
+            channels = [self.apply_channel(channel_frame) for channel_frame in data['channels']
+                        if self.allows_channel(channel_frame['channel'])]
+            channels = [channel_frame for channel_frame in channels if channel_frame is not None]
+            if not channels:
+                return None
+            frame = dict(data)
+            frame.update({
+                "channels": channels,
+                "hresolution": channels[0]['hresolution'],
+                "azimuth_start": channels[0]['azimuth_start'],
+                "view_key": self.view_key
+            })
+            return frame
+        if not self.allows_channel(data['channel']):
+            return None
+        return self.apply_channel(data)
+    
+    def apply_channel(self, channel_frame):
+        """채널 프레임의 방위각 범위/다운샘플링/최대 거리 적용 (배열 슬라이싱)"""
+        distances = channel_frame['distances']
+        hresolution = channel_frame['hresolution']
+        start_azimuth = azimuth_start(channel_frame)
+        
+        # 방위각 범위 → 인덱스 범위 (방위각은 인덱스가 커질수록 감소)
+        start = 0
+        stop = len(distances)
+        if self.azimuth_max is not None:
+            start = max(start, int(np.ceil((start_azimuth - self.azimuth_max) / hresolution - 1e-6)))
+        if self.azimuth_min is not None:
+            stop = min(stop, int(np.floor((start_azimuth - self.azimuth_min) / hresolution + 1e-6)) + 1)
+        if start >= stop:
+            return None
+        
+        index = slice(start, stop, self.decimation)
+        distances = distances[index]
+        if self.max_range is not None:
+            # 최대 거리 밖의 포인트는 무효(0)로 처리 (인덱스-방위각 관계 유지)
+            distances = np.where(distances > self.max_range, np.float32(0.0), distances)
+        
+        frame = dict(channel_frame)
+        filtered = channel_frame.get('filtered')
+        if filtered is not None:
+            filtered = filtered[index]
+            if self.max_range is not None:
+                filtered = np.where(filtered > self.max_range, np.float32(0.0), filtered)
+            frame['filtered'] = filtered
+        frame.update({
+            "distances": distances,
+            "detection_data": channel_frame['detection_data'][index],
+            "pointsize": len(distances),
+            "hresolution": hresolution * self.decimation,
+            "azimuth_start": start_azimuth - start * hresolution,
+            "view_key": self.view_key
+        })
+        if self.max_range is not None:
+            frame['max_range'] = self.max_range
+        return frame
+
+class KanaviRateController:
+    """클라이언트별 전송률 자동 조절 (AIMD)
+
+    update()마다 송신 버퍼 상태(폐기, 대기 프레임, 송신 태스크가 send에서 기다린 시간 비율)와
+    WebSocket ping 왕복 시간(RTT)을 보고, 밀리면 스트림당 전송률을 DECREASE배로 줄이고
+    밀리지 않는데 전송률 제한으로 건너뛴 프레임이 있으면 INCREASE_HZ씩 올립니다.
+    max_rate_hz에 도달하면 제한하지 않습니다 (센서 전체 속도).
+    """
+
+    DECREASE = 0.7
+    INCREASE_HZ = 2.0
+    BUSY_RATIO = 0.5  # 송신 태스크가 send에서 기다린 시간 비율이 이보다 크면 혼잡
+    RTT_SLACK = 0.1  # 최소 RTT보다 이만큼(초) 이상, 그리고 RTT_FACTOR배 이상 길면 혼잡
+    RTT_FACTOR = 3.0
+
+    def __init__(self, min_rate_hz=1.0, max_rate_hz=50.0):
+        self.min_rate_hz = min_rate_hz
+        self.max_rate_hz = max_rate_hz
+        self.rate_hz = max_rate_hz
+        self.rtt = None  # 최근 RTT (초)
+        self.rtt_min = None
+        self.ping_timeout = False
+        self.busy_seconds = 0.0  # 이번 주기에 send에서 기다린 시간
+        self.sent = 0  # 이번 주기에 보낸 프레임 수
+        self.limited = 0  # 이번 주기에 전송률 제한으로 건너뛴 프레임 수
+        self.last_dropped = 0
+        self.backlogged = False  # 직전 주기에 송신 버퍼가 절반 넘게 차 있었는지
+        self.last_update = time.perf_counter()
+        self.stats = {
+            "rate_hz": None,
+            "rtt_ms": None,
+            "rtt_min_ms": None,
+            "busy_ratio": 0.0,
+            "decreases": 0,
+            "increases": 0,
+            "rate_limited": 0,
+            "ping_timeouts": 0
+        }
+
+    def limit(self):
+        """스트림당 최대 전송률 (Hz), 제한이 없으면 None"""
+        return None if self.rate_hz >= self.max_rate_hz else self.rate_hz
+
+    def record_send(self, seconds):
+        """프레임 1개 전송에 걸린 시간 기록"""
+        self.busy_seconds += seconds
+        self.sent += 1
+
+    def record_limited(self):
+        self.limited += 1
+        self.stats["rate_limited"] += 1
+
+    def record_rtt(self, seconds):
+        self.rtt = seconds
+        self.rtt_min = seconds if self.rtt_min is None else min(self.rtt_min, seconds)
+
+    def record_ping_timeout(self, elapsed):
+        """응답 없는 ping (elapsed초째 대기 중)"""
+        self.ping_timeout = True
+        self.rtt = elapsed
+        self.stats["ping_timeouts"] += 1
+
+    def congested(self, queued_frames, capacity, dropped_frames, busy_ratio):
+        """송신 버퍼 또는 RTT가 밀리고 있는지 확인"""
+        # 대기 프레임은 브로드캐스트 직후 잠깐 쌓일 수 있으므로 두 주기 연속일 때만 혼잡으로 판단
+        backlogged = queued_frames * 2 > capacity
+        sustained_backlog = backlogged and self.backlogged
+        self.backlogged = backlogged
+        if dropped_frames > self.last_dropped or sustained_backlog:
+            return True
+        if busy_ratio > self.BUSY_RATIO or self.ping_timeout:
+            return True
+        return (self.rtt is not None and self.rtt_min is not None
+                and self.rtt > max(self.rtt_min * self.RTT_FACTOR, self.rtt_min + self.RTT_SLACK))
+
+    def update(self, queued_frames, capacity, dropped_frames, stream_count):
+        """주기마다 호출해 전송률 조절
+
+        dropped_frames: 세션 누적 폐기 수, stream_count: 받고 있는 스트림 수
+        """
+        now = time.perf_counter()
+        interval = max(now - self.last_update, 1e-3)
+        busy_ratio = self.busy_seconds / interval
+
+        if self.congested(queued_frames, capacity, dropped_frames, busy_ratio):
+            # 제한이 없던 상태면 실제로 보내고 있던 스트림당 전송률에서 줄임
+            sent_rate = self.sent / max(stream_count, 1) / interval
+            self.rate_hz = max(self.min_rate_hz, min(self.rate_hz, sent_rate) * self.DECREASE)
+            self.stats["decreases"] += 1
+        elif self.limited and self.rate_hz < self.max_rate_hz:
+            self.rate_hz = min(self.max_rate_hz, self.rate_hz + self.INCREASE_HZ)
+            self.stats["increases"] += 1
+
+        self.stats.update({
+            "rate_hz": None if self.limit() is None else round(self.rate_hz, 1),
+            "rtt_ms": None if self.rtt is None else round(self.rtt * 1000.0, 3),
+            "rtt_min_ms": None if self.rtt_min is None else round(self.rtt_min * 1000.0, 3),
+            "busy_ratio": round(busy_ratio, 3)
+        })
+        self.busy_seconds = 0.0
+        self.sent = 0
+        self.limited = 0
+        self.ping_timeout = False
+        self.last_dropped = dropped_frames
+        self.last_update = now
+
+class KanaviClientSession:
+    """WebSocket 클라이언트별 전송 설정 및 송신 버퍼
+    
+    스트림(센서/채널)마다 최근 queue_depth개 프레임만 보관하는 링 버퍼를 두고,
+    전용 송신 태스크가 버퍼를 비웁니다. 버퍼가 가득 차면 가장 오래된 프레임을 버립니다
+    (델타 스트림/점유 격자의 키프레임은 델타보다 나중에 버림).
+    adaptive_rate이면 전송률 조절 태스크가 RATE_CONTROL_INTERVAL마다 RTT를 재고
+    스트림당 전송률을 조절합니다 (KanaviRateController).
+    """
+    
+    DROP_POLICIES = ("drop_oldest", "latest_only")
+    RATE_CONTROL_INTERVAL = 0.5  # 초
+    PING_TIMEOUT = 1.0  # 이 시간(초) 안에 pong이 없으면 혼잡으로 판단
+    RATE_BURST = 2.0  # 스트림별 토큰 버킷 최대 토큰 수
+    
+    def __init__(self, websocket, queue_depth=4, drop_policy="drop_oldest", metrics=None, adaptive_rate=True):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"지원하지 않는 드롭 정책: {drop_policy}")
+        self.websocket = websocket
+        self.encoding = "json"  # "json" 또는 "binary"
+        self.distance_format = "float32"  # 바이너리 거리 형식: "float32" 또는 "uint16"
+        self.frame_mode = "channel"  # "channel": 채널별 lidar 메시지, "frame": 전체 프레임 lidar_frame
+        # "distances": 거리 배열, "points_xyz": XYZ 좌표, "distances_delta": 키프레임/델타,
+        # "points_sparse": 스캔 필터를 통과한 포인트만 (인덱스, 거리), "occupancy_grid": 점유 격자만,
+        # "relay": 다른 서버로 중계할 전체 스캔 (KanaviRelaySource)
+        self.stream = "distances"
+        self.compression = "none"  # distances_delta 바이너리 본문 압축: "none" 또는 "zlib"
+        self.subscription = KanaviSubscription()  # 채널/방위각/다운샘플링 구독 (기본값: 전체)
+        self.stream_tokens = {}  # 스트림 키 → (토큰 수, 마지막 프레임 시각) (전송률 제한용)
+        self.rate_controller = KanaviRateController() if adaptive_rate else None
+        
+        # latest_only 정책은 스트림당 최신 프레임 1개만 유지
+        self.queue_depth = 1 if drop_policy == "latest_only" else max(1, queue_depth)
+        self.drop_policy = drop_policy
+        self.send_buffers = {}  # 스트림 키 → deque(maxlen=queue_depth)
+        self.pending = asyncio.Event()
+        self.sender_task = None
+        self.rate_control_task = None
+        self.history_task = None  # 진행 중인 get_history 전송 태스크
+        self.sent_frames = 0
+        self.dropped_frames = 0
+        self.metrics = metrics or PipelineMetrics()
+    
+    def configure(self, options):
+        """start_scan 메시지의 인코딩 옵션 적용"""
+        encoding = options.get("encoding", self.encoding)
+        if encoding not in ("json", "binary"):
+            raise ValueError(f"지원하지 않는 인코딩: {encoding}")
+        distance_format = options.get("distance_format", self.distance_format)
+        if distance_format not in KanaviFrameEncoder.DISTANCE_FORMATS:
+            raise ValueError(f"지원하지 않는 거리 형식: {distance_format}")
+        frame_mode = options.get("frame_mode", self.frame_mode)
+        if frame_mode not in ("channel", "frame"):
+            raise ValueError(f"지원하지 않는 프레임 모드: {frame_mode}")
+        stream = options.get("stream", self.stream)
+        if stream not in KanaviFrameEncoder.STREAMS:
+            raise ValueError(f"지원하지 않는 스트림: {stream}")
+        if stream in ("distances_delta", "points_sparse") and frame_mode != "channel":
+            raise ValueError(f"{stream} 스트림은 frame_mode 'channel'에서만 지원합니다")
+        if stream == "relay" and (encoding != "binary" or frame_mode != "channel"):
+            raise ValueError("relay 스트림은 encoding 'binary', frame_mode 'channel'에서만 지원합니다")
+        compression = options.get("compression", self.compression)
+        if compression not in KanaviFrameEncoder.COMPRESSIONS:
+            raise ValueError(f"지원하지 않는 압축 방식: {compression}")
+        self.encoding = encoding
+        self.distance_format = distance_format
+        self.frame_mode = frame_mode
+        self.stream = stream
+        self.compression = compression
+        if stream == "relay":
+            # 중계 서버는 전체 스캔을 받아 자기 클라이언트의 구독을 직접 적용
+            self.subscription = KanaviSubscription()
+            self.stream_tokens.clear()
+    
+    def encoding_key(self):
+        """직렬화 결과를 공유할 수 있는 클라이언트 설정 묶음"""
+        return (self.encoding, self.distance_format, self.stream, self.compression)
+    
+    def subscribe(self, options):
+        """subscribe 메시지 적용 (연결 유지한 채 변경 가능)"""
+        if self.stream == "relay":
+            raise ValueError("relay 스트림은 구독을 지원하지 않습니다 (전체 스캔)")
+        self.subscription = KanaviSubscription.from_message(options, self.subscription)
+        self.stream_tokens.clear()
+    
+    def accepts(self, data):
+        """이 클라이언트가 받을 메시지 종류와 센서인지 확인"""
+        if not self.subscription.allows_sensor(data.get("sensor_id")):
+            return False
+        if self.stream == "occupancy_grid":
+            return data["type"] == "occupancy_grid"
+        if self.frame_mode == "frame":
+            return data["type"] == "lidar_frame"
+        return data["type"] == "lidar"
+    
+    def rate_limit(self):
+        """스트림당 전송률 제한 (구독 rate_hz와 자동 조절값 중 작은 값, 제한이 없으면 None)"""
+        limits = [self.subscription.rate_hz]
+        if self.rate_controller:
+            limits.append(self.rate_controller.limit())
+        limits = [limit for limit in limits if limit is not None]
+        return min(limits) if limits else None
+    
+    def rate_allows(self, stream_key, timestamp, force=False):
+        """스트림별 토큰 버킷으로 전송률 제한 확인
+        
+        force: 제한과 관계없이 보내야 하는 프레임 (델타 스트림 키프레임)
+        """
+        rate_hz = self.rate_limit()
+        if rate_hz is None:
+            self.stream_tokens.pop(stream_key, None)
+            return True
+        tokens, last_time = self.stream_tokens.get(stream_key, (1.0, timestamp))
+        tokens = min(self.RATE_BURST, tokens + (timestamp - last_time) * rate_hz)
+        if tokens < 1.0 and not force:
+            self.stream_tokens[stream_key] = (tokens, timestamp)
+            if self.rate_controller:
+                self.rate_controller.record_limited()
+            return False
+        self.stream_tokens[stream_key] = (max(tokens - 1.0, 0.0), timestamp)
+        return True
+    
+    def enqueue(self, stream_key, payload, received_at=None, pinned=False):
+        """직렬화된 프레임을 송신 버퍼에 추가 (가득 차면 가장 오래된 프레임 폐기)
+        
+        received_at: 원본 데이터그램 수신 시각 (전체 지연 측정용)
+        pinned: 키프레임 (델타 스트림/점유 격자). 버퍼가 가득 차면 키프레임보다 델타를 먼저 버립니다
+                (델타는 키프레임 기준이라 중간 델타를 버려도 복원 가능, 키프레임끼리는 오래된 것부터).
+        """
+        buffer = self.send_buffers.get(stream_key)
+        if buffer is None:
+            buffer = self.send_buffers[stream_key] = deque(maxlen=self.queue_depth)
+        if len(buffer) == self.queue_depth:
+            self.dropped_frames += 1
+            self.metrics.count("client_drops", stream_key[1:])
+            if buffer[0][3]:
+                index = next((index for index, queued in enumerate(buffer) if not queued[3]), None)
+                if index is not None:
+                    del buffer[index]  # 가장 오래된 델타
+                elif not pinned:
+                    return  # 버퍼가 모두 키프레임이면 새 델타를 버림
+        buffer.append((payload, time.perf_counter(), received_at, pinned))
+        self.pending.set()
+    
+    def queued_frames(self):
+        """송신 대기 중인 프레임 수"""
+        return sum(len(buffer) for buffer in self.send_buffers.values())
+    
+    def start(self):
+        """송신 태스크(및 전송률 조절 태스크) 시작"""
+        if self.sender_task is None:
+            self.sender_task = asyncio.create_task(self.run_sender())
+        if self.rate_controller and self.rate_control_task is None:
+            self.rate_control_task = asyncio.create_task(self.run_rate_control())
+    
+    def close(self):
+        """송신/전송률 조절/기록 전송 태스크 종료 및 버퍼 정리"""
+        for task in (self.sender_task, self.rate_control_task, self.history_task):
+            if task is not None:
+                task.cancel()
+        self.sender_task = None
+        self.rate_control_task = None
+        self.history_task = None
+        self.send_buffers.clear()
+    
+    async def run_sender(self):
+        """송신 버퍼를 스트림별로 번갈아 비우는 루프"""
+        try:
+            while True:
+                await self.pending.wait()
+                self.pending.clear()
+                
+                sent_any = True
+                while sent_any:
+                    sent_any = False
+                    for stream_key, buffer in list(self.send_buffers.items()):
+                        if buffer:
+                            payload, enqueued_at, received_at, _ = buffer.popleft()
+                            send_start = time.perf_counter()
+                            await self.websocket.send(payload)
+                            if self.rate_controller:
+                                self.rate_controller.record_send(time.perf_counter() - send_start)
+                            self.sent_frames += 1
+                            sent_any = True
+                            self.record_sent(stream_key, payload, enqueued_at, received_at)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            print(f"❌ 클라이언트 전송 오류: {e}")
+            # 송신 태스크 없이 세션이 남지 않도록 연결 종료 (handle_client가 세션 제거)
+            try:
+                await self.websocket.close(1011, "send failed")
+            except Exception:
+                pass
+    
+    async def run_rate_control(self):
+        """주기적으로 WebSocket ping을 보내 RTT를 재고 송신 버퍼 상태와 함께 전송률 조절
+        
+        ping은 송신 중인 프레임 뒤에 전송되므로 RTT에 클라이언트 쪽 수신 지연이 포함됩니다.
+        pong을 기다리는 동안에도 조절은 계속합니다.
+        """
+        controller = self.rate_controller
+        pending_ping = None  # (pong 대기 future, 보낸 시각)
+        try:
+            while True:
+                await asyncio.sleep(self.RATE_CONTROL_INTERVAL)
+                if pending_ping is not None:
+                    pong_waiter, sent_at = pending_ping
+                    elapsed = time.perf_counter() - sent_at
+                    if pong_waiter.done():
+                        pending_ping = None
+                    elif elapsed > self.PING_TIMEOUT:
+                        controller.record_ping_timeout(elapsed)
+                
+                controller.update(self.queued_frames(), self.queue_depth * max(len(self.send_buffers), 1),
+                                  self.dropped_frames, len(self.send_buffers))
+                
+                if pending_ping is None:
+                    sent_at = time.perf_counter()
+                    pong_waiter = await self.websocket.ping()
+                    pong_waiter.add_done_callback(
+                        lambda future, sent_at=sent_at: self.on_pong(future, sent_at))
+                    pending_ping = (pong_waiter, sent_at)
+        except websockets.ConnectionClosed:
+            pass
+        except Exception as e:
+            print(f"❌ 클라이언트 전송률 조절 오류: {e}")
+    
+    def on_pong(self, future, sent_at):
+        """WebSocket pong 수신 시 RTT 기록"""
+        if not future.cancelled() and future.exception() is None:
+            self.rate_controller.record_rtt(time.perf_counter() - sent_at)
+    
+    def record_sent(self, stream_key, payload, enqueued_at, received_at):
+        """전송 완료한 프레임의 송신/전체 지연 기록"""
+        labels = stream_key[1:]
+        metrics = self.metrics
+        metrics.observe("send", labels, time.perf_counter() - enqueued_at)
+        if received_at is not None:
+            metrics.observe("end_to_end", labels, time.time() - received_at)
+        metrics.count("sent", labels)
+        metrics.count("sent_bytes", labels, len(payload))
+    
+    def get_stats(self):
+        """클라이언트 송신 통계"""
+        return {
+            "remote_address": str(self.websocket.remote_address),
+            "encoding": self.encoding,
+            "frame_mode": self.frame_mode,
+            "stream": self.stream,
+            "compression": self.compression,
+            "drop_policy": self.drop_policy,
+            "queue_depth": self.queue_depth,
+            "subscription": self.subscription.to_dict(),
+            "rate_control": self.rate_controller.stats if self.rate_controller else None,
+            "queued_frames": self.queued_frames(),
+            "sent_frames": self.sent_frames,
+            "dropped_frames": self.dropped_frames
+        }
 
 class KanaviWebSocketServer:
-    """Kanavi 라이다 WebSocket 서버"""
+    """Kanavi 라이다 WebSocket 서버
     
-    def __init__(self, listen_port=5000, multicast_group="224.0.0.5"):
-        self.lidar_receiver = KanaviLidarReceiver(listen_port, multicast_group)
-        self.connected_clients = set()
+    endpoints에 (멀티캐스트 그룹, 포트)를 여러 개 지정하면 엔드포인트마다 수신기를 두고,
+    들어온 센서는 (source_ip, product_line, lidar_id)별로 센서 목록에 등록합니다.
+    relay_url을 지정하면 멀티캐스트 대신 상위 서버의 relay 스트림을 받아 (KanaviRelaySource)
+    자기 클라이언트에 다시 제공합니다 (구독, 전송률 조절, 최신 프레임 캐시는 서버마다 따로 동작).
+    """
+    
+    def __init__(self, listen_port=5000, multicast_group="224.0.0.5",
+                 data_queue_size=64, client_queue_depth=4, drop_policy="drop_oldest",
+                 receive_batch_size=64, receive_buffer_size=4 * 1024 * 1024, parse_workers=0,
+                 keyframe_interval=20, delta_threshold_cm=0,
+                 record_path=None, replay_path=None, replay_speed=1.0, replay_loop=False,
+                 adaptive_rate=True, endpoints=None, scan_filter=None, occupancy_grid=None, history=None,
+                 relay_url=None, relay_format="uint16", shm_publisher=None):
+        if relay_url:
+            # 센서 대신 상위 서버에서 파싱된 스캔을 받으므로 파싱/기록할 데이터그램이 없음
+            self.lidar_receivers = [KanaviRelaySource(relay_url, relay_format)]
+            parse_workers = 0
+            record_path = None
+        elif replay_path:
+            # 실제 센서 대신 캡처 파일을 같은 파싱 경로로 재생 (재생 소스는 기록하지 않음)
+            if record_path:
+                raise ValueError("캡처 재생 중에는 기록할 수 없습니다 (replay_path와 record_path를 함께 지정)")
+            self.lidar_receivers = [KanaviReplaySource(replay_path, replay_speed, replay_loop, receive_batch_size)]
+        else:
+            endpoints = endpoints or [(multicast_group, listen_port)]
+            self.lidar_receivers = [KanaviLidarReceiver(port, group, receive_batch_size, receive_buffer_size)
+                                    for group, port in endpoints]
+        self.lidar_receiver = self.lidar_receivers[0]  # 대표 수신기 (모델 정보 조회, 상태 응답용)
+        if record_path:
+            # 모든 엔드포인트의 데이터그램을 한 캡처 파일에 기록
+            recorder = KanaviCaptureWriter(record_path)
+            for receiver in self.lidar_receivers:
+                receiver.set_recorder(recorder)
+        # parse_workers > 0이면 센서별 파싱/스캔 필터를 워커 프로세스로 분산
+        self.parser_pool = KanaviParserPool(parse_workers, self.lidar_receiver.parser,
+                                            scan_filter=scan_filter) if parse_workers > 0 else None
+        self.connected_clients = {}  # websocket → KanaviClientSession
         self.receiving = False
-        self.last_send_time = defaultdict(float)
-        self.data_queue = queue.Queue()  # 스레드 간 데이터 전달용 큐
+        self.sensor_registry = KanaviSensorRegistry(self.lidar_receiver.parser)
+        self.scan_filter = scan_filter  # KanaviScanFilter (None이면 points_sparse는 거리 0만 제외)
+        self.occupancy_grid = occupancy_grid  # KanaviOccupancyGrid (None이면 occupancy_grid 스트림 사용 불가)
+        self.history = history  # KanaviScanHistory (None이면 get_history 사용 불가)
+        self.shm_publisher = shm_publisher  # SharedScanPublisher (같은 PC의 다른 프로세스용, None이면 사용 안 함)
+        self.history_requests = 0
+        self.frame_encoder = KanaviFrameEncoder(KanaviPointProjector(self.lidar_receiver.parser),
+                                                KanaviDeltaCodec(keyframe_interval, delta_threshold_cm))
+        self.frame_assembler = KanaviFrameAssembler()
+        self.frame_cache = KanaviFrameCache(self.frame_encoder)  # 새 클라이언트에 바로 보낼 최신 프레임
+        self.metrics = PipelineMetrics()
+        self.broadcast_stats = {
+            "broadcasts": 0,
+            "last_broadcast_enqueue_ms": 0.0,
+            "avg_broadcast_enqueue_ms": 0.0,
+            "max_broadcast_enqueue_ms": 0.0,
+            "last_client_count": 0,
+            "last_encoding_count": 0
+        }
+        self.data_queue = queue.Queue(maxsize=data_queue_size)  # 스레드 간 데이터 전달용 큐 (크기 제한)
+        self.data_queue_drops = 0
+        self.client_queue_depth = client_queue_depth
+        self.drop_policy = drop_policy
+        self.adaptive_rate = adaptive_rate  # 클라이언트별 전송률 자동 조절 (False면 구독 rate_hz만 적용)
         
         # 라이다 데이터 콜백 설정
-        self.lidar_receiver.set_data_callback(self.on_lidar_data_received)
+        for receiver in self.lidar_receivers:
+            receiver.set_data_callback(self.on_lidar_data_received)
     
-    # mock_server_lidar.py 수정
-
     def on_lidar_data_received(self, parsed_data, source_addr):
         """Kanavi 라이다 데이터 수신 콜백"""
         try:
-            points = parsed_data['points']
+            distances = parsed_data['distances']
             channel = parsed_data['channel']
             model_info = parsed_data['model_info']
             
-            if not points:
+            if len(distances) == 0:
                 return
             
-            # 전송 속도 제한 (채널당 최대 20Hz)
-            current_time = time.time()
-            if current_time - self.last_send_time[channel] < 0.05:
-                return
+            # 데이터그램 수신 시각 (파서 풀은 워커로 보내기 전 시각)
+            current_time = parsed_data.get('received_at') or time.time()
+            labels = (str(source_addr[0]), parsed_data['product_line'], parsed_data['lidar_id'], channel)
+            self.metrics.count("packets", labels)
+            self.metrics.count("bytes", labels, parsed_data['packet_size'])
+            parse_seconds = parsed_data.get('parse_seconds')
+            self.metrics.observe("parse", labels,
+                                 time.time() - current_time if parse_seconds is None else parse_seconds)
             
-            self.last_send_time[channel] = current_time
+            # 🔧 vfov: 채널별 고정값 (단일 숫자)
+            vfov = self.lidar_receiver.parser.get_vfov(model_info['name'], channel)
             
-            # WebSocket JSON 형태로 변환
-            distances = [p['distance'] for p in points]
-            detections = [p['detection'] for p in points]
-            
-            # 🔧 vfov 수정: 채널별 고정값 (단일 숫자)
-            if model_info['name'] == 'VL-R4':
-                vfov_map = {0: -1.1, 1: 0.0, 2: 1.1, 3: 2.2}
-                vfov = vfov_map.get(channel, 0.0)  # 단일값
-            elif model_info['name'] == 'VL-R2':
-                vfov_map = {0: 0.0, 1: 3.0}
-                vfov = vfov_map.get(channel, 0.0)  # 단일값
-            else:
-                vfov = 0.0  # ← set이 아닌 숫자로 수정!
+            # 센서별 상태 갱신 (시퀀스 번호는 센서·채널마다 따로 증가)
+            sensor, sequence = self.sensor_registry.update(parsed_data, str(source_addr[0]),
+                                                           parsed_data.get('endpoint'), current_time)
+            # 중계 소스는 상위 서버의 시퀀스 번호 유지
+            sequence = parsed_data.get('sequence', sequence)
             
+            # 배열은 그대로 두고 클라이언트별 인코딩 단계에서 직렬화
             lidar_data = {
                 "type": "lidar",
                 "model": model_info['name'],
@@ -265,50 +2942,373 @@ class KanaviWebSocketServer:
                 "vfov": vfov,  # ← 이 채널의 고정 수직각 (단일값)
                 "distances": distances,
                 "hresolution": 0.25,
-                "max": max(distances) if distances else 50,
                 "source_ip": str(source_addr[0]),
-                "lidar_id": f"0x{parsed_data['lidar_id']:02X}",
-                "detection_data": detections,
-                "product_line": f"0x{parsed_data['product_line']:02X}"
+                "lidar_id": parsed_data['lidar_id'],
+                "detection_data": parsed_data['detections'],
+                "product_line": parsed_data['product_line'],
+                "sensor_id": sensor['sensor_id'],
+                "sequence": sequence,
+                "timestamp": current_time
             }
             
-            # 큐를 통해 메인 스레드로 데이터 전달
-            try:
-                self.data_queue.put_nowait(lidar_data)
+            if 'filtered' in parsed_data:
+                # 파서 풀 워커가 필터까지 적용함
+                lidar_data['filtered'] = parsed_data['filtered']
+                self.metrics.observe("filter", labels, parsed_data['filter_seconds'])
+            elif self.scan_filter:
+                # 시간축 필터가 연속 스캔을 모두 보도록 전송률 제한 전에 한 번만 적용
+                filter_start = time.perf_counter()
+                lidar_data['filtered'] = self.scan_filter.apply(lidar_data)
+                self.metrics.observe("filter", labels, time.perf_counter() - filter_start)
+            
+            if self.history:
+                # 필터 전 원본 스캔 기록
+                self.history.add(lidar_data)
+            
+            if self.shm_publisher:
+                # 같은 PC의 소비 프로세스가 직렬화 없이 읽도록 필터 전 원본 스캔 공개
+                publish_start = time.perf_counter()
+                self.shm_publisher.publish(lidar_data)
+                self.metrics.observe("publish", labels, time.perf_counter() - publish_start)
+            
+            if self.occupancy_grid:
+                # 점유 격자는 전송률 제한과 관계없이 모든 스캔으로 갱신 (전송은 broadcast_data_loop에서 주기적으로)
+                grid_start = time.perf_counter()
+                self.occupancy_grid.update(lidar_data)
+                self.metrics.observe("grid", labels, time.perf_counter() - grid_start)
+            
+            # 전체 프레임 조립
+            for frame in self.frame_assembler.add(lidar_data, model_info['channels']):
+                self.queue_assembled_frame(frame)
+            
+            # 큐를 통해 메인 스레드로 데이터 전달 (전송률은 클라이언트별로 조절)
+            self.put_data(lidar_data)
+            if log_level >= LOG_DEBUG:
                 print(f"📤 Ch{channel}: {len(distances)}개 포인트, vfov: {vfov}°")
-            except queue.Full:
-                print(f"⚠️  데이터 큐가 가득참")
                 
         except Exception as e:
             print(f"Kanavi 라이다 데이터 처리 오류: {e}")
             import traceback
             traceback.print_exc()
     
+    def queue_assembled_frame(self, frame):
+        """조립된 전체 프레임을 전송 큐에 추가"""
+        self.put_data(frame)
+    
+    def metric_labels(self, data):
+        """메트릭 레이블 (source_ip, product_line, lidar_id, channel), 전체 프레임은 channel None"""
+        return (data['source_ip'], data['product_line'], data['lidar_id'], data.get('channel'))
+    
+    def put_data(self, data):
+        """데이터 큐에 추가 (가득 차면 가장 오래된 항목을 버리고 최신 항목 유지)
+        
+        큐 대기 시간 측정을 위해 (data, 넣은 시각)으로 보관합니다.
+        """
+        item = (data, time.perf_counter())
+        self.metrics.count("queued", self.metric_labels(data))
+        try:
+            self.data_queue.put_nowait(item)
+        except queue.Full:
+            log(LOG_INFO, "⚠️  데이터 큐가 가득참 - 오래된 프레임 폐기")
+            try:
+                dropped, _ = self.data_queue.get_nowait()
+                self.data_queue_drops += 1
+                self.metrics.count("queue_drops", self.metric_labels(dropped))
+            except queue.Empty:
+                pass
+            self.data_queue.put_nowait(item)
+    
+    def send_snapshot(self, session):
+        """최신 프레임 스냅샷 전송 (델타 스트림/점유 격자는 현재 키프레임), 보낸 프레임 수 반환"""
+        if session.stream in ("distances_delta", "occupancy_grid"):
+            return self.resync_client(session)
+        frames = self.frame_cache.snapshot(session)
+        for stream_key, payload, timestamp in frames:
+            session.enqueue(stream_key, payload)
+        return len(frames)
+    
+    async def stream_history(self, session, request_id, found, subscription, chunk_size):
+        """get_history 결과를 chunk_size개씩 묶어 전송
+        
+        묶음마다 필요한 스캔만 링 버퍼에서 복사해 직렬화하고 이벤트 루프에 양보하므로
+        라이브 브로드캐스트를 막지 않습니다. 전송 중 덮어쓴 스캔은 건너뜁니다.
+        """
+        websocket = session.websocket
+        # 델타/희소/격자 스트림 클라이언트도 기록은 거리 배열로 받음
+        stream = session.stream if session.stream in ("distances", "points_xyz") else "distances"
+        sent = 0
+        chunk = 0
+        try:
+            for start in range(0, len(found), chunk_size):
+                payloads = []
+                for timestamp, key, slot in found[start:start + chunk_size]:
+                    frame = self.history.read(key, slot, timestamp)
+                    view = subscription.apply(frame) if frame is not None else None
+                    if view is not None:
+                        payloads.append(self.frame_encoder.encode(view, session.encoding, session.distance_format,
+                                                                  stream))
+                if payloads:
+                    await websocket.send(self.frame_encoder.encode_history_chunk(request_id, chunk, payloads,
+                                                                                 session.encoding))
+                    sent += len(payloads)
+                    chunk += 1
+                await asyncio.sleep(0)
+            await websocket.send(json.dumps({
+                "type": "history_end",
+                "request_id": request_id,
+                "frames": sent,
+                "chunks": chunk,
+                "skipped": len(found) - sent
+            }))
+        except websockets.ConnectionClosed:
+            pass
+    
+    async def handle_history_request(self, websocket, data):
+        """get_history: 시간 범위(start/end 또는 최근 seconds초)와 구독 형식의 센서/채널/방위각/다운샘플링"""
+        session = self.connected_clients[websocket]
+        if self.history is None:
+            raise ValueError("스캔 기록이 꺼져 있습니다 (--history-seconds)")
+        subscription = KanaviSubscription.from_message(data)
+        oldest, newest = self.history.time_range()
+        seconds = KanaviSubscription.number(data, "seconds")
+        start = KanaviSubscription.number(data, "start")
+        end = KanaviSubscription.number(data, "end")
+        if end is None:
+            end = newest if newest is not None else time.time()
+        if start is None:
+            # 기본값: 최신 스캔 기준 최근 seconds초 (없으면 기록 전체)
+            start = end - seconds if seconds is not None else (oldest or 0.0)
+        chunk_size = data.get("chunk_size", 20)
+        if not isinstance(chunk_size, int) or isinstance(chunk_size, bool) or not 1 <= chunk_size <= 500:
+            raise ValueError("chunk_size는 1~500 정수여야 합니다")
+        
+        self.history_requests += 1
+        request_id = data.get("request_id", self.history_requests)
+        if not isinstance(request_id, int) or isinstance(request_id, bool):
+            raise ValueError("request_id는 정수여야 합니다")
+        found = self.history.query(start, end, subscription)
+        await websocket.send(json.dumps({
+            "type": "history_response",
+            "request_id": request_id,
+            "start": start,
+            "end": end,
+            "frames": len(found),
+            "chunk_size": chunk_size,
+            "oldest": oldest,
+            "newest": newest
+        }))
+        # 이전 요청 전송은 취소하고 새 요청을 별도 태스크로 전송 (메시지 처리 루프를 막지 않음)
+        if session.history_task is not None:
+            session.history_task.cancel()
+        session.history_task = asyncio.create_task(
+            self.stream_history(session, request_id, found, subscription, chunk_size))
+    
+    def resync_client(self, session):
+        """델타 스트림/점유 격자 클라이언트에 현재 키프레임 재전송"""
+        if session.stream == "occupancy_grid":
+            keyframes = [update for update in self.occupancy_grid.current_keyframes()
+                         if session.subscription.allows_sensor(update["sensor_id"])]
+            for update in keyframes:
+                session.enqueue(stream_key(update), self.frame_encoder.encode_grid(update, session.encoding), pinned=True)
+            return len(keyframes)
+        if session.stream != "distances_delta":
+            return 0
+        keyframes = [(frame, delta) for frame, delta
+                     in self.frame_encoder.delta_codec.current_keyframes(session.subscription.view_key)
+                     if session.subscription.allows_sensor(frame.get("sensor_id"))]
+        for frame, delta in keyframes:
+            payload = self.frame_encoder.encode_delta(frame, delta, session.encoding, session.compression)
+            session.enqueue(stream_key(frame), payload, pinned=True)
+        return len(keyframes)
+    
+    def create_client_session(self, websocket):
+        """새 클라이언트 세션 생성 및 송신 태스크 시작"""
+        session = KanaviClientSession(websocket, self.client_queue_depth, self.drop_policy, self.metrics,
+                                      self.adaptive_rate)
+        self.connected_clients[websocket] = session
+        session.start()
+        return session
+    
+    def remove_client_session(self, websocket):
+        """클라이언트 세션 제거"""
+        session = self.connected_clients.pop(websocket, None)
+        if session:
+            session.close()
+            self.release_unused_views()
+    
+    def release_unused_views(self):
+        """델타 스트림 클라이언트가 쓰지 않는 구독 설정(view_key)의 델타 상태 해제
+        
+        구독 방위각 범위는 임의의 실수이므로 해제하지 않으면 subscribe마다 상태가 쌓입니다.
+        """
+        self.frame_encoder.delta_codec.retain_views({session.subscription.view_key
+                                                     for session in self.connected_clients.values()
+                                                     if session.stream == "distances_delta"})
+    
     async def broadcast_to_clients(self, data):
-        """모든 클라이언트에 데이터 브로드캐스트"""
+        """모든 클라이언트에 데이터 브로드캐스트
+        
+        구독 설정별로 한 번만 잘라내고 인코딩별로 한 번만 직렬화한 뒤 같은 bytes/str 객체를
+        각 클라이언트의 송신 버퍼에 넣습니다. 클라이언트별 전송률 제한에 걸린 프레임은 건너뛰되,
+        델타 스트림의 키프레임은 이후 델타를 복원할 수 있도록 항상 보내고, 송신 버퍼에서도 델타보다 나중에 버립니다.
+        실제 전송은 클라이언트별 송신 태스크가 담당하므로 느린 클라이언트가 루프를 막지 않습니다.
+        """
+        key = stream_key(data)
+        # (view_key, encoding, distance_format, stream, compression) → 직렬화 결과 (최신 프레임 캐시와 공유)
+        encoded = self.frame_cache.update(key, data)
         if not self.connected_clients:
             return
-            
-        disconnected = []
-        success_count = 0
         
-        for client in self.connected_clients.copy():
-            try:
-                json_data = json.dumps(data)
-                await client.send(json_data)
-                success_count += 1
-            except websockets.ConnectionClosed:
-                disconnected.append(client)
-            except Exception as e:
-                print(f"❌ 클라이언트 전송 오류: {e}")
-                disconnected.append(client)
+        start_time = time.perf_counter()
+        views = {}  # 구독 view_key → 잘라낸 프레임 (보낼 포인트가 없으면 None)
+        for session in list(self.connected_clients.values()):
+            if not session.accepts(data):
+                continue
+            view_key = session.subscription.view_key
+            if view_key not in views:
+                views[view_key] = session.subscription.apply(data)
+            view = views[view_key]
+            if view is None:
+                continue
+            keyframe = (session.stream == "distances_delta"
+                        and self.frame_encoder.delta_codec.update(view)["kind"] == "key")
+            if not session.rate_allows(key, data["timestamp"], force=keyframe):
+                self.metrics.count("throttled", key[1:])
+                continue
+            encoding_key = (view_key,) + session.encoding_key()
+            if encoding_key not in encoded:
+                encode_start = time.perf_counter()
+                encoded[encoding_key] = self.frame_encoder.encode(view, *encoding_key[1:])
+                self.metrics.observe("serialize", key[1:], time.perf_counter() - encode_start)
+                self.metrics.count("serialized", key[1:])
+            session.enqueue(key, encoded[encoding_key], data["timestamp"], pinned=keyframe)
         
-        # 연결 끊어진 클라이언트 제거
-        for client in disconnected:
-            self.connected_clients.discard(client)
-            
-        if success_count > 0:
-            print(f"✅ WebSocket 전송 성공: {success_count}개 클라이언트 [{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}]")
+        self.record_broadcast_enqueue(time.perf_counter() - start_time, len(self.connected_clients), len(encoded))
+    
+    def broadcast_occupancy(self, update):
+        """점유 격자 갱신을 occupancy_grid 스트림 클라이언트에 전송 (인코딩별로 한 번만 직렬화)
+        
+        격자 전송 주기가 고정이므로 클라이언트별 전송률 제한은 적용하지 않습니다.
+        """
+        key = stream_key(update)
+        encoded = {}
+        for session in list(self.connected_clients.values()):
+            if not session.accepts(update):
+                continue
+            if session.encoding not in encoded:
+                encode_start = time.perf_counter()
+                encoded[session.encoding] = self.frame_encoder.encode_grid(update, session.encoding)
+                self.metrics.observe("serialize", key[1:], time.perf_counter() - encode_start)
+                self.metrics.count("serialized", key[1:])
+            session.enqueue(key, encoded[session.encoding], update["timestamp"], pinned=update["kind"] == "key")
+    
+    async def start_receivers(self):
+        """모든 엔드포인트 수신 시작 (하나라도 시작하면 True)"""
+        started = False
+        for receiver in self.lidar_receivers:
+            if self.parser_pool:
+                receiver.set_raw_callback(functools.partial(self.parser_pool.submit_batch,
+                                                            endpoint=receiver.endpoint))
+            if await receiver.start_receiving():
+                started = True
+            else:
+                print(f"⚠️  수신 시작 실패: {receiver.endpoint}")
+        return started
+    
+    def stop_receivers(self):
+        """모든 엔드포인트 수신 중지"""
+        for receiver in self.lidar_receivers:
+            receiver.stop_receiving()
+    
+    def endpoints(self):
+        """수신 엔드포인트 목록 ("그룹:포트", "replay:파일명" 또는 "relay:상위 서버 주소")"""
+        return [receiver.endpoint for receiver in self.lidar_receivers]
+    
+    def receiver_stats(self):
+        """수신기별 통계"""
+        return [dict(receiver.get_stats(), endpoint=receiver.endpoint) for receiver in self.lidar_receivers]
+    
+    def parser_stats(self):
+        """패킷/오류 카운터 (수신기별 파서 + 파서 워커 합계)"""
+        stats = {}
+        parsers = [receiver.parser.stats for receiver in self.lidar_receivers]
+        if self.parser_pool:
+            parsers.append(self.parser_pool.parser_stats())
+        for parser_stats in parsers:
+            for name, value in parser_stats.items():
+                stats[name] = stats.get(name, 0) + value
+        return stats
+    
+    def scan_filter_stats(self):
+        """스캔 필터 통계 (파서 풀이 있으면 워커 필터 합계, 필터가 없으면 None)"""
+        if not self.scan_filter:
+            return None
+        if self.parser_pool:
+            return self.parser_pool.filter_stats()
+        return self.scan_filter.stats
+    
+    def get_metrics(self):
+        """get_metrics 응답 본문"""
+        metrics = self.metrics.snapshot()
+        metrics.update({
+            "parser": self.parser_stats(),
+            "receiver": self.lidar_receiver.get_stats(),
+            "receivers": self.receiver_stats(),
+            "data_queue": {
+                "size": self.data_queue.qsize(),
+                "capacity": self.data_queue.maxsize,
+                "drops": self.data_queue_drops
+            },
+            "connected_clients": len(self.connected_clients)
+        })
+        return metrics
+    
+    def prometheus_text(self):
+        """/metrics HTTP 응답 (Prometheus 텍스트 형식)"""
+        parser_stats = self.parser_stats()
+        receiver_stats = self.receiver_stats()
+        kernel_drops = [stats["kernel_drops"] for stats in receiver_stats if stats.get("kernel_drops") is not None]
+        gauges = [
+            ("datagrams_received_total", "수신한 UDP 데이터그램 수", "counter",
+             sum(stats["datagrams"] for stats in receiver_stats)),
+            ("kernel_drops_total", "커널이 버린 UDP 데이터그램 수", "counter", sum(kernel_drops) if kernel_drops else None),
+            ("parser_invalid_total", "Kanavi 형식이 아닌 데이터그램 수", "counter", parser_stats["invalid"]),
+            ("parser_checksum_errors_total", "체크섬 오류 패킷 수", "counter", parser_stats["checksum_errors"]),
+            ("parser_errors_total", "파싱 중 예외가 발생한 패킷 수", "counter", parser_stats["parse_errors"]),
+            ("parser_resyncs_total", "패킷 경계를 잃고 다시 찾은 횟수", "counter", parser_stats["resyncs"]),
+            ("parser_truncated_total", "끝이 잘린 패킷 수", "counter", parser_stats["truncated"]),
+            ("data_queue_size", "데이터 큐에 대기 중인 프레임 수", "gauge", self.data_queue.qsize()),
+            ("connected_clients", "연결된 WebSocket 클라이언트 수", "gauge", len(self.connected_clients)),
+            ("sensors_online", "최근 패킷을 보낸 센서 수", "gauge",
+             sum(1 for sensor in self.sensor_registry.get_sensors() if sensor["online"])),
+            ("client_queued_frames", "클라이언트 송신 버퍼에 대기 중인 프레임 수", "gauge",
+             sum(session.queued_frames() for session in list(self.connected_clients.values())))
+        ]
+        if self.parser_pool:
+            gauges.append(("parser_pool_backpressure_drops_total", "파서 풀 워커가 밀려 버린 데이터그램 수", "counter",
+                           self.parser_pool.stats["backpressure_drops"]))
+            gauges.append(("parser_pool_overrun_drops_total", "파서 풀 슬롯 덮어쓰기로 버린 결과 수", "counter",
+                           self.parser_pool.stats["overrun_drops"]))
+        return self.metrics.prometheus_text(gauges)
+    
+    def record_broadcast_enqueue(self, elapsed, client_count, encoding_count):
+        """broadcast_to_clients 1회의 소요 시간 기록 (*_broadcast_enqueue_ms)
+        
+        뷰 슬라이스, 직렬화, 송신 버퍼 적재까지만 잽니다. 실제 전송은 클라이언트별 송신 태스크가
+        나중에 하므로 전송 완료까지의 시간은 send/end_to_end 메트릭을 봅니다.
+        """
+        elapsed_ms = elapsed * 1000.0
+        stats = self.broadcast_stats
+        stats["broadcasts"] += 1
+        stats["last_broadcast_enqueue_ms"] = round(elapsed_ms, 3)
+        stats["max_broadcast_enqueue_ms"] = round(max(stats["max_broadcast_enqueue_ms"], elapsed_ms), 3)
+        # 지수 이동 평균 (최근 값에 가중치)
+        if stats["broadcasts"] == 1:
+            stats["avg_broadcast_enqueue_ms"] = round(elapsed_ms, 3)
+        else:
+            stats["avg_broadcast_enqueue_ms"] = round(stats["avg_broadcast_enqueue_ms"] * 0.9 + elapsed_ms * 0.1, 3)
+        stats["last_client_count"] = client_count
+        stats["last_encoding_count"] = encoding_count
     
     async def broadcast_data_loop(self):
         """데이터 큐 처리 루프 (메인 이벤트 루프에서 실행)"""
@@ -317,9 +3317,19 @@ class KanaviWebSocketServer:
             try:
                 # 논블로킹으로 큐에서 데이터 가져오기
                 while not self.data_queue.empty():
-                    lidar_data = self.data_queue.get_nowait()
+                    lidar_data, queued_at = self.data_queue.get_nowait()
+                    self.metrics.observe("queue", self.metric_labels(lidar_data), time.perf_counter() - queued_at)
                     await self.broadcast_to_clients(lidar_data)
                 
+                # 시간 초과된 미완성 프레임 내보내기
+                for frame in self.frame_assembler.expire(time.monotonic()):
+                    self.queue_assembled_frame(frame)
+                
+                # 점유 격자 주기 전송
+                if self.occupancy_grid:
+                    for update in self.occupancy_grid.publish(time.time()):
+                        self.broadcast_occupancy(update)
+                
                 # 짧은 대기 후 다시 확인
                 await asyncio.sleep(0.01)  # 10ms 대기
                 
@@ -338,12 +3348,30 @@ class KanaviWebSocketServer:
             message_type = data.get("type", "unknown")
             
             if message_type == "start_scan":
+                if data.get("stream") == "occupancy_grid" and self.occupancy_grid is None:
+                    await websocket.send(json.dumps({"type": "error",
+                                                     "message": "점유 격자가 꺼져 있습니다 (--occupancy-grid)"}))
+                    return
+                # 데이터 인코딩 협상 (기본값: JSON)
+                session = self.connected_clients[websocket]
+                previous_encoding = (session.frame_mode,) + session.encoding_key()
+                try:
+                    session.configure(data)
+                except ValueError as e:
+                    await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+                    return
+                self.release_unused_views()
+                
                 if not self.receiving:
-                    self.receiving = True
-                    # 별도 스레드에서 라이다 수신 시작
-                    threading.Thread(target=self.lidar_receiver.start_receiving, daemon=True).start()
-                    # 데이터 큐 처리 태스크 시작
-                    asyncio.create_task(self.broadcast_data_loop())
+                    if self.parser_pool:
+                        self.parser_pool.start(self.on_lidar_data_received)
+                    # 같은 이벤트 루프에서 라이다 수신 시작
+                    if await self.start_receivers():
+                        self.receiving = True
+                        # 데이터 큐 처리 태스크 시작
+                        asyncio.create_task(self.broadcast_data_loop())
+                    elif self.parser_pool:
+                        self.parser_pool.stop()
                     
                 response = {
                     "type": "scan_status",
@@ -351,14 +3379,27 @@ class KanaviWebSocketServer:
                     "scanning": self.receiving,
                     "listen_port": self.lidar_receiver.listen_port,
                     "multicast_group": self.lidar_receiver.multicast_group,
-                    "supported_models": ["VL-R2SL", "VL-R2", "VL-R4", "VL-R270"]
+                    "endpoints": self.endpoints(),
+                    "supported_models": ["VL-R2SL", "VL-R2", "VL-R4", "VL-R270"],
+                    "encoding": self.connected_clients[websocket].encoding,
+                    "distance_format": self.connected_clients[websocket].distance_format,
+                    "frame_mode": self.connected_clients[websocket].frame_mode,
+                    "stream": self.connected_clients[websocket].stream,
+                    "compression": self.connected_clients[websocket].compression
                 }
                 await websocket.send(json.dumps(response))
+                # 인코딩이 바뀌었으면 새 인코딩의 최신 프레임부터 전송 (연결 시 기본 인코딩으로 이미 보냄)
+                # 델타 스트림/점유 격자는 현재 키프레임부터 받아야 복원 가능
+                if ((session.frame_mode,) + session.encoding_key() != previous_encoding
+                        or session.stream in ("distances_delta", "occupancy_grid")):
+                    self.send_snapshot(session)
             
             elif message_type == "stop_scan":
                 if self.receiving:
                     self.receiving = False
-                    self.lidar_receiver.stop_receiving()
+                    self.stop_receivers()
+                    if self.parser_pool:
+                        self.parser_pool.stop()
                 
                 response = {
                     "type": "scan_status", 
@@ -374,6 +3415,7 @@ class KanaviWebSocketServer:
                     "scanning": self.receiving,
                     "listen_port": self.lidar_receiver.listen_port,
                     "multicast_group": self.lidar_receiver.multicast_group,
+                    "endpoints": self.endpoints(),
                     "protocol": "Kanavi VL-Series Protocol v1.5.2",
                     "supported_models": {
                         "VL-R2": "2Ch 120° Ethernet", 
@@ -381,15 +3423,95 @@ class KanaviWebSocketServer:
                         "VL-R270": "1Ch 270° Ethernet"
                     },
                     "connected_clients": len(self.connected_clients),
+                    "receiver": self.lidar_receiver.get_stats(),
+                    "receivers": self.receiver_stats(),
+                    "sensors": self.sensor_registry.get_sensors(),
+                    "parser_pool": self.parser_pool.stats if self.parser_pool else None,
+                    "frame_assembler": self.frame_assembler.stats,
+                    "frame_cache": self.frame_cache.get_stats(),
+                    "history": self.history.get_stats() if self.history else None,
+                    "shared_memory": self.shm_publisher.get_stats() if self.shm_publisher else None,
+                    "scan_filter": self.scan_filter_stats(),
+                    "occupancy_grid": self.occupancy_grid.stats if self.occupancy_grid else None,
+                    "delta_codec": self.frame_encoder.delta_codec.stats,
+                    "broadcast": self.broadcast_stats,
+                    "dropped_frames": {
+                        "data_queue": self.data_queue_drops,
+                        "clients": sum(session.dropped_frames for session in self.connected_clients.values())
+                    },
+                    "clients": [session.get_stats() for session in self.connected_clients.values()],
                     "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 }
                 await websocket.send(json.dumps(response))
             
+            elif message_type == "subscribe":
+                # 채널/방위각 범위/다운샘플링/최대 거리/전송률 구독 (연결 중 언제든 변경 가능)
+                session = self.connected_clients[websocket]
+                try:
+                    session.subscribe(data)
+                except ValueError as e:
+                    await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+                    return
+                self.release_unused_views()
+                response = {
+                    "type": "subscription",
+                    "subscription": session.subscription.to_dict()
+                }
+                await websocket.send(json.dumps(response))
+                # 새 구독 설정의 최신 프레임(델타 스트림/점유 격자는 키프레임)부터 전송
+                self.send_snapshot(session)
+            
+            elif message_type == "get_sensors":
+                # 수신 중인 센서 목록 (subscribe의 sensors에 sensor_id 사용)
+                response = {
+                    "type": "sensors_response",
+                    "endpoints": self.endpoints(),
+                    "sensors": self.sensor_registry.get_sensors()
+                }
+                await websocket.send(json.dumps(response))
+            
+            elif message_type == "get_metrics":
+                # 단계별 지연 히스토그램 요약과 센서/채널별 카운터
+                response = {"type": "metrics_response"}
+                response.update(self.get_metrics())
+                await websocket.send(json.dumps(response))
+            
+            elif message_type == "get_snapshot":
+                # 센서/채널별 최신 프레임 (스캔 중지 상태에서도 마지막 프레임)
+                frames = self.send_snapshot(self.connected_clients[websocket])
+                response = {
+                    "type": "snapshot_response",
+                    "frames": frames,
+                    "scanning": self.receiving
+                }
+                await websocket.send(json.dumps(response))
+            
+            elif message_type == "get_history":
+                # 최근 스캔 기록 조회 (history_response → history_chunk × N → history_end)
+                try:
+                    await self.handle_history_request(websocket, data)
+                except ValueError as e:
+                    await websocket.send(json.dumps({"type": "error", "message": str(e)}))
+            
+            elif message_type == "resync":
+                # 델타 스트림/점유 격자 키프레임 재요청
+                keyframes = self.resync_client(self.connected_clients[websocket])
+                response = {
+                    "type": "resync_response",
+                    "keyframes": keyframes
+                }
+                await websocket.send(json.dumps(response))
+            
             elif message_type == "ping":
+                session = self.connected_clients[websocket]
+                rate_hz = session.rate_limit()
                 response = {
                     "type": "pong",
                     "message": "Kanavi 라이다 서버 응답",
-                    "server_timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    "server_timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    "client_timestamp": data.get("timestamp"),  # 클라이언트 쪽 RTT 측정용
+                    "rate_hz": None if rate_hz is None else round(rate_hz, 1),  # 스트림당 전송률 제한
+                    "rtt_ms": session.rate_controller.stats["rtt_ms"] if session.rate_controller else None
                 }
                 await websocket.send(json.dumps(response))
             
@@ -410,7 +3532,7 @@ class KanaviWebSocketServer:
 async def handle_client(websocket):
     """WebSocket 클라이언트 처리"""
     server = websocket.server.server_instance
-    server.connected_clients.add(websocket)
+    session = server.create_client_session(websocket)
     
     print(f"🔗 클라이언트 연결: {websocket.remote_address}")
     
@@ -422,12 +3544,17 @@ async def handle_client(websocket):
             "version": "1.5.2",
             "encoding": "Big Endian",
             "communication": "Ethernet UDP Multicast",
+            "encodings": ["json", "binary"],
+            "streams": list(KanaviFrameEncoder.STREAMS),
             "multicast_group": server.lidar_receiver.multicast_group,
-            "listen_port": server.lidar_receiver.listen_port
+            "listen_port": server.lidar_receiver.listen_port,
+            "endpoints": server.endpoints()
         },
         "instructions": "스캔을 시작하려면 'start_scan' 메시지를 보내세요"
     }
     await websocket.send(json.dumps(welcome))
+    # 다음 브로드캐스트를 기다리지 않도록 센서/채널별 최신 프레임 바로 전송 (스캔 중지 상태 포함)
+    server.send_snapshot(session)
     
     try:
         async for message in websocket:
@@ -435,23 +3562,133 @@ async def handle_client(websocket):
     except websockets.ConnectionClosed:
         pass
     finally:
-        server.connected_clients.discard(websocket)
+        server.remove_client_session(websocket)
         print(f"❌ 클라이언트 연결 해제: {websocket.remote_address}")
 
-async def main():
+def parse_endpoint(text):
+    """--endpoint 값 "그룹:포트" → (그룹, 포트)"""
+    group, _, port = text.rpartition(":")
+    try:
+        socket.inet_aton(group)
+        return group, int(port)
+    except (OSError, ValueError):
+        raise argparse.ArgumentTypeError(f"'그룹:포트' 형식이어야 합니다: {text}")
+
+def parse_args():
+    """명령행 옵션 (수신 엔드포인트, 캡처 기록/재생)"""
+    parser = argparse.ArgumentParser(description="Kanavi VL-Series LiDAR WebSocket 서버")
+    parser.add_argument("--endpoint", action="append", type=parse_endpoint, metavar="GROUP:PORT",
+                        help="수신할 멀티캐스트 그룹:포트 (여러 번 지정 가능, 기본값 224.0.0.5:5000)")
+    parser.add_argument("--record", metavar="PATH", help="수신한 원시 UDP 데이터그램을 캡처 파일에 기록")
+    parser.add_argument("--replay", metavar="PATH", help="센서 대신 캡처 파일(Kanavi 캡처 또는 pcap) 재생")
+    parser.add_argument("--speed", type=float, default=1.0, help="재생 배속 (0이면 최대 속도)")
+    parser.add_argument("--loop", action="store_true", help="캡처 파일 반복 재생")
+    parser.add_argument("--relay", metavar="URL",
+                        help="센서 대신 상위 서버(ws://호스트:포트)의 스캔을 받아 다시 제공 (중계 모드)")
+    parser.add_argument("--relay-format", default="uint16", choices=list(KanaviFrameEncoder.DISTANCE_FORMATS),
+                        help="상위 서버 연결의 거리 형식 (uint16: cm 단위, 센서 분해능과 같음)")
+    parser.add_argument("--port", type=int, default=8765, help="WebSocket 포트")
+    parser.add_argument("--rcvbuf", type=int, default=4 * 1024 * 1024, metavar="BYTES",
+                        help="UDP 소켓 SO_RCVBUF 요청값 (기본값 4MiB, 0이면 OS 기본값; Linux는 net.core.rmem_max까지만 적용)")
+    parser.add_argument("--recv-batch", type=int, default=64, metavar="N",
+                        help="소켓이 읽기 가능할 때 한 번에 읽을 최대 데이터그램 수 (0이면 하나씩 수신)")
+    parser.add_argument("--parse-workers", type=int, default=0, metavar="N",
+                        help="센서별 패킷 파싱과 스캔 필터를 N개 워커 프로세스에서 수행 "
+                             "(0이면 이벤트 루프에서 직접 처리, 중계 모드에서는 무시; "
+                             "배율은 run_benchmarks.py --only workers로 먼저 확인)")
+    parser.add_argument("--log-level", default="info", choices=list(LOG_LEVELS),
+                        help="로그 수준 (debug이면 패킷마다 출력)")
+    parser.add_argument("--no-adaptive-rate", action="store_true",
+                        help="클라이언트별 전송률 자동 조절 끄기 (구독 rate_hz만 적용)")
+    parser.add_argument("--client-queue-depth", type=int, default=4, metavar="N",
+                        help="클라이언트 송신 버퍼의 스트림(센서·채널)당 최대 프레임 수")
+    parser.add_argument("--drop-policy", default="drop_oldest", choices=list(KanaviClientSession.DROP_POLICIES),
+                        help="송신 버퍼가 가득 찼을 때 (drop_oldest: 가장 오래된 프레임 버림, "
+                             "latest_only: 스트림당 최신 프레임 1개만 유지)")
+    parser.add_argument("--no-scan-filter", action="store_true", help="스캔 필터 끄기 (points_sparse는 거리 0만 제외)")
+    parser.add_argument("--min-range", type=float, default=0.1, help="스캔 필터 최소 거리 (m)")
+    parser.add_argument("--max-range", type=float, help="스캔 필터 최대 거리 (m)")
+    parser.add_argument("--min-height", type=float, help="센서 기준 이 높이(m)보다 낮은 포인트 제거 (지면, 예: -1.2)")
+    parser.add_argument("--temporal-window", type=int, default=3, help="시간축 중앙값 필터 스캔 수 (1이면 사용 안 함)")
+    parser.add_argument("--min-neighbors", type=int, default=1, help="고립 포인트 판정 최소 이웃 수 (0이면 사용 안 함)")
+    parser.add_argument("--occupancy-grid", action="store_true", help="센서별 2D 점유 격자 생성 (stream: occupancy_grid)")
+    parser.add_argument("--grid-resolution", type=float, default=0.1, help="점유 격자 칸 크기 (m)")
+    parser.add_argument("--grid-size", type=float, default=40.0, help="점유 격자 한 변 길이 (m, 센서 중심)")
+    parser.add_argument("--grid-rate", type=float, default=2.0, help="점유 격자 전송 주기 (Hz)")
+    parser.add_argument("--grid-min-height", type=float, help="이 높이(m)보다 낮게 닿은 포인트는 점유로 세지 않음 (지면)")
+    parser.add_argument("--grid-max-height", type=float, help="이 높이(m)보다 높게 닿은 포인트는 점유로 세지 않음")
+    parser.add_argument("--history-seconds", type=float, default=30.0,
+                        help="get_history용으로 보관할 최근 스캔 시간 (초, 0이면 사용 안 함)")
+    parser.add_argument("--history-rate", type=float, default=20.0,
+                        help="채널당 초당 스캔 수 (링 버퍼 크기 = history-seconds × history-rate)")
+    parser.add_argument("--history-dir", metavar="DIR", help="스캔 기록 링 버퍼를 이 디렉터리의 메모리 매핑 파일에 저장")
+    parser.add_argument("--shm-name", metavar="NAME",
+                        help="스캔을 이 이름의 공유 메모리에 공개 (같은 PC의 프로세스가 SharedScanReader로 읽음)")
+    parser.add_argument("--shm-streams", type=int, default=32, help="공유 메모리 최대 스트림(센서·채널) 수")
+    parser.add_argument("--shm-depth", type=int, default=4, help="공유 메모리 스트림당 보관할 최근 스캔 수")
+    parser.add_argument("--shm-replace", action="store_true",
+                        help="같은 이름의 공유 메모리를 다른 프로세스가 쓰고 있어도 교체 (기본값: 비정상 종료로 남은 것만 교체)")
+    parser.add_argument("--metrics-port", type=int, default=0, metavar="PORT",
+                        help="Prometheus /metrics HTTP 포트 (기본값 0: 사용 안 함, 보통 9108)")
+    args = parser.parse_args()
+    if args.relay and (args.endpoint or args.replay or args.record):
+        parser.error("--relay는 --endpoint, --replay, --record와 함께 사용할 수 없습니다")
+    if args.replay and args.record:
+        parser.error("--replay는 --record와 함께 사용할 수 없습니다 (재생한 데이터그램은 기록되지 않음)")
+    if args.parse_workers < 0:
+        parser.error("--parse-workers는 0 이상이어야 합니다")
+    if args.rcvbuf < 0 or args.recv_batch < 0:
+        parser.error("--rcvbuf와 --recv-batch는 0 이상이어야 합니다")
+    if args.client_queue_depth < 1:
+        parser.error("--client-queue-depth는 1 이상이어야 합니다")
+    return args
+
+async def main(args):
     """메인 서버 실행"""
+    set_log_level(args.log_level)
     print("🚀 Kanavi VL-Series LiDAR WebSocket 서버 시작")
     print("=" * 50)
     
     # 네트워크 설정
     UDP_PORT = 5000
-    WEBSOCKET_PORT = 8765
+    WEBSOCKET_PORT = args.port
     MULTICAST_GROUP = "224.0.0.5"  # Kanavi 기본 멀티캐스트 그룹
+    PARSE_WORKERS = 0 if args.relay else args.parse_workers  # 파서 워커 프로세스 수 (0이면 이벤트 루프에서 직접 파싱)
     
     print("📋 네트워크 설정:")
-    print(f"   - 멀티캐스트 그룹: {MULTICAST_GROUP}")
-    print(f"   - UDP 포트: {UDP_PORT}")
+    endpoints = args.endpoint or [(MULTICAST_GROUP, UDP_PORT)]
+    if args.relay:
+        print(f"   - 중계: {args.relay} ({args.relay_format})")
+    else:
+        for group, port in endpoints:
+            print(f"   - 수신: {group}:{port}")
     print(f"   - WebSocket 포트: {WEBSOCKET_PORT}")
+    print(f"   - 파서 워커: {PARSE_WORKERS}개")
+    if not args.relay:
+        print(f"   - 수신 소켓: SO_RCVBUF {f'{args.rcvbuf}바이트' if args.rcvbuf else 'OS 기본값'}, "
+              f"{f'최대 {args.recv_batch}개씩 배치 수신' if args.recv_batch else '데이터그램 단위 수신'}")
+    if args.replay:
+        print(f"   - 재생: {args.replay} ({args.speed if args.speed > 0 else '최대'}배속{', 반복' if args.loop else ''})")
+    if args.record:
+        print(f"   - 기록: {args.record}")
+    if args.metrics_port:
+        print(f"   - 메트릭: http://0.0.0.0:{args.metrics_port}/metrics")
+    print(f"   - 전송률: {'고정 (구독 rate_hz만 적용)' if args.no_adaptive_rate else '클라이언트별 자동 조절'}")
+    print(f"   - 송신 버퍼: 스트림당 {1 if args.drop_policy == 'latest_only' else args.client_queue_depth}프레임 "
+          f"({args.drop_policy})")
+    if not args.no_scan_filter:
+        print(f"   - 스캔 필터: {args.min_range}~{args.max_range or '최대'}m, 중앙값 {args.temporal_window}스캔, "
+              f"최소 이웃 {args.min_neighbors}개")
+    if args.occupancy_grid:
+        print(f"   - 점유 격자: {args.grid_size}m × {args.grid_size}m, {args.grid_resolution}m 칸, {args.grid_rate}Hz 전송")
+    history_capacity = int(args.history_seconds * args.history_rate)
+    if history_capacity > 0:
+        print(f"   - 스캔 기록: 채널당 {history_capacity}개 스캔 ({args.history_seconds}초, "
+              f"VL-R4 센서당 약 {history_capacity * 4 * (12 + 400 * 5) / 1e6:.1f}MB"
+              f"{', ' + args.history_dir + ' 메모리 매핑' if args.history_dir else ''})")
+    if args.shm_name:
+        print(f"   - 공유 메모리: {args.shm_name} (스트림 {args.shm_streams}개 × 최근 {args.shm_depth}스캔)")
+    print(f"   - 로그 수준: {args.log_level}")
     print()
     print("📋 프로토콜 정보:")
     print("   - 제조사: Kanavi Mobility Co.,Ltd.")
@@ -467,10 +3704,46 @@ async def main():
     print(f"🌐 WebSocket: ws://0.0.0.0:{WEBSOCKET_PORT}")
     print("=" * 50)
     
+    shm_publisher = None
+    if args.shm_name:
+        try:
+            shm_publisher = SharedScanPublisher(args.shm_name, args.shm_streams, args.shm_depth,
+                                                replace=args.shm_replace)
+        except FileExistsError as e:
+            print(f"❌ {e}")
+            return
+    
     # 서버 인스턴스 생성 (멀티캐스트 설정 포함)
     kanavi_server = KanaviWebSocketServer(
-        listen_port=UDP_PORT,
-        multicast_group=MULTICAST_GROUP
+        endpoints=endpoints,
+        parse_workers=PARSE_WORKERS,
+        receive_batch_size=args.recv_batch,
+        receive_buffer_size=args.rcvbuf or None,
+        record_path=args.record,
+        replay_path=args.replay,
+        replay_speed=args.speed,
+        replay_loop=args.loop,
+        relay_url=args.relay,
+        relay_format=args.relay_format,
+        adaptive_rate=not args.no_adaptive_rate,
+        client_queue_depth=args.client_queue_depth,
+        drop_policy=args.drop_policy,
+        scan_filter=None if args.no_scan_filter else KanaviScanFilter(
+            min_range=args.min_range,
+            max_range=args.max_range,
+            min_height=args.min_height,
+            temporal_window=args.temporal_window,
+            min_neighbors=args.min_neighbors
+        ),
+        occupancy_grid=KanaviOccupancyGrid(
+            resolution=args.grid_resolution,
+            size=args.grid_size,
+            min_height=args.grid_min_height,
+            max_height=args.grid_max_height,
+            publish_rate_hz=args.grid_rate
+        ) if args.occupancy_grid else None,
+        history=KanaviScanHistory(history_capacity, args.history_dir) if history_capacity > 0 else None,
+        shm_publisher=shm_publisher
     )
     
     # WebSocket 서버 시작
@@ -478,13 +3751,24 @@ async def main():
         # 서버 인스턴스를 핸들러에서 접근 가능하도록 설정
         server.server_instance = kanavi_server
         
+        if args.metrics_port:
+            # Prometheus 수집용 HTTP 엔드포인트 (포트를 못 열어도 WebSocket 서버는 계속 동작)
+            try:
+                await serve_prometheus(kanavi_server.prometheus_text, "0.0.0.0", args.metrics_port)
+            except OSError as e:
+                print(f"⚠️  메트릭 엔드포인트 시작 실패 (포트 {args.metrics_port}): {e}")
+        
         print("🎯 Kanavi 멀티캐스트 데이터 수신 대기 중...")
         print("📱 Flutter 앱에서 '스캔 시작' 버튼을 눌러주세요!")
         
-        await asyncio.Future()  # 무한 대기
+        try:
+            await asyncio.Future()  # 무한 대기
+        finally:
+            if kanavi_server.shm_publisher:
+                kanavi_server.shm_publisher.close()
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(parse_args()))
     except KeyboardInterrupt:
         print("\n🛑 Kanavi 라이다 서버 종료")
\ No newline at end of file
@@ -0,0 +1,129 @@
+"""distances_delta 스트림 회귀 테스트 (델타의 Detection, 구독별 상태 해제, 송신 버퍼의 키프레임 유지, 전송 실패 시 연결 종료)
+
+    python -m pytest dev_tools/tests
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server_lidar import KanaviClientSession, KanaviDeltaCodec, KanaviPointProjector, KanaviWebSocketServer
+
+STREAM = ("lidar", "192.168.0.10", 0x06, 1, 0)
+
+def channel_frame(sequence, distances, detections):
+    return {
+        "source_ip": "192.168.0.10", "product_line": 0x06, "lidar_id": 1, "channel": 0,
+        "sequence": sequence, "distances": np.asarray(distances, dtype=np.float32),
+        "detection_data": np.asarray(detections, dtype=np.uint8)
+    }
+
+class DeltaCodecTest(unittest.TestCase):
+
+    def test_delta_carries_changed_detections(self):
+        codec = KanaviDeltaCodec(keyframe_interval=10)
+        distances = np.full(400, 5.0)
+        detections = np.zeros(400)
+        self.assertEqual(codec.update(channel_frame(1, distances, detections))["kind"], "key")
+
+        detections[[7, 9]] = 3  # 거리는 그대로, Detection만 바뀜
+        distances[9] = 5.5
+        delta = codec.update(channel_frame(2, distances, detections))
+        self.assertEqual(delta["kind"], "delta")
+        self.assertEqual(delta["indices"].tolist(), [7, 9])
+        self.assertEqual(delta["deltas_cm"].tolist(), [0, 50])
+        self.assertEqual(delta["detections"].tolist(), [3, 3])
+
+    def test_unused_views_are_released(self):
+        server = KanaviWebSocketServer(adaptive_rate=False)
+        codec = server.frame_encoder.delta_codec
+        session = KanaviClientSession(None, adaptive_rate=False)
+        session.stream = "distances_delta"
+        server.connected_clients["client"] = session
+        for azimuth in (10.0, 10.5, 11.0):
+            # 구독을 바꿀 때마다 이전 방위각 범위의 상태는 해제
+            session.subscribe({"azimuth_min": -azimuth, "azimuth_max": azimuth})
+            codec.update(dict(channel_frame(1, np.full(400, 5.0), np.zeros(400)),
+                              view_key=session.subscription.view_key))
+            server.release_unused_views()
+            self.assertEqual([key[-1] for key in codec.streams], [session.subscription.view_key])
+        server.remove_client_session("client")
+        self.assertEqual(codec.streams, {})
+        self.assertEqual(codec.stats["released_streams"], 3)
+
+    def test_projector_tables_are_bounded(self):
+        projector = KanaviPointProjector(max_tables=16)
+        full_scan = next(iter(projector.tables))
+        for index in range(100):
+            projector.get_table(float(index) / 10, 0.25, 0.0, 400)
+            projector.get_table(*full_scan)  # 계속 쓰는 테이블은 남음
+        self.assertEqual(len(projector.tables), 16)
+        self.assertIn(full_scan, projector.tables)
+
+class SendBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.session = KanaviClientSession(None, queue_depth=3)
+
+    def queued(self):
+        return [entry[0] for entry in self.session.send_buffers[STREAM]]
+
+    def test_keyframe_outlives_deltas(self):
+        self.session.enqueue(STREAM, "key1", pinned=True)
+        for index in range(4):
+            self.session.enqueue(STREAM, f"delta{index}")
+        self.assertEqual(self.queued(), ["key1", "delta2", "delta3"])
+        self.assertEqual(self.session.dropped_frames, 2)
+
+    def test_newer_keyframe_replaces_older_keyframe(self):
+        self.session.enqueue(STREAM, "key1", pinned=True)
+        self.session.enqueue(STREAM, "key2", pinned=True)
+        self.session.enqueue(STREAM, "key3", pinned=True)
+        self.session.enqueue(STREAM, "delta")  # 버퍼가 모두 키프레임: 새 델타를 버림
+        self.session.enqueue(STREAM, "key4", pinned=True)
+        self.assertEqual(self.queued(), ["key2", "key3", "key4"])
+        self.assertEqual(self.session.dropped_frames, 2)
+
+    def test_unpinned_streams_drop_oldest(self):
+        for index in range(5):
+            self.session.enqueue(STREAM, f"frame{index}")
+        self.assertEqual(self.queued(), ["frame2", "frame3", "frame4"])
+
+class FailingWebSocket:
+    """첫 send에서 예외를 내는 WebSocket"""
+
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def send(self, payload):
+        if not self.sent:
+            self.sent.append(None)
+            raise RuntimeError("send failed")
+        self.sent.append(payload)
+
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+
+class SenderFailureTest(unittest.TestCase):
+
+    def test_send_error_closes_connection(self):
+        async def run():
+            websocket = FailingWebSocket()
+            session = KanaviClientSession(websocket, adaptive_rate=False)
+            session.start()
+            session.enqueue(STREAM, "frame0")
+            with contextlib.redirect_stdout(io.StringIO()):
+                await asyncio.wait_for(session.sender_task, 1.0)
+            session.close()
+            return websocket.close_code
+
+        self.assertEqual(asyncio.run(run()), 1011)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""KanaviFrameAssembler 조립/시간 초과 회귀 테스트
+
+    python -m pytest dev_tools/tests
+"""
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server_lidar import KanaviFrameAssembler
+
+def channel_frame(channel, timestamp):
+    return {
+        "model": "VL-R4", "hfov": 100.0, "hresolution": 0.25, "source_ip": "192.168.0.10",
+        "lidar_id": 1, "product_line": 0x06, "sensor_id": "192.168.0.10/0x06/0x01",
+        "channel": channel, "timestamp": timestamp
+    }
+
+class FrameAssemblerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.assembler = KanaviFrameAssembler(timeout=0.1)
+
+    def test_complete_frame(self):
+        frames = []
+        for channel in range(4):
+            frames.extend(self.assembler.add(channel_frame(channel, 1000.0 + channel * 0.001), 4))
+        self.assertEqual(len(frames), 1)
+        self.assertTrue(frames[0]['complete'])
+        self.assertEqual([frame['channel'] for frame in frames[0]['channels']], [0, 1, 2, 3])
+        self.assertEqual(frames[0]['timestamp'], 1000.0)
+
+    def test_upstream_timestamp_does_not_drive_expiry(self):
+        # 중계 모드: timestamp는 상위 서버 시각 (150ms 지연 + 시계 차이)
+        frames = []
+        for revolution in range(4):
+            for channel in range(4):
+                upstream_time = time.time() - 0.15
+                frames.extend(self.assembler.add(channel_frame(channel, upstream_time), 4))
+                frames.extend(self.assembler.expire(time.monotonic()))
+        self.assertEqual(self.assembler.stats, {"complete": 4, "partial": 0, "discarded": 0})
+        self.assertTrue(all(len(frame['channels']) == 4 for frame in frames))
+
+    def test_expire_uses_arrival_time(self):
+        self.assembler.add(channel_frame(0, 1000.0), 4, now=50.0)
+        self.assembler.add(channel_frame(1, 1000.0), 4, now=50.01)
+        self.assertEqual(self.assembler.expire(50.09), [])
+        frames = self.assembler.expire(50.1)
+        self.assertEqual(len(frames), 1)
+        self.assertFalse(frames[0]['complete'])
+        self.assertEqual(len(frames[0]['channels']), 2)
+        self.assertEqual(frames[0]['timestamp'], 1000.0)
+
+    def test_repeated_channel_flushes_partial_frame(self):
+        self.assembler.add(channel_frame(0, 1000.0), 4, now=1.0)
+        frames = self.assembler.add(channel_frame(0, 1000.05), 4, now=1.05)
+        self.assertEqual(len(frames), 1)
+        self.assertFalse(frames[0]['complete'])
+        self.assertEqual(self.assembler.stats["partial"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
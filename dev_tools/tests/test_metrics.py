@@ -0,0 +1,32 @@
+"""파이프라인 메트릭 레이블 회귀 테스트 (모델이 다른 센서가 같은 lidar_id를 써도 따로 집계)
+
+    python -m pytest dev_tools/tests
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server_lidar import KanaviLidarParser, KanaviWebSocketServer, build_kanavi_packet
+
+ADDR = ("192.168.0.10", 2020)
+
+class MetricLabelsTest(unittest.TestCase):
+
+    def test_sensors_with_same_lidar_id_are_separate(self):
+        server = KanaviWebSocketServer(adaptive_rate=False)
+        parser = KanaviLidarParser()
+        for product_line, points in ((0x06, 400), (0x03, 360)):
+            parsed = parser.parse_kanavi_packet(build_kanavi_packet(product_line, 1, 0, np.full(points, 5.0)))
+            server.on_lidar_data_received(parsed, ADDR)
+
+        packets = [counter for counter in server.metrics.snapshot()["counters"] if counter["name"] == "packets"]
+        self.assertEqual(sorted((counter["product_line"], counter["value"]) for counter in packets), [(3, 1), (6, 1)])
+        text = server.prometheus_text()
+        self.assertIn('kanavi_packets_total{source_ip="192.168.0.10",product_line="3",lidar_id="1",channel="0"} 1', text)
+        self.assertIn('kanavi_packets_total{source_ip="192.168.0.10",product_line="6",lidar_id="1",channel="0"} 1', text)
+
+if __name__ == "__main__":
+    unittest.main()
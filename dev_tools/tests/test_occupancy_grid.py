@@ -0,0 +1,65 @@
+"""KanaviOccupancyGrid 키프레임/델타 회귀 테스트 (델타가 키프레임보다 크면 키프레임 전송)
+
+    python -m pytest dev_tools/tests
+"""
+import os
+import sys
+import unittest
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server_lidar import KanaviOccupancyGrid
+
+def channel_frame(timestamp):
+    return {
+        "source_ip": "192.168.0.10", "product_line": 0x06, "lidar_id": 1, "channel": 0,
+        "hfov": 100.0, "hresolution": 0.25, "vfov": 0.0, "timestamp": timestamp,
+        "distances": np.full(400, 1.5, dtype=np.float32)
+    }
+
+class OccupancyGridTest(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = KanaviOccupancyGrid(resolution=0.1, size=4.0, publish_rate_hz=10.0)
+        self.now = 1000.0
+        self.grid.update(channel_frame(self.now))
+
+    def publish(self, change_cells):
+        """스캔 1개로 만든 센서 격자를 change_cells(log_odds를 바꾸는 함수)로 바꾼 뒤 전송할 갱신 1개"""
+        state = self.grid.grids["192.168.0.10/0x06/0x01"]
+        change_cells(state['log_odds'])
+        state['dirty'] = True
+        self.now += 1.0
+        updates = self.grid.publish(self.now)
+        self.assertEqual(len(updates), 1)
+        return updates[0]
+
+    def cells(self):
+        state = self.grid.grids["192.168.0.10/0x06/0x01"]
+        return (state['log_odds'] + KanaviOccupancyGrid.UNKNOWN).astype(np.uint8)
+
+    def test_small_change_is_delta_large_change_is_keyframe(self):
+        keyframe = self.publish(lambda log_odds: None)
+        self.assertEqual(keyframe['kind'], "key")
+        keyframe_cells = np.frombuffer(zlib.decompress(keyframe['body']), dtype=np.uint8)
+
+        def touch_few(log_odds):
+            log_odds[:5] = 100
+        delta = self.publish(touch_few)
+        self.assertEqual(delta['kind'], "delta")
+        self.assertLess(len(delta['body']), len(keyframe['body']))
+        restored = np.bitwise_xor(keyframe_cells, np.frombuffer(zlib.decompress(delta['body']), dtype=np.uint8))
+        np.testing.assert_array_equal(restored, self.cells())
+
+        def randomize(log_odds):
+            log_odds[:] = np.random.default_rng(1).integers(-127, 128, len(log_odds))
+        update = self.publish(randomize)
+        # 모든 칸이 바뀌면 델타가 줄여 주는 것이 없으므로 새 키프레임
+        self.assertEqual(update['kind'], "key")
+        self.assertEqual(update['keyframe_sequence'], update['sequence'])
+        np.testing.assert_array_equal(np.frombuffer(zlib.decompress(update['body']), dtype=np.uint8), self.cells())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""KanaviParserPool 흐름 제어 회귀 테스트 (워커 프로세스 사용)
+
+    python -m pytest dev_tools/tests
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+import unittest
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server_lidar import KanaviLidarParser, KanaviParserPool, KanaviScanFilter, build_kanavi_packet
+
+ADDR = ("192.168.0.10", 2020)
+
+def make_batches(batch_count, batch_size=8):
+    """VL-R4 채널 0 패킷 배치 (거리에 패킷 번호를 넣어 순서 확인)"""
+    batches = []
+    for batch_index in range(batch_count):
+        batch = []
+        for index in range(batch_size):
+            number = batch_index * batch_size + index
+            batch.append((build_kanavi_packet(0x06, 1, 0, np.full(400, (number % 5000) / 100.0)), ADDR))
+        batches.append(batch)
+    return batches
+
+class ParserPoolTest(unittest.TestCase):
+
+    def run_pool(self, pool, batches, callback_seconds=0.0, pace=True, timeout=60.0):
+        received = []
+
+        def callback(parsed_data, addr):
+            received.append(dict(parsed_data, source_ip=addr[0]))
+            if callback_seconds:
+                time.sleep(callback_seconds)  # 느린 수집 스레드 (파싱 뒤 처리)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            pool.start(callback)
+        try:
+            for batch in batches:
+                while pace and max(pool.in_flight) + len(batch) > pool.max_in_flight:
+                    time.sleep(0.001)
+                pool.submit_batch(batch)
+            deadline = time.time() + timeout
+            total = sum(len(batch) for batch in batches)
+            while pool.stats["decoded"] + pool.stats["backpressure_drops"] < total or pool.pending():
+                self.assertLess(time.time(), deadline, pool.stats)
+                time.sleep(0.005)
+        finally:
+            with contextlib.redirect_stdout(io.StringIO()):
+                pool.stop()
+        return received
+
+    def test_slow_collector_never_loses_results(self):
+        # 슬롯 4개보다 훨씬 많은 결과가 밀려도 덮어쓰지 않고 순서대로 전달
+        pool = KanaviParserPool(2, slots_per_worker=4, max_in_flight=64)
+        batches = make_batches(20)
+        received = self.run_pool(pool, batches, callback_seconds=0.001)
+        self.assertEqual(pool.stats["overrun_drops"], 0)
+        self.assertEqual(pool.stats["backpressure_drops"], 0)
+        self.assertEqual(len(received), 160)
+        expected = KanaviLidarParser().parse_kanavi_packet(batches[3][5][0])
+        np.testing.assert_array_equal(received[29]['distances'], expected['distances'])
+        numbers = [int(round(parsed['distances'][0] * 100)) for parsed in received]
+        self.assertEqual(numbers, list(range(160)))
+
+    def test_backpressure_drops_instead_of_queueing(self):
+        pool = KanaviParserPool(1, slots_per_worker=4, max_in_flight=16)
+        received = self.run_pool(pool, make_batches(40), callback_seconds=0.002, pace=False)
+        self.assertEqual(pool.stats["overrun_drops"], 0)
+        self.assertGreater(pool.stats["backpressure_drops"], 0)
+        self.assertEqual(len(received) + pool.stats["backpressure_drops"], 320)
+        self.assertEqual(pool.stats["decoded"], len(received))
+
+    def test_sensors_spread_over_workers(self):
+        pool = KanaviParserPool(2)
+        packets = [build_kanavi_packet(0x06, 1, channel, np.full(400, 5.0)) for channel in range(4)]
+        sensors = [(packets[0], (f"192.168.0.{10 + index}", 2020)) for index in range(4)]
+        self.assertEqual([pool.worker_for(*datagram) for datagram in sensors], [0, 1, 0, 1])
+        # 같은 센서의 다른 채널은 같은 워커, 같은 IP라도 모델이 다르면 새 센서로 배정
+        self.assertEqual({pool.worker_for(packet, ("192.168.0.11", 2020)) for packet in packets}, {1})
+        vl_r2 = build_kanavi_packet(0x03, 1, 0, np.full(360, 5.0))
+        self.assertEqual(pool.worker_for(vl_r2, ("192.168.0.10", 2020)), 0)
+
+    def test_workers_apply_scan_filter_per_sensor(self):
+        # 센서 3대 × 4채널 × 6스캔, 워커가 적용한 필터 결과는 한 프로세스에서 순서대로 적용한 결과와 같음
+        rng = np.random.default_rng(5)
+        datagrams = []
+        for scan in range(6):
+            for sensor in range(3):
+                for channel in range(4):
+                    distances = rng.uniform(0.0, 30.0, 400)
+                    distances[rng.random(400) < 0.2] = 0.0
+                    addr = (f"192.168.0.{10 + sensor}", 2020)
+                    datagrams.append((build_kanavi_packet(0x06, 1, channel, distances), addr))
+        batches = [datagrams[index:index + 8] for index in range(0, len(datagrams), 8)]
+        pool = KanaviParserPool(2, scan_filter=KanaviScanFilter(), slots_per_worker=8, max_in_flight=64)
+        received = self.run_pool(pool, batches)
+        self.assertEqual(len(received), len(datagrams))
+
+        parser = KanaviLidarParser()
+        reference_filter = KanaviScanFilter()
+        expected = defaultdict(list)
+        for data, addr in datagrams:
+            parsed = parser.parse_kanavi_packet(data)
+            vfov = parser.get_vfov(parsed['model_info']['name'], parsed['channel'])
+            frame = dict(parsed, source_ip=addr[0], vfov=vfov)
+            expected[(addr[0], parsed['channel'])].append(reference_filter.apply(frame))
+        actual = defaultdict(list)
+        for parsed in received:
+            self.assertGreaterEqual(parsed['filter_seconds'], 0.0)
+            actual[(parsed['source_ip'], parsed['channel'])].append(parsed['filtered'])
+        self.assertEqual(set(actual), set(expected))
+        for key, scans in expected.items():
+            self.assertEqual(len(actual[key]), len(scans))
+            for filtered, reference in zip(actual[key], scans):
+                np.testing.assert_array_equal(filtered, reference, err_msg=str(key))
+        self.assertEqual(pool.filter_stats(), reference_filter.stats)
+
+if __name__ == "__main__":
+    unittest.main()
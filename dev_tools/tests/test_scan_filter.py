@@ -0,0 +1,39 @@
+"""KanaviScanFilter 시간축 중앙값 회귀 테스트 (무효 포인트 0과 거리의 평균을 만들지 않음)
+
+    python -m pytest dev_tools/tests
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server_lidar import KanaviScanFilter
+
+def channel_frame(distances):
+    return {
+        "source_ip": "192.168.0.10", "product_line": 0x06, "lidar_id": 1, "channel": 0, "vfov": 0.0,
+        "distances": np.asarray(distances, dtype=np.float32)
+    }
+
+class TemporalMedianTest(unittest.TestCase):
+
+    def apply_scans(self, scan_filter, scans):
+        return np.array([scan_filter.apply(channel_frame(scan)) for scan in scans])
+
+    def test_warm_up_does_not_average_invalid_points(self):
+        # 기본 창(3): 두 번째 스캔에서 [0, 8]이 4m가 되면 안 됨
+        scan_filter = KanaviScanFilter(min_neighbors=0)
+        results = self.apply_scans(scan_filter, [[0.0, 5.0], [8.0, 5.0], [8.0, 5.0]])
+        np.testing.assert_array_equal(results, np.float32([[0.0, 5.0], [0.0, 5.0], [8.0, 5.0]]))
+
+    def test_even_window_uses_measured_values(self):
+        scan_filter = KanaviScanFilter(temporal_window=4, min_neighbors=0)
+        results = self.apply_scans(scan_filter, [[0.0, 8.0], [0.0, 9.0], [8.0, 8.5], [8.4, 8.2]] * 2)
+        # 절반이 무효면 무효 ([0, 0, 8, 8.4] → 0), 유효 포인트는 측정값 중 낮은 쪽 중앙값
+        np.testing.assert_array_equal(results[3:], np.float32([[0.0, 8.2]] * 5))
+        np.testing.assert_array_equal(results[:3], np.float32([[0.0, 8.0], [0.0, 8.0], [0.0, 8.5]]))
+
+if __name__ == "__main__":
+    unittest.main()
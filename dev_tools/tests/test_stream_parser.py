@@ -0,0 +1,163 @@
+"""KanaviStreamParser 재동기화/배치 파싱 회귀 테스트
+
+결과는 패킷을 하나씩 parse_kanavi_packet으로 파싱한 값과 비교합니다.
+
+    python -m pytest dev_tools/tests
+    python -m unittest discover dev_tools/tests
+"""
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_server_lidar import KanaviLidarParser, KanaviStreamParser, build_kanavi_packet
+
+ADDR = ("192.168.0.10", 2020)
+
+def make_packets():
+    """VL-R4 4채널(Detection 전체/일부/없음) + VL-R2 패킷
+
+    거리(50m 이하 → Distance_D ≤ 50)와 Detection(200 미만) 모두 0xFA가 나오지 않으므로
+    재동기화 중 버리는 바이트 수가 정확히 정해집니다.
+    """
+    rng = np.random.default_rng(7)
+    packets = [
+        build_kanavi_packet(0x06, 1, 0, rng.uniform(0.0, 50.0, 400), rng.integers(0, 200, 400)),
+        build_kanavi_packet(0x06, 1, 1, rng.uniform(0.0, 50.0, 400), rng.integers(0, 200, 150)),
+        build_kanavi_packet(0x06, 1, 2, rng.uniform(0.0, 50.0, 400)),
+        build_kanavi_packet(0x06, 1, 3, rng.uniform(0.0, 50.0, 400), rng.integers(0, 200, 400)),
+        build_kanavi_packet(0x03, 2, 1, rng.uniform(0.0, 30.0, 360), rng.integers(0, 200, 360))
+    ]
+    assert not any(b'\xfa' in packet[1:] for packet in packets)
+    return packets
+
+class StreamParserTest(unittest.TestCase):
+
+    def setUp(self):
+        self.packets = make_packets()
+        reference_parser = KanaviLidarParser()
+        self.reference = [reference_parser.parse_kanavi_packet(packet) for packet in self.packets]
+        self.parser = KanaviStreamParser()
+
+    def assert_parsed(self, results, indices):
+        """results가 self.packets[indices]를 하나씩 파싱한 결과와 같은지"""
+        self.assertEqual(len(results), len(indices))
+        for parsed, index in zip(results, indices):
+            expected = self.reference[index]
+            self.assertEqual(set(parsed), set(expected))
+            for key, value in expected.items():
+                if isinstance(value, np.ndarray):
+                    np.testing.assert_array_equal(parsed[key], value, err_msg=key)
+                    self.assertEqual(parsed[key].dtype, value.dtype, key)
+                else:
+                    self.assertEqual(parsed[key], value, key)
+
+    def assert_counters(self, **expected):
+        counters = {name: self.parser.stats[name] for name in
+                    ("invalid", "checksum_errors", "parse_errors", "resyncs", "skipped_bytes", "truncated")}
+        self.assertEqual(counters, dict(dict.fromkeys(counters, 0), **expected))
+
+    def parse_many(self, *datagrams):
+        results = self.parser.parse_many([(data, ADDR) for data in datagrams])
+        self.assertTrue(all(addr == ADDR for _, addr in results))
+        return [parsed for parsed, _ in results]
+
+    def test_parse_many_matches_single_packet_parser(self):
+        self.assert_parsed(self.parse_many(*self.packets), range(len(self.packets)))
+        self.assertEqual(self.parser.stats["packets"], len(self.packets))
+        self.assert_counters()
+
+    def test_single_datagram_matches(self):
+        # 배치 디코딩을 거치지 않는 경로 (패킷 1개)
+        self.assert_parsed(self.parse_many(self.packets[1]), [1])
+        self.assert_counters()
+
+    def test_concatenated_datagram(self):
+        results = self.parse_many(self.packets[0] + self.packets[1] + self.packets[4], self.packets[3])
+        self.assert_parsed(results, [0, 1, 4, 3])
+        self.assert_counters()
+
+    def test_garbage_between_packets(self):
+        garbage = [b'\x00\x01', b'\xfa\x00junk', b'\xfa']
+        data = garbage[0] + self.packets[0] + garbage[1] + self.packets[1] + self.packets[2] + garbage[2]
+        self.assert_parsed(self.parse_many(data), [0, 1, 2])
+        # 맨 끝 0xFA 1바이트는 헤더보다 짧으므로 잘린 패킷
+        self.assert_counters(resyncs=3, skipped_bytes=sum(len(chunk) for chunk in garbage), truncated=1)
+
+    def test_random_chunk_splits(self):
+        garbage = b'\x13\x37\xfa\x06\x01'
+        stream = b''.join(packet + (garbage if index % 2 else b'') for index, packet in enumerate(self.packets * 3))
+        indices = list(range(len(self.packets))) * 3
+        rng = random.Random(3)
+        for max_chunk in (1, 7, 300, 5000):
+            self.parser = KanaviStreamParser()
+            results = []
+            position = 0
+            while position < len(stream):
+                size = rng.randint(1, max_chunk)
+                results.extend(self.parser.feed(memoryview(stream)[position:position + size]))
+                position += size
+            self.assert_parsed(results, indices)
+            self.assertEqual(self.parser.pending, b'')
+            # 패킷 뒤 garbage 7개: 각각 한 번 동기를 잃음
+            self.assert_counters(resyncs=7, skipped_bytes=7 * len(garbage))
+
+    def test_corrupted_checksum(self):
+        corrupted = bytearray(self.packets[1])
+        corrupted[-1] ^= 0xFF
+        self.assert_parsed(self.parse_many(self.packets[0] + bytes(corrupted) + self.packets[2]), [0, 2])
+        self.assert_counters(checksum_errors=1, resyncs=1, skipped_bytes=len(corrupted))
+
+    def test_corrupted_header_is_not_a_packet(self):
+        # Command가 0xDDCx가 아니면 체크섬을 보기 전에 건너뜀
+        corrupted = bytearray(self.packets[1])
+        corrupted[3] = 0x00
+        self.assert_parsed(self.parse_many(bytes(corrupted) + self.packets[2]), [2])
+        self.assert_counters(resyncs=1, skipped_bytes=len(corrupted))
+
+    def test_truncated_tail(self):
+        self.assert_parsed(self.parse_many(self.packets[0] + self.packets[1][:100]), [0])
+        self.assert_counters(truncated=1, resyncs=1, skipped_bytes=100)
+
+    def test_truncated_datagram_is_not_invalid(self):
+        self.assertEqual(self.parse_many(self.packets[0][:5], self.packets[0][:300]), [])
+        self.assert_counters(truncated=2, resyncs=2, skipped_bytes=305)
+
+    def test_invalid_datagram(self):
+        self.assert_parsed(self.parse_many(b'hello world', self.packets[2]), [2])
+        self.assert_counters(invalid=1, resyncs=1, skipped_bytes=11)
+
+    def test_feed_keeps_incomplete_packet_until_next_chunk(self):
+        packet = self.packets[1]
+        self.assert_parsed(self.parser.feed(self.packets[0] + packet[:50]), [0])
+        self.assertEqual(self.parser.pending, packet[:50])
+        self.assert_parsed(self.parser.feed(packet[50:]), [1])
+        self.assertEqual(self.parser.pending, b'')
+        self.assert_counters()
+
+    def test_flush_counts_truncated_packet(self):
+        self.assertEqual(self.parser.feed(self.packets[2][:10]), [])
+        self.parser.flush()
+        self.assertEqual(self.parser.pending, b'')
+        self.assert_counters(truncated=1)
+        self.assert_parsed(self.parser.feed(self.packets[2]), [2])
+
+    def test_as_points(self):
+        results = self.parse_many(self.packets[0], self.packets[4])
+        with_points = [parsed for parsed, _ in self.parser.parse_many(
+            [(self.packets[0], ADDR), (self.packets[4], ADDR)], as_points=True)]
+        for parsed, expected in zip(with_points, results):
+            self.assertEqual(parsed['points'], KanaviLidarParser().to_point_dicts(expected))
+
+    def test_single_packet_parser_does_not_swallow_other_errors(self):
+        parser = KanaviLidarParser()
+        self.assertIsNone(parser.parse_kanavi_packet(self.packets[0][:200]))  # 잘린 패킷은 invalid
+        with self.assertRaises(TypeError):
+            parser.parse_kanavi_packet(None)
+        self.assertEqual((parser.stats["invalid"], parser.stats["parse_errors"]), (1, 0))
+
+if __name__ == "__main__":
+    unittest.main()
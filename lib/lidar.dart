@@ -1,6 +1,7 @@
 // lidar.dart 전체 수정
 
 import 'dart:math' as math;
+import 'dart:typed_data';
 
 class Point3D {
   final double x;
@@ -57,6 +58,8 @@ class Lidar {
       double hfov = (json['hfov'] ?? 360.0).toDouble();
       int channel = json['channel'] ?? 0;
       double hresolution = (json['hresolution'] ?? 0.25).toDouble();
+      // 방위각 범위 구독으로 잘린 스캔은 첫 포인트 방위각이 HFOV/2가 아님
+      double azimuthStart = (json['azimuth_start'] ?? hfov / 2).toDouble();
       
       // 🔧 vfov: 채널별 고정값 (단일 숫자)
       double vfov = 0.0;
@@ -80,8 +83,8 @@ class Lidar {
       
       int totalPoints = distances.length;
       for (int i = 0; i < totalPoints; i++) {
-        // 방위각: HFOV/2부터 시작해서 hresolution씩 감소 :: 반시계
-        double currentAzimuth = hfov/2 - (i * hresolution); 
+        // 방위각: 시작 방위각(기본 HFOV/2)부터 hresolution씩 감소 :: 반시계
+        double currentAzimuth = azimuthStart - (i * hresolution); 
         azimuth.add(currentAzimuth);
         pointIndex.add(i);
       }
@@ -117,6 +120,72 @@ class Lidar {
     }
   }
 
+  // 바이너리 프레임 (mock_server_lidar.py KanaviFrameEncoder 참고)
+  // 헤더 40바이트 + distances(float32 또는 uint16 cm) + detections(uint8), Little Endian
+  static const int binaryHeaderSize = 40;
+  static const int binaryVersion = 1;
+
+  // 바이너리 메시지 종류 (앞 2바이트): 'KL' 채널, 'KF' 전체 프레임, 'KD' 델타, 'KS' 희소, 'KG' 격자, 'KH' 기록
+  static String binaryMagic(Uint8List bytes) {
+    return bytes.length >= 2 ? String.fromCharCodes(bytes, 0, 2) : '';
+  }
+
+  static bool isBinaryFrame(Uint8List bytes) {
+    return bytes.length >= binaryHeaderSize && binaryMagic(bytes) == 'KL';
+  }
+
+  factory Lidar.fromBinary(Uint8List bytes) {
+    if (!isBinaryFrame(bytes)) {
+      throw FormatException('바이너리 라이다 채널 프레임(KL)이 아님: ${binaryMagic(bytes)}');
+    }
+
+    final header = ByteData.sublistView(bytes, 0, binaryHeaderSize);
+    final int version = header.getUint8(2);
+    if (version != binaryVersion) {
+      throw FormatException('지원하지 않는 바이너리 프레임 버전: $version');
+    }
+    final int distanceFormat = header.getUint8(3); // 0: float32 m, 1: uint16 cm, 2: float32 XYZ
+    if (distanceFormat > 1) {
+      throw FormatException('지원하지 않는 거리 형식: $distanceFormat (XYZ는 stream: points_xyz 전용)');
+    }
+    final int channel = header.getUint8(5);
+    final double hfov = header.getFloat32(8, Endian.little);
+    final double vfov = header.getFloat32(12, Endian.little);
+    final double hresolution = header.getFloat32(16, Endian.little);
+    final double maxRange = header.getFloat32(20, Endian.little);
+    final int pointSize = header.getUint16(36, Endian.little);
+    // 구독으로 잘린 스캔의 첫 포인트 위치 (HFOV/2 대비 0.01° 단위, 전체 스캔은 0)
+    final double azimuthStart = hfov / 2 - header.getUint16(38, Endian.little) / 100.0;
+
+    // detections(uint8 × N)는 JSON의 detection_data처럼 뷰어에서 사용하지 않으므로 길이만 확인
+    final int valueSize = distanceFormat == 1 ? 2 : 4;
+    if (bytes.length < binaryHeaderSize + pointSize * (valueSize + 1)) {
+      throw FormatException('바이너리 프레임 길이 부족: ${bytes.length}바이트 (포인트 $pointSize개)');
+    }
+
+    final body = ByteData.sublistView(bytes, binaryHeaderSize);
+    final List<double> distances = List<double>.filled(pointSize, 0.0);
+    final List<double> azimuth = List<double>.filled(pointSize, 0.0);
+    final List<int> pointIndex = List<int>.generate(pointSize, (i) => i);
+
+    for (int i = 0; i < pointSize; i++) {
+      distances[i] = distanceFormat == 1
+          ? body.getUint16(i * 2, Endian.little) / 100.0
+          : body.getFloat32(i * 4, Endian.little);
+      azimuth[i] = azimuthStart - (i * hresolution);
+    }
+
+    return Lidar(
+      channel: channel,
+      hfov: hfov,
+      vfov: vfov,
+      distances: distances,
+      azimuth: azimuth,
+      pointIndex: pointIndex,
+      maxRange: maxRange,
+    );
+  }
+
   List<Point3D> to3DPoints() {
     List<Point3D> points = [];
     
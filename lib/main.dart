@@ -3,6 +3,7 @@ import 'package:flutter/material.dart';
 import 'package:web_socket_channel/web_socket_channel.dart';
 import 'package:flutter_riverpod/flutter_riverpod.dart';
 import 'dart:async';
+import 'dart:typed_data';
 import 'lidar.dart';
 import 'pointcloud/simple_3d_viewer.dart'; 
 
@@ -115,10 +116,21 @@ class _MyHomePageState extends ConsumerState<MyHomePage> {
     }
     
     try {
+      // 바이너리 프레임 (start_scan에서 encoding: binary 요청)
+      if (data is List<int>) {
+        _handleBinaryData(data is Uint8List ? data : Uint8List.fromList(data), shouldLog);
+        return;
+      }
+
       final jsonData = jsonDecode(data);
       
       if (jsonData['type'] == 'lidar') {
         _handleLidarDataQuiet(jsonData, shouldLog);
+      } else if (jsonData['type'] == 'lidar_frame') {
+        // 전체 프레임: 같은 회전의 모든 채널을 한 번에 갱신
+        for (final channelData in jsonData['channels'] ?? []) {
+          _handleLidarDataQuiet({...jsonData, ...channelData}, shouldLog);
+        }
       } else {
         _handleGeneralMessage(jsonData, data);
       }
@@ -133,6 +145,31 @@ class _MyHomePageState extends ConsumerState<MyHomePage> {
     }
   }
   
+  void _handleBinaryData(Uint8List bytes, bool shouldLog) {
+    if (_isDisposed || !mounted || _scanStopped) return;
+
+    // 앱은 채널 모드 distances 스트림만 구독하므로 'KL' 채널 프레임만 처리
+    final magic = Lidar.binaryMagic(bytes);
+    if (magic != 'KL') {
+      if (shouldLog) {
+        print('⚠️ 처리하지 않는 바이너리 프레임 무시: $magic (${bytes.length}바이트)');
+      }
+      return;
+    }
+
+    try {
+      final lidar = Lidar.fromBinary(bytes);
+      _localLidarData[lidar.channel] = lidar;
+    } catch (e) {
+      if (shouldLog) {
+        print('❌ 바이너리 프레임 처리 실패: $e');
+      }
+      _safeSetState(() {
+        _addMessage('[에러] 바이너리 라이다 프레임 처리 실패');
+      });
+    }
+  }
+
   void _handleLidarDataQuiet(Map<String, dynamic> jsonData, bool shouldLog) {
     if (_isDisposed || !mounted || _scanStopped) return;
     
@@ -742,7 +779,8 @@ void _exitTopView() {
                 ElevatedButton(
                   onPressed: _connected && _channel != null && !_isDisposed
                       ? () {
-                          _sendMessage('{"type":"start_scan"}');
+                          // 바이너리 인코딩 요청 (uint16 cm: JSON 대비 전송량·파싱 비용 감소)
+                          _sendMessage('{"type":"start_scan","encoding":"binary","distance_format":"uint16"}');
                           setState(() {
                             _scanStopped = false;
                           });